@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Снимок данных расширенной аналитики
+"""
+
+import threading
+import time
+from datetime import date
+
+
+class AnalyticsSnapshot:
+    """Данные аналитики, вычисляемые один раз и обновляемые по разделам
+
+    Пока не истекло время жизни ttl, снимок отдается без обращения к БД.
+    После этого сравниваются версии таблиц (DatabaseManager.get_table_versions):
+    пересчитываются только разделы, зависящие от изменившихся таблиц
+    (DatabaseManager.ANALYTICS_SECTIONS). При смене даты пересчитываются все
+    разделы: периоды "за последние N месяцев" и просрочка отсчитываются от
+    текущей даты.
+    """
+
+    def __init__(self, db, ttl=300, clock=time.monotonic):
+        """
+        Args:
+            db: DatabaseManager
+            ttl: время жизни снимка в секундах
+            clock: источник времени (для тестов)
+        """
+        self.db = db
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._data = None
+        self._versions = {}
+        self._date = None
+        self._checked_at = None
+        # Количество пересчитанных разделов (для диагностики и тестов)
+        self.sections_computed = 0
+
+    def get(self, force=False):
+        """Текущий снимок: словарь разделов аналитики
+
+        Args:
+            force: проверить изменения сразу, не дожидаясь истечения ttl
+        """
+        with self._lock:
+            now = self.clock()
+            if (self._data is not None and not force
+                    and now - self._checked_at < self.ttl):
+                return self._data
+
+            # Версии читаются до пересчета: запись, выполненная во время пересчета,
+            # будет замечена при следующей проверке
+            versions = self.db.get_table_versions()
+            today = date.today().isoformat()
+            sections = self._stale_sections(versions, today)
+            if sections:
+                fresh = self.db.get_analytics_sections(sections)
+                if fresh is None:
+                    return self._data or {}
+                data = dict(self._data or {})
+                data.update(fresh)
+                self._data = data
+                self.sections_computed += len(sections)
+
+            self._versions = versions
+            self._date = today
+            self._checked_at = now
+            return self._data
+
+    def invalidate(self):
+        """Сброс снимка: следующий вызов get пересчитает все разделы"""
+        with self._lock:
+            self._data = None
+
+    def _stale_sections(self, versions, today):
+        """Разделы, которые нужно пересчитать"""
+        sections = self.db.ANALYTICS_SECTIONS
+        if self._data is None or today != self._date:
+            return list(sections)
+        changed = {table for table in set(versions) | set(self._versions)
+                   if versions.get(table) != self._versions.get(table)}
+        return [name for name, tables in sections.items() if changed.intersection(tables)]
@@ -10,15 +10,20 @@ from datetime import datetime, timedelta
 import sys
 import platform
 import os
-import shutil
 
 from database_manager import DatabaseManager
 from window_config import WindowConfig
 from pdf_export import PDFExporter
 from excel_export import ExcelExporter
 from xml_json_export import XMLJSONExporter
+from ui.background_loader import BackgroundLoader
+from ui.notification_toast import NotificationToast
+from ui.search_controller import SearchController
+from ui.virtual_tree import VirtualTreeview
 from config.constants import (
-    TABLES_CONFIG, OFFICE_COLORS, TREEVIEW_HEIGHT,
+    TABLES_CONFIG, OFFICE_COLORS, TREEVIEW_HEIGHT, TREEVIEW_BUFFER_ROWS, HISTORY_PAGE_SIZE, QUERY_CACHE_SIZE,
+    SERVER_SORT_THRESHOLD, SERVER_PAGE_SIZE, SEARCH_DEBOUNCE_MS, SEARCH_MIN_LENGTH,
+    ACTIVE_TREND_PERIODS, NOTIFICATION_TOAST_MAX_ITEMS, NOTIFICATION_TOAST_HIDE_MS,
     INSTRUMENT_STATUSES, EMPLOYEE_STATUSES, INSTRUMENT_CATEGORIES,
     MESSAGES
 )
@@ -48,6 +53,13 @@ TABLES_CONFIG = {
         'column_widths': {
             'ID': 50, 'Название': 200, 'Инв. номер': 100, 'Серийный номер': 110,
             'Штрих-код': 140, 'Категория': 140, 'Статус': 100
+        },
+        'column_types': {'ID': 'int'},
+        # Таблица БД и поля сортировки на стороне БД для больших таблиц
+        'db_table': 'instruments',
+        'sort_fields': {
+            'ID': 'id', 'Название': 'name', 'Инв. номер': 'inventory_number',
+            'Серийный номер': 'serial_number', 'Категория': 'category', 'Статус': 'status'
         }
     },
     'employees': {
@@ -55,6 +67,12 @@ TABLES_CONFIG = {
         'column_widths': {
             'ID': 50, 'ФИО': 200, 'Должность': 150, 'Отдел': 200,
             'Телефон': 120, 'Email': 180, 'Статус': 100
+        },
+        'column_types': {'ID': 'int'},
+        'db_table': 'employees',
+        'sort_fields': {
+            'ID': 'id', 'ФИО': 'full_name', 'Должность': 'position', 'Отдел': 'department',
+            'Телефон': 'phone', 'Email': 'email', 'Статус': 'status'
         }
     },
     'issues': {
@@ -64,6 +82,13 @@ TABLES_CONFIG = {
             'ID': 50, 'Инв. номер': 110, 'Инструмент': 200, 'Сотрудник': 180,
             'Адрес': 220, 'Дата выдачи': 130, 'Ожид. возврат': 110,
             'Выдал': 140, 'Примечание': 200
+        },
+        'column_types': {'ID': 'int', 'Дата выдачи': 'date', 'Ожид. возврат': 'date'},
+        'db_table': 'issues',
+        'sort_fields': {
+            'ID': 'id', 'Инв. номер': 'inventory_number', 'Инструмент': 'name', 'Сотрудник': 'employee',
+            'Адрес': 'address', 'Дата выдачи': 'issue_date', 'Ожид. возврат': 'expected_return_date',
+            'Выдал': 'issued_by', 'Примечание': 'notes'
         }
     },
     'returns': {
@@ -73,6 +98,9 @@ TABLES_CONFIG = {
             'ID': 50, 'Инв. номер': 110, 'Инструмент': 230, 'Сотрудник': 200,
             'Адрес': 220, 'Дата выдачи': 130, 'Ожид. возврат': 120, 'Дней в использовании': 160
         },
+        'column_types': {
+            'ID': 'int', 'Дата выдачи': 'date', 'Ожид. возврат': 'date', 'Дней в использовании': 'int'
+        },
         'tags': {'overdue': {'background': '#ffcccc'}}
     },
     'history': {
@@ -83,6 +111,13 @@ TABLES_CONFIG = {
             'Сотрудник': 180, 'Адрес': 220, 'Дата операции': 140,
             'Выполнил': 140, 'Примечание': 200
         },
+        'column_types': {'ID': 'int', 'Дата операции': 'date'},
+        'db_table': 'operation_history',
+        'sort_fields': {
+            'ID': 'id', 'Тип': 'operation_type', 'Инв. номер': 'inventory_number', 'Инструмент': 'name',
+            'Сотрудник': 'employee', 'Адрес': 'address', 'Дата операции': 'operation_date',
+            'Выполнил': 'performed_by', 'Примечание': 'notes'
+        },
         'tags': {
             'issue': {'background': '#ffffcc'},
             'return': {'background': '#ccffcc'}
@@ -92,7 +127,8 @@ TABLES_CONFIG = {
         'columns': ('ID', 'Название', 'Полный адрес'),
         'column_widths': {
             'ID': 50, 'Название': 250, 'Полный адрес': 500
-        }
+        },
+        'column_types': {'ID': 'int'}
     }
 }
 
@@ -226,6 +262,7 @@ class ToolManagementApp:
         
         # Инициализация базы данных
         self.db = DatabaseManager()
+        self.db.enable_cache(QUERY_CACHE_SIZE)
 
         # Инициализация системы уведомлений
         try:
@@ -260,50 +297,51 @@ class ToolManagementApp:
         
         # Маппинг имен таблиц на виджеты Treeview (инициализируется после создания вкладок)
         self.tree_mapping = {}
+        # Адаптеры виртуального отображения строк по именам таблиц
+        self.tree_adapters = {}
+        # Параметры последнего запроса каждой таблицы (для обновления сверкой строк)
+        self.table_queries = {}
+        # Размер последней выборки таблиц (с учетом фильтров) и состояние постраничной загрузки при сортировке в БД
+        self.table_sizes = {}
+        self.server_pages = {}
+        
+        # Фоновая загрузка данных таблиц и индикаторы загрузки по таблицам;
+        # выполняемый запрос устаревшей загрузки прерывается в SQLite
+        self.loader = BackgroundLoader(self.root, interrupt=lambda thread: self.db.interrupt(thread))
+        self.loading_labels = {}
+        # Вкладки с отложенным построением и их модели представления
+        self.lazy_tabs = {}
+        self.view_models = {}
+        # Период графика динамики активных выдач, дней
+        self.active_trend_days = ACTIVE_TREND_PERIODS[0]
+        # Поиск запускается после паузы ввода, а не на каждое нажатие клавиши
+        self.search = SearchController(self.root, SEARCH_DEBOUNCE_MS, SEARCH_MIN_LENGTH)
         
         # Создание интерфейса
         self.create_widgets()
         self.load_data()
 
-        # Запуск обработки уведомлений в главном потоке
-        self._schedule_notification_check()
-
-    def _schedule_notification_check(self):
-        """Планирование периодической проверки уведомлений"""
-        # Проверяем уведомления каждые 2 секунды
-        self.root.after(2000, self._process_pending_notifications)
+        # Обработка уведомлений в главном потоке: менеджер уведомлений будит
+        # его сам, когда в очереди появляются уведомления
+        self.notification_toast = NotificationToast(
+            self.root, self.office_colors,
+            max_items=NOTIFICATION_TOAST_MAX_ITEMS, hide_ms=NOTIFICATION_TOAST_HIDE_MS
+        )
+        if self.notification_manager:
+            self.notification_manager.set_pending_callback(
+                lambda: self.root.after_idle(self._process_pending_notifications)
+            )
+            # Уведомления, поставленные до запуска mainloop
+            self.root.after_idle(self._process_pending_notifications)
 
     def _process_pending_notifications(self):
-        """Обработка ожидающих уведомлений в главном потоке"""
+        """Показ всех ожидающих уведомлений одним обновлением панели уведомлений"""
         try:
             if self.notification_manager:
                 notifications = self.notification_manager.get_pending_notifications()
-                for title, message in notifications:
-                    self._show_desktop_notification_main_thread(title, message)
-
-            # Планируем следующую проверку
-            self.root.after(2000, self._process_pending_notifications)
-
+                self.notification_toast.show(notifications)
         except Exception as e:
             print(f"Ошибка обработки уведомлений: {e}")
-            # Продолжаем планировать проверки даже при ошибке
-            self.root.after(2000, self._process_pending_notifications)
-
-    def _show_desktop_notification_main_thread(self, title, message):
-        """Показать desktop уведомление в главном потоке"""
-        try:
-            from tkinter import messagebox
-
-            # Показываем диалог с сообщением
-            if len(message) > 500:
-                # Для длинных сообщений показываем только начало
-                short_message = message[:500] + "..."
-                messagebox.showwarning(title, short_message)
-            else:
-                messagebox.showwarning(title, message)
-
-        except Exception as e:
-            print(f"Ошибка показа desktop уведомления: {e}")
 
     def setup_office_style(self):
         """Настройка стиля в стиле MS Office"""
@@ -481,6 +519,10 @@ class ToolManagementApp:
         self.create_addresses_tab()
         self.create_statistics_tab()
         self.create_analytics_tab()
+        
+        # Содержимое тяжелых вкладок строится при первом переходе на них
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed, add='+')
+        self._on_tab_changed()
 
         # Применение темы к интерфейсу
         if self.theme_manager:
@@ -522,6 +564,7 @@ class ToolManagementApp:
 
         tools_menu.add_separator()
         tools_menu.add_command(label="Настройки уведомлений", command=self.configure_notifications)
+        tools_menu.add_command(label="Пересчитать сводные данные", command=self.rebuild_summary_data)
 
         # Меню "Справка"
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -578,11 +621,15 @@ class ToolManagementApp:
         
         search_entry = ttk.Entry(search_frame, width=30)
         search_entry.pack(side=tk.LEFT, padx=5)
-        search_entry.bind('<KeyRelease>', lambda e: on_change_callback())
+        self.search.attach(search_entry, on_change_callback)
         return search_entry
     
-    def _create_treeview(self, parent, table_name):
-        """Создание таблицы Treeview с настройками в стиле MS Office"""
+    def _create_treeview(self, parent, table_name, on_scroll_end=None):
+        """Создание таблицы Treeview с настройками в стиле MS Office
+        
+        Args:
+            on_scroll_end: функция, вызываемая при прокрутке к концу таблицы (опционально)
+        """
         config = TABLES_CONFIG[table_name]
         columns = config['columns']
         column_widths = config['column_widths']
@@ -619,12 +666,17 @@ class ToolManagementApp:
             tree.tag_configure(tag_name, **updated_config)
         
         # Скроллбар
-        scrollbar = ttk.Scrollbar(tree_container, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(tree_container, orient=tk.VERTICAL)
         
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # В Treeview создаются элементы только для видимых строк и запаса вокруг них,
+        # прокруткой управляет адаптер
+        self.tree_adapters[table_name] = VirtualTreeview(
+            tree, scrollbar, buffer=TREEVIEW_BUFFER_ROWS, on_scroll_end=on_scroll_end
+        )
+        
         return tree
     
     def _create_control_frame(self, tab):
@@ -668,7 +720,9 @@ class ToolManagementApp:
         ).pack(side=tk.LEFT, padx=5)
         
         self.instrument_search = self._create_search_widget(control_frame, self.load_instruments)
-        self.instruments_tree = self._create_treeview(tab, 'instruments')
+        self.instruments_tree = self._create_treeview(
+            tab, 'instruments', on_scroll_end=lambda: self.load_more_rows('instruments')
+        )
         self.tree_mapping['instruments'] = self.instruments_tree
         
         # Словарь для хранения photo_path по ID инструмента
@@ -698,7 +752,9 @@ class ToolManagementApp:
         self._create_button(control_frame, "Обновить", self.load_employees)
 
         self.employee_search = self._create_search_widget(control_frame, self.load_employees)
-        self.employees_tree = self._create_treeview(tab, 'employees')
+        self.employees_tree = self._create_treeview(
+            tab, 'employees', on_scroll_end=lambda: self.load_more_rows('employees')
+        )
         self.tree_mapping['employees'] = self.employees_tree
 
         # Словарь для хранения photo_path по ID сотрудника
@@ -734,7 +790,9 @@ class ToolManagementApp:
         )
         self.stats_label.pack()
         
-        self.issues_tree = self._create_treeview(tab, 'issues')
+        self.issues_tree = self._create_treeview(
+            tab, 'issues', on_scroll_end=lambda: self.load_more_rows('issues')
+        )
         self.tree_mapping['issues'] = self.issues_tree
         
         # Словарь для хранения photo_path по ID инструмента для выдач
@@ -838,7 +896,7 @@ class ToolManagementApp:
         # Поиск по всем столбцам
         self.history_search = self._create_search_widget(control_frame, self.load_history)
         
-        self.history_tree = self._create_treeview(tab, 'history')
+        self.history_tree = self._create_treeview(tab, 'history', on_scroll_end=self.load_more_history)
         self.tree_mapping['history'] = self.history_tree
     
     def create_addresses_tab(self):
@@ -858,41 +916,105 @@ class ToolManagementApp:
         self.tree_mapping['addresses'] = self.addresses_tree
     
     def create_statistics_tab(self):
-        """Вкладка статистики и отчетов"""
-        tab = tk.Frame(self.notebook, bg=self.office_colors['bg_white'])
-        self.notebook.add(tab, text="📊 Статистика")
-        
-        # Создаем скроллируемый фрейм
-        canvas = tk.Canvas(tab, bg=self.office_colors['bg_white'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(tab, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=self.office_colors['bg_white'])
+        """Вкладка статистики и отчетов
         
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        Содержимое строится при первом переходе на вкладку.
+        """
+        self._add_lazy_tab(
+            'statistics', "📊 Статистика", self._fetch_statistics_model, self._build_statistics_content
         )
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+    def create_analytics_tab(self):
+        """Вкладка расширенной аналитики с графиками
         
-        # Панель управления
-        control_frame = self._create_control_frame(scrollable_frame)
-        self._create_button(control_frame, "Обновить", self.load_statistics)
+        Содержимое (и импорт matplotlib) строится при первом переходе на вкладку.
+        """
+        self._add_lazy_tab(
+            'analytics', "📈 Аналитика", self._fetch_analytics_model, self._build_analytics_content
+        )
+
+    # ========== ОТЛОЖЕННОЕ ПОСТРОЕНИЕ ВКЛАДОК ==========
+
+    def _add_lazy_tab(self, name, text, fetch_model, build_content):
+        """Добавление вкладки, содержимое которой строится при первом показе
         
-        # Общая статистика
-        self._create_statistics_section(scrollable_frame, "Общая статистика", self._create_general_stats)
+        Args:
+            name: имя вкладки (ключ модели представления и фоновой загрузки)
+            text: заголовок вкладки
+            fetch_model: функция fetch_model(refresh), выполняемая в фоновом потоке;
+                возвращает модель представления (данные для построения содержимого);
+                refresh=True при обновлении по кнопке
+            build_content: функция build_content(tab, model), строит содержимое в потоке Tk
+        """
+        tab = tk.Frame(self.notebook, bg=self.office_colors['bg_white'])
+        self.notebook.add(tab, text=text)
+        self.lazy_tabs[str(tab)] = {
+            'name': name,
+            'frame': tab,
+            'fetch': fetch_model,
+            'build': build_content,
+            'built': False,
+        }
+        return tab
+
+    def _on_tab_changed(self, event=None):
+        """Построение содержимого вкладки при первом переходе на нее"""
+        lazy = self.lazy_tabs.get(str(self.notebook.select()))
+        if lazy is not None and not lazy['built']:
+            self._show_lazy_tab(lazy)
+
+    def _show_lazy_tab(self, lazy, refresh=False):
+        """Построение содержимого вкладки по модели представления
         
-        # Статистика по категориям
-        self._create_statistics_section(scrollable_frame, "Инструменты по категориям", self._create_category_stats)
+        Модель запоминается: повторное построение не выполняет запросов,
+        пока модель не сброшена. refresh=True загружает модель заново.
+        """
+        lazy['built'] = True
+        name, tab = lazy['name'], lazy['frame']
+        
+        def build(model):
+            self.view_models[name] = model
+            for child in tab.winfo_children():
+                child.destroy()
+            lazy['build'](tab, model)
+        
+        model = None if refresh else self.view_models.get(name)
+        if model is not None:
+            build(model)
+            return
         
-        # Топ сотрудников
-        self._create_statistics_section(scrollable_frame, "Топ сотрудников по выдачам", self._create_employees_stats)
+        def on_error(error):
+            # Следующий переход на вкладку повторит загрузку
+            lazy['built'] = False
+            print(f"❌ Ошибка загрузки вкладки ({name}): {error}")
         
-        # Самые используемые инструменты
-        self._create_statistics_section(scrollable_frame, "Самые используемые инструменты", self._create_instruments_usage_stats)
+        if not tab.winfo_children():
+            tk.Label(
+                tab, text="⏳ Загрузка...",
+                bg=self.office_colors['bg_white'], fg=self.office_colors['fg_secondary'],
+                font=self.default_font
+            ).pack(pady=20)
+        self.loader.submit('tab:' + name, lambda: lazy['fetch'](refresh), build, on_error)
+
+    def _refresh_lazy_tab(self, name):
+        """Обновление модели и содержимого отложенной вкладки"""
+        for lazy in self.lazy_tabs.values():
+            if lazy['name'] != name:
+                continue
+            if lazy['built']:
+                self._show_lazy_tab(lazy, refresh=True)
+            else:
+                # Еще не показанная вкладка загрузит свежие данные при показе
+                self.view_models.pop(name, None)
+
+    def _create_scrollable_frame(self, tab):
+        """Скроллируемая область вкладки; возвращает фрейм для содержимого"""
+        canvas = tk.Canvas(tab, bg=self.office_colors['bg_white'], highlightthickness=0)
+        scrollbar = ttk.Scrollbar(tab, orient="vertical", command=canvas.yview)
+        scrollable_frame = tk.Frame(canvas, bg=self.office_colors['bg_white'])
         
-        # Среднее время использования
-        self._create_statistics_section(scrollable_frame, "Среднее время использования", self._create_usage_time_stats)
+        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+        canvas.configure(yscrollcommand=scrollbar.set)
         
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -907,68 +1029,88 @@ class ToolManagementApp:
             canvas.configure(scrollregion=canvas.bbox("all"))
         scrollable_frame.bind("<Configure>", update_scroll_region)
         
-        # Настройка фона canvas
-        canvas.configure(bg=self.office_colors['bg_white'])
-        
-    def create_analytics_tab(self):
-        """Вкладка расширенной аналитики с графиками"""
-        tab = tk.Frame(self.notebook, bg=self.office_colors['bg_white'])
-        self.notebook.add(tab, text="📈 Аналитика")
+        return scrollable_frame
 
-        # Создаем скроллируемый фрейм
-        canvas = tk.Canvas(tab, bg=self.office_colors['bg_white'], highlightthickness=0)
-        scrollbar = ttk.Scrollbar(tab, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=self.office_colors['bg_white'])
+    def _fetch_statistics_model(self, refresh=False):
+        """Данные вкладки статистики (выполняется в фоновом потоке)"""
+        return {
+            'general': self.db.get_general_statistics(),
+            'categories': self.db.get_instruments_by_category(),
+            'top_employees': self.db.get_top_employees_by_issues(10),
+            'most_used': self.db.get_most_used_instruments(10),
+            'usage_time': self.db.get_average_usage_time(),
+        }
 
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+    def _build_statistics_content(self, tab, model):
+        """Содержимое вкладки статистики"""
+        scrollable_frame = self._create_scrollable_frame(tab)
+        
+        # Панель управления
+        control_frame = self._create_control_frame(scrollable_frame)
+        self._create_button(control_frame, "Обновить", self.load_statistics)
+        
+        # Общая статистика
+        self._create_statistics_section(scrollable_frame, "Общая статистика",
+                                        self._create_general_stats, model['general'])
+        
+        # Статистика по категориям
+        self._create_statistics_section(scrollable_frame, "Инструменты по категориям",
+                                        self._create_category_stats, model['categories'])
+        
+        # Топ сотрудников
+        self._create_statistics_section(scrollable_frame, "Топ сотрудников по выдачам",
+                                        self._create_employees_stats, model['top_employees'])
+        
+        # Самые используемые инструменты
+        self._create_statistics_section(scrollable_frame, "Самые используемые инструменты",
+                                        self._create_instruments_usage_stats, model['most_used'])
+        
+        # Среднее время использования
+        self._create_statistics_section(scrollable_frame, "Среднее время использования",
+                                        self._create_usage_time_stats, model['usage_time'])
 
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+    def _fetch_analytics_model(self, refresh=False):
+        """Данные вкладки аналитики из снимка (выполняется в фоновом потоке)
+        
+        Снимок пересчитывает только разделы, таблицы которых изменились;
+        при обновлении по кнопке изменения проверяются сразу.
+        """
+        return self.db.get_analytics_snapshot(force=refresh)
+
+    def _build_analytics_content(self, tab, analytics):
+        """Содержимое вкладки аналитики: все графики строятся по одному набору данных"""
+        scrollable_frame = self._create_scrollable_frame(tab)
 
         # Панель управления
         control_frame = self._create_control_frame(scrollable_frame)
         self._create_button(control_frame, "Обновить", self.load_analytics)
 
         # Графики
-        self._create_chart_section(scrollable_frame, "Выдачи и возвраты по месяцам", self._create_issues_returns_chart)
-        self._create_chart_section(scrollable_frame, "Динамика активных выдач", self._create_active_trend_chart)
-        self._create_chart_section(scrollable_frame, "Просроченные выдачи по категориям", self._create_overdue_chart)
-        self._create_chart_section(scrollable_frame, "Выдачи по адресам", self._create_addresses_chart)
-        self._create_chart_section(scrollable_frame, "Статусы инструментов", self._create_status_chart)
-
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-
-        # Привязка прокрутки колесом мыши
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind("<MouseWheel>", _on_mousewheel)
-
-        # Обновление области прокрутки при изменении размера
-        def update_scroll_region(event):
-            canvas.configure(scrollregion=canvas.bbox("all"))
-        scrollable_frame.bind("<Configure>", update_scroll_region)
-
-        canvas.configure(bg=self.office_colors['bg_white'])
-
-    def _create_chart_section(self, parent, title, content_func):
+        self._create_chart_section(scrollable_frame, "Выдачи и возвраты по месяцам",
+                                   self._create_issues_returns_chart, analytics)
+        self._create_chart_section(scrollable_frame, "Динамика активных выдач",
+                                   self._create_active_trend_chart, analytics)
+        self._create_chart_section(scrollable_frame, "Просроченные выдачи по категориям",
+                                   self._create_overdue_chart, analytics)
+        self._create_chart_section(scrollable_frame, "Выдачи по адресам",
+                                   self._create_addresses_chart, analytics)
+        self._create_chart_section(scrollable_frame, "Статусы инструментов",
+                                   self._create_status_chart, analytics)
+
+    def _create_chart_section(self, parent, title, content_func, data):
         """Создание секции графика в стиле MS Office"""
         section_frame = ttk.LabelFrame(parent, text=title, padding="10")
         section_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-        content_func(section_frame)
+        content_func(section_frame, data)
 
-    def _create_statistics_section(self, parent, title, content_func):
+    def _create_statistics_section(self, parent, title, content_func, data):
         """Создание секции статистики в стиле MS Office"""
         section_frame = ttk.LabelFrame(parent, text=title, padding="10")
         section_frame.pack(fill=tk.X, padx=10, pady=5)
-        content_func(section_frame)
+        content_func(section_frame, data)
     
-    def _create_general_stats(self, parent):
+    def _create_general_stats(self, parent, stats):
         """Создание общей статистики"""
-        stats = self.db.get_general_statistics()
         
         # Создаем фрейм для метрик
         metrics_frame = tk.Frame(parent, bg=self.office_colors['bg_white'])
@@ -1002,9 +1144,8 @@ class ToolManagementApp:
             for status, count in stats['instruments_by_status'].items():
                 self._create_metric(status_inner, status, count)
     
-    def _create_category_stats(self, parent):
+    def _create_category_stats(self, parent, data):
         """Статистика по категориям"""
-        data = self.db.get_instruments_by_category()
         
         if not data:
             no_data_label = tk.Label(
@@ -1030,9 +1171,8 @@ class ToolManagementApp:
         
         tree.pack(fill=tk.BOTH, expand=True, pady=5)
     
-    def _create_employees_stats(self, parent):
+    def _create_employees_stats(self, parent, data):
         """Статистика по сотрудникам"""
-        data = self.db.get_top_employees_by_issues(10)
         
         if not data:
             no_data_label = tk.Label(
@@ -1064,9 +1204,8 @@ class ToolManagementApp:
         tree.tag_configure('overdue', background='#ffcccc')
         tree.pack(fill=tk.BOTH, expand=True, pady=5)
     
-    def _create_instruments_usage_stats(self, parent):
+    def _create_instruments_usage_stats(self, parent, data):
         """Статистика использования инструментов"""
-        data = self.db.get_most_used_instruments(10)
         
         if not data:
             no_data_label = tk.Label(
@@ -1097,9 +1236,8 @@ class ToolManagementApp:
         
         tree.pack(fill=tk.BOTH, expand=True, pady=5)
     
-    def _create_usage_time_stats(self, parent):
+    def _create_usage_time_stats(self, parent, data):
         """Статистика времени использования"""
-        data = self.db.get_average_usage_time()
         
         if not data:
             no_data_label = tk.Label(
@@ -1153,25 +1291,7 @@ class ToolManagementApp:
     
     def load_statistics(self):
         """Обновление статистики"""
-        # Находим индекс вкладки статистики
-        stats_tab_index = None
-        for i in range(self.notebook.index("end")):
-            tab_text = self.notebook.tab(i, "text")
-            if "Статистика" in tab_text:
-                stats_tab_index = i
-                break
-        
-        if stats_tab_index is not None:
-            # Удаляем старую вкладку
-            self.notebook.forget(stats_tab_index)
-            # Создаем новую
-            self.create_statistics_tab()
-            # Выбираем её
-            for i in range(self.notebook.index("end")):
-                tab_text = self.notebook.tab(i, "text")
-                if "Статистика" in tab_text:
-                    self.notebook.select(i)
-                    break
+        self._refresh_lazy_tab('statistics')
         
     def sort_treeview(self, table_name, column, toggle_direction=True):
         """Сортировка таблицы по столбцу
@@ -1185,13 +1305,16 @@ class ToolManagementApp:
         if not tree:
             return
         
-        # Получаем индекс столбца
-        columns = tree['columns']
-        try:
-            col_index = columns.index(column)
-        except ValueError:
+        if column not in tree['columns']:
             return
-        
+
+        # Пока загружена только часть строк, отсортированных в БД, сортировка
+        # по столбцу без поля сортировки в БД упорядочила бы лишь загруженные строки
+        state = self.server_pages.get(table_name)
+        if state is not None and not state['done'] \
+                and column not in TABLES_CONFIG[table_name].get('sort_fields', {}):
+            return
+
         # Определяем направление сортировки
         sort_state = self.sort_states[table_name]
         if sort_state['column'] == column:
@@ -1203,45 +1326,31 @@ class ToolManagementApp:
             sort_state['column'] = column
             sort_state['direction'] = 'asc'
         
-        # Получаем все элементы
-        items = [(tree.set(item, column), item) for item in tree.get_children('')]
-        
-        # Определяем функцию сравнения
-        def try_convert(value):
-            """Попытка преобразовать значение в число или дату"""
-            if value is None or value == '':
-                return (0, value)  # Пустые значения в начало
-            
-            # Попытка преобразовать в число
-            try:
-                return (1, float(value))
-            except ValueError:
-                pass
-            
-            # Попытка преобразовать в дату
-            try:
-                # Формат: YYYY-MM-DD или YYYY-MM-DD HH:MM:SS
-                if ' ' in value:
-                    dt = datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-                else:
-                    dt = datetime.strptime(value, '%Y-%m-%d')
-                return (2, dt)
-            except ValueError:
-                pass
-            
-            # Строка
-            return (3, str(value).lower())
-        
-        # Сортируем
-        items.sort(key=lambda x: try_convert(x[0]), reverse=(sort_state['direction'] == 'desc'))
+        # Большая таблица сортируется запросом к БД с загрузкой первой страницы
+        if self._server_order(table_name) is not None:
+            self.tree_adapters[table_name].clear_sort()
+            self.update_sort_indicators(table_name)
+            self._reload_table(table_name)
+            return
         
-        # Перемещаем элементы в отсортированном порядке
-        for index, (val, item) in enumerate(items):
-            tree.move(item, '', index)
+        self._apply_column_sort(table_name)
         
         # Обновляем заголовки столбцов с индикаторами
         self.update_sort_indicators(table_name)
     
+    def _apply_column_sort(self, table_name):
+        """Сортировка строк адаптера по текущему столбцу из sort_states"""
+        sort_state = self.sort_states[table_name]
+        column = sort_state['column']
+        if not column:
+            return
+        col_index = self.tree_mapping[table_name]['columns'].index(column)
+        # Сортируем строки адаптера по ключам, соответствующим типу столбца
+        column_type = TABLES_CONFIG[table_name].get('column_types', {}).get(column, 'text')
+        self.tree_adapters[table_name].sort_by_column(
+            col_index, column_type, reverse=(sort_state['direction'] == 'desc')
+        )
+    
     def update_sort_indicators(self, table_name):
         """Обновление индикаторов направления сортировки в заголовках"""
         tree = self.tree_mapping.get(table_name)
@@ -1269,9 +1378,14 @@ class ToolManagementApp:
         self.load_addresses()
     
     def _load_treeview_data(self, table_name, tree, data_func, search_widget=None, 
-                            item_processor=None, post_load_callback=None):
+                            item_processor=None, post_load_callback=None, query_key=None,
+                            server_sort=False):
         """Универсальный метод загрузки данных в Treeview
         
+        Запрос к БД выполняется в фоновом потоке, таблица заполняется в потоке Tk
+        по готовности. Если до завершения запущена новая загрузка той же таблицы
+        (например, при вводе следующего символа поиска), старый результат отбрасывается.
+        
         Args:
             table_name: имя таблицы для сортировки
             tree: виджет Treeview
@@ -1279,18 +1393,165 @@ class ToolManagementApp:
             search_widget: виджет поиска (опционально)
             item_processor: функция обработки каждого элемента (опционально), возвращает (values, tags)
             post_load_callback: функция вызываемая после загрузки (опционально)
+            query_key: параметры запроса (фильтры); при повторной загрузке с теми же
+                параметрами таблица обновляется сверкой строк, а не заполняется заново
+            server_sort: data_func принимает order_by, direction, limit и offset; большая
+                таблица сортируется в БД и загружается страницами (см. _fetch_rows)
         """
-        # Очистка таблицы
-        for item in tree.get_children():
-            tree.delete(item)
-        
-        # Получаем данные
+        # Текст поиска читаем в потоке Tk до передачи запроса в фоновый поток
         if search_widget:
-            data = data_func(search_widget.get())
+            search_text = search_widget.get()
+            query = lambda **kwargs: data_func(search_text, **kwargs)
+            query_key = (query_key, search_text)
         else:
-            data = data_func()
+            query = data_func
+        fetch = query
+        
+        if server_sort:
+            order = self._server_order(table_name, check_size=False)
+            page = {}
+            fetch = lambda: self._fetch_rows(table_name, query, order, page)
+            query_key = (query_key, order and (order['order_by'], order['direction']))
+            self.loader.cancel(table_name + '_more')
+        
+        def on_loaded(data):
+            self._set_loading(table_name, tree, False)
+            if server_sort:
+                self._store_server_page(table_name, page, item_processor)
+            # Тот же запрос (обновление после выдачи, возврата, правки) - сверка строк
+            # с сохранением выделения и прокрутки; новый запрос - заполнение с начала
+            refresh = self.table_queries.get(table_name, object()) == query_key
+            self.table_queries[table_name] = query_key
+            self._fill_treeview(table_name, tree, data, item_processor, refresh=refresh)
+            
+            # Вызываем постобработку
+            if post_load_callback:
+                post_load_callback()
+        
+        def on_error(error):
+            self._set_loading(table_name, tree, False)
+            print(f"❌ Ошибка загрузки данных ({table_name}): {error}")
+        
+        self._set_loading(table_name, tree, True)
+        self.loader.submit(table_name, fetch, on_loaded, on_error)
+    
+    # ========== СОРТИРОВКА НА СТОРОНЕ БД ==========
+    
+    def _server_order(self, table_name, check_size=True):
+        """Параметры сортировки в БД для текущего столбца или None
+        
+        Сортировка передается в БД только для столбцов из 'sort_fields' при
+        выборке больше SERVER_SORT_THRESHOLD строк; небольшие выборки
+        загружаются целиком и сортируются в интерфейсе.
+        
+        Args:
+            check_size: сравнивать с порогом размер последней загруженной выборки;
+                при загрузке (check_size=False) размер выборки проверяет _fetch_rows
+        """
+        sort_state = self.sort_states[table_name]
+        field = TABLES_CONFIG[table_name].get('sort_fields', {}).get(sort_state['column'])
+        if field is None:
+            return None
+        if check_size and self.table_sizes.get(table_name, 0) <= SERVER_SORT_THRESHOLD:
+            return None
+        
+        # При обновлении того же запроса загружаем столько строк, сколько уже показано
+        limit = SERVER_PAGE_SIZE
+        state = self.server_pages.get(table_name)
+        if state and (state['order']['order_by'], state['order']['direction']) == (field, sort_state['direction']):
+            limit = max(limit, state['count'])
+        return {'order_by': field, 'direction': sort_state['direction'], 'limit': limit}
+    
+    def _fetch_rows(self, table_name, query, order, page):
+        """Загрузка строк таблицы в фоновом потоке
+        
+        Args:
+            query: функция запроса к БД с параметрами order_by, direction, limit, offset
+                и count (количество строк выборки с теми же фильтрами)
+            order: параметры сортировки из _server_order (None - вся выборка)
+            page: словарь для передачи размера выборки и состояния страниц в поток Tk
+        """
+        page['size'] = query(count=True)
+        # Загрузка заменена более новой, пока выполнялся подсчет строк
+        if self.loader.is_superseded():
+            return []
+        if order is None or page['size'] <= SERVER_SORT_THRESHOLD:
+            return query(limit=None)
+        
+        rows = query(**order)
+        page['state'] = {
+            'query': query,
+            'order': order,
+            'count': len(rows),
+            'done': len(rows) < order['limit'],
+        }
+        return rows
+    
+    def _store_server_page(self, table_name, page, item_processor):
+        """Сохранение результата _fetch_rows в потоке Tk"""
+        if 'size' in page:
+            self.table_sizes[table_name] = page['size']
+        state = page.get('state')
+        if state is None:
+            self.server_pages.pop(table_name, None)
+            # Выборка загружена целиком: сортировка, снятая при сортировке в БД,
+            # снова выполняется в интерфейсе по выбранному столбцу
+            self._apply_column_sort(table_name)
+            return
+        state['processor'] = item_processor
+        self.server_pages[table_name] = state
+        # Строки уже упорядочены в БД
+        self.tree_adapters[table_name].clear_sort()
+    
+    def load_more_rows(self, table_name):
+        """Подгрузка следующей страницы таблицы, отсортированной в БД"""
+        state = self.server_pages.get(table_name)
+        key = table_name + '_more'
+        if state is None or state['done'] or self.loader.is_loading(key):
+            return
         
-        # Вставка данных
+        order = dict(state['order'], limit=SERVER_PAGE_SIZE, offset=state['count'])
+        
+        def on_loaded(rows):
+            if self.server_pages.get(table_name) is not state:
+                return
+            state['count'] += len(rows)
+            state['done'] = len(rows) < SERVER_PAGE_SIZE
+            self.tree_adapters[table_name].append_rows(self._process_rows(rows, state['processor']))
+        
+        self.loader.submit(key, lambda: state['query'](**order), on_loaded)
+    
+    def _reload_table(self, table_name):
+        """Повторная загрузка таблицы (например, с новой сортировкой в БД)"""
+        loaders = {
+            'instruments': self.load_instruments,
+            'employees': self.load_employees,
+            'issues': self.load_active_issues,
+            'history': self.load_history,
+        }
+        loaders[table_name]()
+    
+    def _fill_treeview(self, table_name, tree, data, item_processor=None, refresh=False):
+        """Заполнение Treeview загруженными данными
+        
+        Текущая сортировка запоминается адаптером таблицы и применяется к новым строкам.
+        
+        Args:
+            refresh: обновить строки сверкой по ID вместо полного заполнения
+        """
+        adapter = self.tree_adapters[table_name]
+        rows = self._process_rows(data, item_processor)
+        if refresh:
+            adapter.update_rows(rows)
+        else:
+            adapter.set_rows(rows)
+        
+        self.update_sort_indicators(table_name)
+    
+    @staticmethod
+    def _process_rows(data, item_processor=None):
+        """Преобразование записей БД в строки таблицы (values, tags)"""
+        rows = []
         for item_data in data:
             tags = ()
             values = item_data
@@ -1300,19 +1561,24 @@ class ToolManagementApp:
                     values, tags = result
                 else:
                     values = result
-            
-            tree.insert('', tk.END, values=values, tags=tags)
-        
-        # Применяем текущую сортировку
-        sort_state = self.sort_states[table_name]
-        if sort_state['column']:
-            self.sort_treeview(table_name, sort_state['column'], toggle_direction=False)
-        else:
-            self.update_sort_indicators(table_name)
-        
-        # Вызываем постобработку
-        if post_load_callback:
-            post_load_callback()
+            rows.append((values, tags))
+        return rows
+    
+    def _set_loading(self, table_name, tree, loading):
+        """Показ или скрытие индикатора загрузки поверх таблицы"""
+        label = self.loading_labels.get(table_name)
+        if loading:
+            if label is None:
+                label = tk.Label(
+                    tree.master, text="⏳ Загрузка...",
+                    bg=self.office_colors['bg_white'], fg=self.office_colors['fg_secondary'],
+                    font=self.default_font, padx=10, pady=4
+                )
+                self.loading_labels[table_name] = label
+            label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+            label.lift()
+        elif label is not None:
+            label.place_forget()
         
     def load_instruments(self):
         """Загрузка списка инструментов"""
@@ -1340,9 +1606,10 @@ class ToolManagementApp:
         self._load_treeview_data(
             'instruments', 
             self.instruments_tree, 
-            lambda search: self.db.get_instruments(search),
+            lambda search, **order: self.db.get_instruments(search, **order),
             getattr(self, 'instrument_search', None),
-            item_processor=process_item
+            item_processor=process_item,
+            server_sort=True
         )
             
     def search_by_barcode(self):
@@ -1359,11 +1626,11 @@ class ToolManagementApp:
         instrument = barcode_manager.search_by_barcode(barcode, self.db)
 
         if instrument:
-            # Очищаем таблицу
-            for item in self.instruments_tree.get_children():
-                self.instruments_tree.delete(item)
-
-            # Добавляем найденный инструмент
+            # Незавершенная загрузка списка не должна заменить результат поиска
+            self.loader.cancel('instruments')
+            self._set_loading('instruments', self.instruments_tree, False)
+            
+            # Показываем в таблице только найденный инструмент
             values = (
                 instrument['id'],
                 instrument['name'],
@@ -1373,7 +1640,9 @@ class ToolManagementApp:
                 instrument['category'],
                 instrument['status']
             )
-            self.instruments_tree.insert('', 'end', values=values)
+            self.tree_adapters['instruments'].set_rows([(values, ())])
+            self.table_queries.pop('instruments', None)
+            self.server_pages.pop('instruments', None)
 
             # Очищаем поле поиска
             self.barcode_search.delete(0, tk.END)
@@ -1409,9 +1678,10 @@ class ToolManagementApp:
         self._load_treeview_data(
             'employees',
             self.employees_tree,
-            lambda search: self.db.get_employees(search),
+            lambda search, **order: self.db.get_employees(search, **order),
             getattr(self, 'employee_search', None),
-            item_processor=process_item
+            item_processor=process_item,
+            server_sort=True
         )
             
     def load_active_issues(self):
@@ -1457,7 +1727,8 @@ class ToolManagementApp:
             self.issues_tree,
             self.db.get_active_issues,
             item_processor=process_item,
-            post_load_callback=post_load
+            post_load_callback=post_load,
+            server_sort=True
         )
         
     def load_active_issues_for_return(self):
@@ -1502,12 +1773,8 @@ class ToolManagementApp:
             item_processor=process_item
         )
             
-    def load_history(self):
-        """Загрузка журнала операций"""
-        def process_item(record):
-            tags = ('issue',) if record[1] == 'Выдача' else ('return',)
-            return record, tags
-        
+    def _get_history_filters(self):
+        """Текущие фильтры журнала операций: (тип, текст поиска, дата с, дата по)"""
         filter_type = getattr(self, 'history_filter', None)
         filter_value = filter_type.get() if filter_type else 'Все'
         search_text = getattr(self, 'history_search', None)
@@ -1525,16 +1792,85 @@ class ToolManagementApp:
             if date_to_val:
                 date_to = date_to_val.strftime('%Y-%m-%d')
         
+        return filter_value, search_value, date_from, date_to
+    
+    @staticmethod
+    def _process_history_record(record):
+        """Теги строки журнала операций по типу операции"""
+        tags = ('issue',) if record[1] == 'Выдача' else ('return',)
+        return record, tags
+    
+    def load_history(self):
+        """Загрузка первой страницы журнала операций
+        
+        Следующие страницы подгружаются при прокрутке (load_more_history).
+        В порядке по умолчанию страницы читаются по курсору (дата, ID), при
+        сортировке большого журнала по столбцу - запросом с ORDER BY в БД.
+        """
+        filters = self._get_history_filters()
+        order = self._server_order('history', check_size=False)
+        # До получения первой страницы продолжать нечего
+        self.loader.cancel('history_more')
+        self.history_cursor = None
+        page = {}
+        
+        def query(**kwargs):
+            filter_type, search_text, date_from, date_to = filters
+            return self.db.get_operation_history(
+                filter_type, search_text=search_text, date_from=date_from, date_to=date_to, **kwargs
+            )
+        
+        def fetch():
+            if order is not None:
+                return self._fetch_rows('history', query, order, page)
+            page['size'] = query(count=True)
+            if self.loader.is_superseded():
+                return []
+            history, page['cursor'] = self.db.get_operation_history_page(
+                *filters, page_size=HISTORY_PAGE_SIZE
+            )
+            return history
+        
+        def post_load():
+            self.history_filters = filters
+            self.history_cursor = page.get('cursor')
+            self._store_server_page('history', page, self._process_history_record)
+        
         self._load_treeview_data(
             'history',
             self.history_tree,
-            lambda: self.db.get_operation_history(
-                filter_value, 
-                search_text=search_value,
-                date_from=date_from,
-                date_to=date_to
-            ),
-            item_processor=process_item
+            fetch,
+            item_processor=self._process_history_record,
+            post_load_callback=post_load,
+            query_key=(filters, order and (order['order_by'], order['direction']))
+        )
+    
+    def load_more_history(self):
+        """Подгрузка следующей страницы журнала операций при прокрутке к концу"""
+        if 'history' in self.server_pages:
+            self.load_more_rows('history')
+            return
+        if getattr(self, 'history_cursor', None) is None or self.loader.is_loading('history_more'):
+            return
+        
+        filters = self.history_filters
+        cursor = self.history_cursor
+        
+        def on_loaded(page):
+            history, self.history_cursor = page
+            self.tree_adapters['history'].append_rows(
+                self._process_rows(history, self._process_history_record)
+            )
+            
+            # Сохраняем пользовательскую сортировку с учетом новых строк
+            sort_state = self.sort_states['history']
+            if history and sort_state['column']:
+                self.sort_treeview('history', sort_state['column'], toggle_direction=False)
+        
+        self.loader.submit(
+            'history_more',
+            lambda: self.db.get_operation_history_page(*filters, page_size=HISTORY_PAGE_SIZE, after=cursor),
+            on_loaded
         )
     
     def reset_history_dates(self):
@@ -1563,12 +1899,18 @@ class ToolManagementApp:
         
     def _get_selected_item_id(self, tree, warning_message):
         """Получение ID выбранного элемента из таблицы"""
-        selected = tree.selection()
-        if not selected:
-            messagebox.showwarning("Предупреждение", warning_message)
-            return None
-        item = tree.item(selected[0])
-        return item['values'][0]
+        adapter = next((a for a in self.tree_adapters.values() if a.tree is tree), None)
+        if adapter is not None:
+            # Выбранная строка могла быть прокручена за пределы созданных элементов
+            selected = adapter.selection()
+            if selected:
+                return selected[0][0]
+        else:
+            selected = tree.selection()
+            if selected:
+                return tree.item(selected[0])['values'][0]
+        messagebox.showwarning("Предупреждение", warning_message)
+        return None
     
     def _delete_item(self, tree, item_id, delete_func, success_message, error_message, reload_func):
         """Универсальный метод удаления элемента"""
@@ -1779,31 +2121,13 @@ class ToolManagementApp:
             exporter = PDFExporter()
             
             # Получаем данные журнала операций с учетом фильтров
-            filter_type = getattr(self, 'history_filter', None)
-            filter_value = filter_type.get() if filter_type else 'Все'
-            search_text = getattr(self, 'history_search', None)
-            search_value = search_text.get() if search_text else ''
-            
-            # Получаем диапазон дат
-            date_from = None
-            date_to = None
-            if hasattr(self, 'history_date_from'):
-                date_from_val = self.history_date_from.get_date()
-                if date_from_val:
-                    date_from = date_from_val.strftime('%Y-%m-%d')
-            if hasattr(self, 'history_date_to'):
-                date_to_val = self.history_date_to.get_date()
-                if date_to_val:
-                    date_to = date_to_val.strftime('%Y-%m-%d')
-            
-            history = self.db.get_operation_history(
-                filter_value, 
-                search_text=search_value,
-                date_from=date_from,
-                date_to=date_to
-            )
+            filters = self._get_history_filters()
+            filter_value = filters[0]
             
-            if not history:
+            # Проверяем наличие записей по первой строке, сами записи
+            # передаются экспортеру постранично, без загрузки всего журнала в память
+            first_page, _ = self.db.get_operation_history_page(*filters, page_size=1)
+            if not first_page:
                 messagebox.showwarning(
                     "Предупреждение", 
                     "Нет данных для экспорта. Нет записей в журнале операций."
@@ -1811,7 +2135,7 @@ class ToolManagementApp:
                 return
             
             # Экспортируем в PDF
-            exporter.export_history_journal(history, filename, filter_value)
+            exporter.export_history_journal(self.db.iter_operation_history(*filters), filename, filter_value)
             
             messagebox.showinfo(
                 "Успех", 
@@ -1841,31 +2165,13 @@ class ToolManagementApp:
             exporter = ExcelExporter()
             
             # Получаем данные журнала операций с учетом фильтров
-            filter_type = getattr(self, 'history_filter', None)
-            filter_value = filter_type.get() if filter_type else 'Все'
-            search_text = getattr(self, 'history_search', None)
-            search_value = search_text.get() if search_text else ''
-            
-            # Получаем диапазон дат
-            date_from = None
-            date_to = None
-            if hasattr(self, 'history_date_from'):
-                date_from_val = self.history_date_from.get_date()
-                if date_from_val:
-                    date_from = date_from_val.strftime('%Y-%m-%d')
-            if hasattr(self, 'history_date_to'):
-                date_to_val = self.history_date_to.get_date()
-                if date_to_val:
-                    date_to = date_to_val.strftime('%Y-%m-%d')
-            
-            history = self.db.get_operation_history(
-                filter_value, 
-                search_text=search_value,
-                date_from=date_from,
-                date_to=date_to
-            )
+            filters = self._get_history_filters()
+            filter_value = filters[0]
             
-            if not history:
+            # Проверяем наличие записей по первой строке, сами записи
+            # передаются экспортеру постранично, без загрузки всего журнала в память
+            first_page, _ = self.db.get_operation_history_page(*filters, page_size=1)
+            if not first_page:
                 messagebox.showwarning(
                     "Предупреждение", 
                     "Нет данных для экспорта. Нет записей в журнале операций."
@@ -1873,7 +2179,7 @@ class ToolManagementApp:
                 return
             
             # Экспортируем в Excel
-            exporter.export_history_journal(history, filename, filter_value)
+            exporter.export_history_journal(self.db.iter_operation_history(*filters), filename, filter_value)
             
             messagebox.showinfo(
                 "Успех", 
@@ -1934,22 +2240,10 @@ class ToolManagementApp:
                 elif data_type == 'issues':
                     data = self.db.get_active_issues()
                 elif data_type == 'history':
-                    filter_type = getattr(self, 'history_filter', None)
-                    filter_value = filter_type.get() if filter_type else 'Все'
-                    search_text = getattr(self, 'history_search', None)
-                    search_value = search_text.get() if search_text else ''
-                    date_from = None
-                    date_to = None
-                    if hasattr(self, 'history_date_from'):
-                        date_from_val = self.history_date_from.get_date()
-                        if date_from_val:
-                            date_from = date_from_val.strftime('%Y-%m-%d')
-                    if hasattr(self, 'history_date_to'):
-                        date_to_val = self.history_date_to.get_date()
-                        if date_to_val:
-                            date_to = date_to_val.strftime('%Y-%m-%d')
-                    data = self.db.get_operation_history(filter_value, search_text=search_value,
-                                                       date_from=date_from, date_to=date_to)
+                    # Журнал передается экспортеру постранично
+                    filters = self._get_history_filters()
+                    first_page, _ = self.db.get_operation_history_page(*filters, page_size=1)
+                    data = self.db.iter_operation_history(*filters) if first_page else []
 
                 if not data:
                     messagebox.showwarning("Предупреждение", "Нет данных для экспорта.")
@@ -2021,22 +2315,10 @@ class ToolManagementApp:
                 elif data_type == 'issues':
                     data = self.db.get_active_issues()
                 elif data_type == 'history':
-                    filter_type = getattr(self, 'history_filter', None)
-                    filter_value = filter_type.get() if filter_type else 'Все'
-                    search_text = getattr(self, 'history_search', None)
-                    search_value = search_text.get() if search_text else ''
-                    date_from = None
-                    date_to = None
-                    if hasattr(self, 'history_date_from'):
-                        date_from_val = self.history_date_from.get_date()
-                        if date_from_val:
-                            date_from = date_from_val.strftime('%Y-%m-%d')
-                    if hasattr(self, 'history_date_to'):
-                        date_to_val = self.history_date_to.get_date()
-                        if date_to_val:
-                            date_to = date_to_val.strftime('%Y-%m-%d')
-                    data = self.db.get_operation_history(filter_value, search_text=search_value,
-                                                       date_from=date_from, date_to=date_to)
+                    # Журнал передается экспортеру постранично
+                    filters = self._get_history_filters()
+                    first_page, _ = self.db.get_operation_history_page(*filters, page_size=1)
+                    data = self.db.iter_operation_history(*filters) if first_page else []
 
                 if not data:
                     messagebox.showwarning("Предупреждение", "Нет данных для экспорта.")
@@ -2069,6 +2351,13 @@ class ToolManagementApp:
     def _on_closing(self):
         """Обработка закрытия окна - сохраняем геометрию перед выходом"""
         try:
+            # Останавливаем отложенный поиск и фоновую загрузку данных
+            self.search.cancel_all()
+            self.loader.shutdown()
+            if self.notification_manager:
+                self.notification_manager.set_pending_callback(None)
+            self.notification_toast.hide()
+
             # Отменяем все отложенные задачи
             if hasattr(self, '_save_geometry_job') and self._save_geometry_job:
                 try:
@@ -2098,6 +2387,9 @@ class ToolManagementApp:
             # Сохраняем геометрию всех открытых диалогов
             save_all_dialogs_geometry()
 
+            # Закрываем соединения с базой данных
+            self.db.close()
+
         except Exception as e:
             print(f"Ошибка при подготовке к закрытию: {e}")
 
@@ -2378,8 +2670,11 @@ class ToolManagementApp:
             if not filename:
                 return  # Пользователь отменил
             
-            # Копируем файл базы данных
-            shutil.copy2(db_path, filename)
+            # Копия средствами SQLite включает изменения из журнала WAL
+            success, message = self.db.backup_to(filename)
+            if not success:
+                messagebox.showerror("Ошибка", message)
+                return
             
             # Получаем размер файла
             file_size = os.path.getsize(filename) / (1024 * 1024)  # Размер в МБ
@@ -2437,21 +2732,27 @@ class ToolManagementApp:
                 )
                 return
             
-            db_path = 'tool_management.db'
-            
-            # Создаем резервную копию текущей базы данных перед восстановлением
+            # Создаем резервную копию текущей базы данных перед восстановлением,
+            # вместе с изменениями, еще находящимися в журнале WAL
             backup_path = f"tool_management_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            if os.path.exists(db_path):
-                shutil.copy2(db_path, backup_path)
-            
-            # Закрываем все возможные соединения с базой данных
-            # SQLite автоматически закроет соединения при замене файла
+            success, message = self.db.backup_to(backup_path)
+            if not success:
+                messagebox.showerror("Ошибка", f"{message}\n\nВосстановление отменено.")
+                return
             
-            # Копируем резервную копию на место основной базы данных
-            shutil.copy2(filename, db_path)
+            # Содержимое базы заменяется средствами SQLite: журнал WAL и соединения
+            # других потоков (Telegram бот) остаются согласованными
+            success, message = self.db.restore_from(filename)
+            if not success:
+                messagebox.showerror(
+                    "Ошибка",
+                    f"{message}\n\nТекущая база данных не изменена, копия: {backup_path}"
+                )
+                return
             
-            # Пересоздаем соединение с базой данных
-            self.db = DatabaseManager()
+            # Пересоздаем соединение с базой данных (миграции восстановленной схемы)
+            self.db.close()
+            self._replace_database()
             
             # Обновляем все таблицы
             self.load_instruments()
@@ -2460,6 +2761,8 @@ class ToolManagementApp:
             self.load_active_issues_for_return()
             self.load_history()
             self.load_addresses()
+            self.load_statistics()
+            self.load_analytics()
             
             messagebox.showinfo(
                 "Успех",
@@ -2475,10 +2778,32 @@ class ToolManagementApp:
             )
             # Пытаемся пересоздать соединение с базой данных
             try:
-                self.db = DatabaseManager()
+                self._replace_database()
             except:
                 pass
     
+    def _replace_database(self):
+        """Пересоздание DatabaseManager после замены файла базы данных
+        
+        Менеджер уведомлений переключается на новый экземпляр: иначе он читал бы
+        закрытый экземпляр и не узнавал о новых выдачах и возвратах.
+        """
+        self.db = DatabaseManager()
+        self.db.enable_cache(QUERY_CACHE_SIZE)
+        if self.notification_manager:
+            self.notification_manager.set_database(self.db)
+    
+    def rebuild_summary_data(self):
+        """Пересчет счетчиков статистики и сводных таблиц по текущим данным"""
+        results = [self.db.rebuild_stat_counters(), self.db.rebuild_rollups()]
+        message = "\n".join(text for _, text in results)
+        if all(success for success, _ in results):
+            self._refresh_lazy_tab('statistics')
+            self._refresh_lazy_tab('analytics')
+            messagebox.showinfo("Успех", message)
+        else:
+            messagebox.showerror("Ошибка", message)
+
     def export_to_csv(self):
         """Экспорт данных в CSV формат"""
         try:
@@ -2990,7 +3315,7 @@ class ToolManagementApp:
         # Создаем диалог настройки
         dialog = tk.Toplevel(self.root)
         dialog.title("Настройки уведомлений")
-        dialog.geometry("500x500")
+        dialog.geometry("500x620")
         dialog.resizable(False, False)
         dialog.transient(self.root)
         dialog.grab_set()
@@ -3041,12 +3366,22 @@ class ToolManagementApp:
         critical_spin = tk.Spinbox(timing_frame, from_=1, to=30, textvariable=critical_days_var, width=5)
         critical_spin.pack(anchor=tk.W, pady=(0, 10))
 
+        ttk.Label(timing_frame, text="Повторять уведомление о просрочке через часов (0 - не повторять):").pack(anchor=tk.W)
+        renotify_overdue_var = tk.IntVar(value=settings.get('renotify_overdue_hours', 24))
+        tk.Spinbox(timing_frame, from_=0, to=168, textvariable=renotify_overdue_var, width=5).pack(anchor=tk.W, pady=(0, 10))
+
+        ttk.Label(timing_frame, text="Повторять уведомление о критической просрочке через часов:").pack(anchor=tk.W)
+        renotify_critical_var = tk.IntVar(value=settings.get('renotify_critical_hours', 8))
+        tk.Spinbox(timing_frame, from_=0, to=168, textvariable=renotify_critical_var, width=5).pack(anchor=tk.W, pady=(0, 10))
+
         # Статус системы уведомлений
         status_frame = ttk.LabelFrame(main_frame, text="Статус системы", padding="10")
         status_frame.pack(fill=tk.X, pady=(0, 20))
 
         # Получаем информацию о просрочках
         overdue_summary = self.notification_manager.get_overdue_summary()
+        next_check = self.notification_manager.get_next_check_time()
+        next_check_text = next_check.strftime('%d.%m.%Y %H:%M') if next_check else "при выдаче или возврате"
 
         status_text = f"""Система уведомлений: {'✅ Активна' if self.notification_manager.is_running else '❌ Не активна'}
 
@@ -3055,7 +3390,7 @@ class ToolManagementApp:
 • Критических просрочек: {overdue_summary['critical_overdue']}
 • Предстоящих возвратов: {overdue_summary['upcoming_deadlines']}
 
-Интервал проверки: {self.notification_manager.check_interval // 60} мин"""
+Следующая плановая проверка: {next_check_text}"""
 
         status_label = ttk.Label(status_frame, text=status_text, justify=tk.LEFT)
         status_label.pack(anchor=tk.W)
@@ -3070,6 +3405,8 @@ class ToolManagementApp:
                 'enable_telegram_notifications': telegram_var.get(),
                 'overdue_warning_days': warning_days_var.get(),
                 'overdue_critical_days': critical_days_var.get(),
+                'renotify_overdue_hours': renotify_overdue_var.get(),
+                'renotify_critical_hours': renotify_critical_var.get(),
             }
 
             self.notification_manager.update_settings(new_settings)
@@ -3309,11 +3646,10 @@ class ToolManagementApp:
             print(f"❌ Ошибка переключения темы: {e}")
 
     def load_analytics(self):
-        """Загрузка данных аналитики"""
-        # Этот метод будет вызван при обновлении вкладки аналитики
-        pass
+        """Обновление данных и графиков аналитики"""
+        self._refresh_lazy_tab('analytics')
 
-    def _create_issues_returns_chart(self, parent):
+    def _create_issues_returns_chart(self, parent, analytics):
         """График выдач и возвратов по месяцам"""
         try:
             import matplotlib.pyplot as plt
@@ -3330,8 +3666,6 @@ class ToolManagementApp:
             error_label.pack(pady=20)
             return
 
-        # Получаем данные
-        analytics = self.db.get_analytics_data()
         if not analytics:
             no_data_label = tk.Label(
                 parent,
@@ -3397,8 +3731,8 @@ class ToolManagementApp:
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def _create_active_trend_chart(self, parent):
-        """График динамики активных выдач"""
+    def _create_active_trend_chart(self, parent, analytics):
+        """График динамики активных выдач с выбором периода"""
         try:
             import matplotlib.pyplot as plt
             from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
@@ -3414,9 +3748,48 @@ class ToolManagementApp:
             error_label.pack(pady=20)
             return
 
-        # Получаем данные
-        analytics = self.db.get_analytics_data()
-        if not analytics or not analytics['active_issues_trend']:
+        # Выбор периода: 30 дней входят в снимок аналитики, остальные периоды
+        # загружаются отдельным запросом
+        period_frame = tk.Frame(parent, bg=self.office_colors['bg_white'])
+        period_frame.pack(fill=tk.X)
+        chart_frame = tk.Frame(parent, bg=self.office_colors['bg_white'])
+        chart_frame.pack(fill=tk.BOTH, expand=True)
+
+        period_var = tk.IntVar(value=self.active_trend_days)
+
+        def on_period_changed():
+            days = period_var.get()
+            self.active_trend_days = days
+            self.loader.submit(
+                'active_trend',
+                lambda: self.db.get_active_issues_trend(days),
+                lambda trend: self._draw_active_trend(chart_frame, trend, days)
+            )
+
+        tk.Label(
+            period_frame, text="Период:", bg=self.office_colors['bg_white'],
+            fg=self.office_colors['fg_main'], font=self.default_font
+        ).pack(side=tk.LEFT, padx=(0, 5))
+        for days in ACTIVE_TREND_PERIODS:
+            ttk.Radiobutton(
+                period_frame, text=f"{days} дней", value=days,
+                variable=period_var, command=on_period_changed
+            ).pack(side=tk.LEFT, padx=5)
+
+        if self.active_trend_days == ACTIVE_TREND_PERIODS[0]:
+            self._draw_active_trend(chart_frame, analytics.get('active_issues_trend'), self.active_trend_days)
+        else:
+            on_period_changed()
+
+    def _draw_active_trend(self, parent, trend, days):
+        """Построение графика динамики активных выдач за days дней"""
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        for child in parent.winfo_children():
+            child.destroy()
+
+        if not trend:
             no_data_label = tk.Label(
                 parent,
                 text="Недостаточно данных для построения графика",
@@ -3439,28 +3812,33 @@ class ToolManagementApp:
         dates = []
         active_counts = []
 
-        for date_str, count in analytics['active_issues_trend']:
+        for date_str, count in trend:
             dates.append(date_str)
             active_counts.append(count)
 
-        # Строим график
-        ax.plot(dates, active_counts, marker='o', linewidth=2, color='#4472C4', markersize=4)
+        # Строим график; на длинных периодах без маркеров точек
+        marker = 'o' if days <= 31 else None
+        ax.plot(dates, active_counts, marker=marker, linewidth=2, color='#4472C4', markersize=4)
         ax.fill_between(dates, active_counts, alpha=0.3, color='#4472C4')
 
         ax.set_xlabel('Дата')
         ax.set_ylabel('Количество активных выдач')
-        ax.set_title('Динамика активных выдач (последние 30 дней)')
+        ax.set_title(f'Динамика активных выдач (последние {days} дней)')
         ax.grid(True, alpha=0.3)
         ax.tick_params(axis='x', rotation=45)
+        # Подписываем не более 15 дат
+        step = max(1, len(dates) // 15)
+        ax.set_xticks(dates[::step])
 
         plt.tight_layout()
 
-        # Встраиваем в tkinter
+        # Встраиваем в tkinter; pyplot фигуру больше не отслеживает (перерисовка при смене периода)
         canvas = FigureCanvasTkAgg(fig, master=parent)
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        plt.close(fig)
 
-    def _create_overdue_chart(self, parent):
+    def _create_overdue_chart(self, parent, analytics):
         """Круговая диаграмма просроченных выдач по категориям"""
         try:
             import matplotlib.pyplot as plt
@@ -3476,8 +3854,6 @@ class ToolManagementApp:
             error_label.pack(pady=20)
             return
 
-        # Получаем данные
-        analytics = self.db.get_analytics_data()
         if not analytics or not analytics['overdue_by_category']:
             no_data_label = tk.Label(
                 parent,
@@ -3515,7 +3891,7 @@ class ToolManagementApp:
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def _create_addresses_chart(self, parent):
+    def _create_addresses_chart(self, parent, analytics):
         """Столбчатая диаграмма выдач по адресам"""
         try:
             import matplotlib.pyplot as plt
@@ -3531,8 +3907,6 @@ class ToolManagementApp:
             error_label.pack(pady=20)
             return
 
-        # Получаем данные
-        analytics = self.db.get_analytics_data()
         if not analytics or not analytics['issues_by_address']:
             no_data_label = tk.Label(
                 parent,
@@ -3579,7 +3953,7 @@ class ToolManagementApp:
         canvas.draw()
         canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
-    def _create_status_chart(self, parent):
+    def _create_status_chart(self, parent, analytics):
         """Круговая диаграмма статусов инструментов"""
         try:
             import matplotlib.pyplot as plt
@@ -3595,8 +3969,6 @@ class ToolManagementApp:
             error_label.pack(pady=20)
             return
 
-        # Получаем данные
-        analytics = self.db.get_analytics_data()
         if not analytics or not analytics['instrument_status_stats']:
             no_data_label = tk.Label(
                 parent,
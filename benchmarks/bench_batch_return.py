@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк массового возврата инструментов
+
+Сравнивает прежний возврат в цикле (SELECT и три запроса на каждую выдачу)
+с групповым возвратом DatabaseManager.return_instruments_batch.
+
+Запуск из корня проекта:
+    python benchmarks/bench_batch_return.py [размер_партии ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+
+def create_issues(db, count):
+    """Создание выданных инструментов, возвращает ID выдач"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    employee_id = cursor.execute("SELECT id FROM employees LIMIT 1").fetchone()[0]
+    first_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM instruments").fetchone()[0] + 1
+    cursor.executemany("""
+        INSERT INTO instruments (id, name, inventory_number, category, status)
+        VALUES (?, ?, ?, 'Ручной инструмент', 'Выдан')
+    """, [(first_id + i, f"Инструмент {first_id + i}", f"BENCH-{first_id + i}") for i in range(count)])
+    cursor.executemany("""
+        INSERT INTO issues (instrument_id, employee_id, expected_return_date, issued_by, status)
+        VALUES (?, ?, '2030-01-01', 'Бенчмарк', 'Выдан')
+    """, [(first_id + i, employee_id) for i in range(count)])
+    conn.commit()
+    issue_ids = [row[0] for row in cursor.execute(
+        "SELECT id FROM issues WHERE instrument_id >= ? ORDER BY id", (first_id,)
+    )]
+    conn.close()
+    return issue_ids
+
+
+def legacy_return_batch(db, issue_ids, notes, returned_by):
+    """Прежняя реализация: отдельные запросы для каждой выдачи"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    for issue_id in issue_ids:
+        cursor.execute("SELECT instrument_id, employee_id, status FROM issues WHERE id = ?", (issue_id,))
+        instrument_id, employee_id, status = cursor.fetchone()
+        if status != 'Выдан':
+            continue
+        cursor.execute("""
+            UPDATE issues
+            SET actual_return_date = CURRENT_TIMESTAMP,
+                status = 'Возвращен',
+                notes = CASE
+                    WHEN notes IS NULL OR notes = '' THEN ?
+                    ELSE notes || '; ' || ?
+                END
+            WHERE id = ?
+        """, (notes, notes, issue_id))
+        cursor.execute("UPDATE instruments SET status = 'Доступен' WHERE id = ?", (instrument_id,))
+        cursor.execute("""
+            INSERT INTO operation_history
+            (issue_id, operation_type, instrument_id, employee_id, performed_by, notes)
+            VALUES (?, 'Возврат', ?, ?, ?, ?)
+        """, (issue_id, instrument_id, employee_id, returned_by, notes))
+    conn.commit()
+    conn.close()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+
+    temp_dir = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(temp_dir, "bench.db"))
+
+    try:
+        print(f"   {'Выдач':>8}{'Цикл, мс':>12}{'Групповой, мс':>16}")
+        for size in sizes:
+            legacy_ms = timed(legacy_return_batch, db, create_issues(db, size), "Конец смены", "Бенчмарк")
+            batch_ms = timed(db.return_instruments_batch, create_issues(db, size), "Конец смены", "Бенчмарк")
+            print(f"   {size:>8}{legacy_ms:>12.1f}{batch_ms:>16.1f}")
+    finally:
+        db.close()
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пула соединений DatabaseManager
+
+Сравнивает задержку одного вызова при открытии соединения на каждый вызов
+(прежняя схема) и при использовании пула соединений.
+
+Запуск из корня проекта:
+    python benchmarks/bench_connection_pool.py [количество_вызовов]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+
+def connect_per_call(db_path):
+    """Прежняя схема: новое соединение и регистрация функций на каждый вызов"""
+    conn = sqlite3.connect(db_path)
+    conn.create_function("LOWER_PY", 1, lambda s: s.lower() if s else s)
+    return conn
+
+
+def measure(get_connection, calls):
+    """Среднее время одного вызова в микросекундах"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM issues WHERE status = 'Выдан'")
+        cursor.fetchone()
+        conn.close()
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, "bench.db")
+    db = DatabaseManager(db_path)
+
+    try:
+        before = measure(lambda: connect_per_call(db_path), calls)
+        after = measure(db.get_connection, calls)
+
+        print(f"📊 Вызовов: {calls}")
+        print(f"   Соединение на вызов: {before:8.1f} мкс")
+        print(f"   Пул соединений:      {after:8.1f} мкс")
+        print(f"   Ускорение:           {before / after:8.1f}x")
+    finally:
+        db.close()
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
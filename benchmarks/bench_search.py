@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска инструментов
+
+Сравнивает поиск через индекс FTS5 и прежний поиск через LOWER_PY(...) LIKE
+на синтетической базе.
+
+Запуск из корня проекта:
+    python benchmarks/bench_search.py [количество_инструментов]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+
+NAMES = ["Дрель", "Перфоратор", "Шуруповерт", "Болгарка", "Лобзик", "Рубанок", "Фрезер", "Гайковерт"]
+BRANDS = ["Makita", "Bosch", "DeWalt", "Metabo", "Интерскол", "Зубр"]
+QUERIES = ["перфоратор", "BOSCH", "INV-0123", "интерскол", "несуществующий"]
+
+
+def fill(db, count):
+    """Заполнение базы синтетическими инструментами"""
+    conn = db.get_connection()
+    conn.executemany("""
+        INSERT INTO instruments (name, inventory_number, serial_number, category, status)
+        VALUES (?, ?, ?, ?, 'Доступен')
+    """, (
+        (f"{NAMES[i % len(NAMES)]} {BRANDS[i % len(BRANDS)]} {i}",
+         f"INV-{i:06d}", f"SN-{i * 7:08d}", "Электроинструмент")
+        for i in range(count)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def measure(db, query, repeats=5):
+    """Среднее время поиска в миллисекундах и количество найденных строк"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        found = len(db.get_instruments(query))
+    return (time.perf_counter() - start) / repeats * 1000, found
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    temp_dir = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(temp_dir, "bench.db"))
+
+    try:
+        fill(db, count)
+
+        print(f"📊 Инструментов: {count}")
+        print(f"   {'Запрос':<16}{'Найдено':>9}{'FTS5, мс':>11}{'LIKE, мс':>11}")
+        for query in QUERIES:
+            db._fts_available = None
+            fts_ms, found = measure(db, query)
+            # Принудительно отключаем FTS5, чтобы измерить прежний путь через LIKE
+            db._fts_available = False
+            like_ms, _ = measure(db, query, repeats=1)
+            print(f"   {query:<16}{found:>9}{fts_ms:>11.2f}{like_ms:>11.2f}")
+    finally:
+        db.close()
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+        os.rmdir(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
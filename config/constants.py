@@ -108,6 +108,21 @@ EXPORT_DIR = "exports"
 DB_PATH = "tool_management.db"
 DB_BACKUP_DIR = "backups"
 
+# Профиль PRAGMA, применяемый к каждому соединению с БД.
+# WAL позволяет читателям (уведомления, Telegram-бот) не блокировать запись из GUI
+DB_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',        # в режиме WAL безопасно и быстрее FULL
+    'busy_timeout': 5000,           # мс ожидания снятия блокировки
+    'cache_size': -16000,           # кэш страниц, отрицательное значение - в КБ (16 МБ)
+    'mmap_size': 67108864,          # 64 МБ отображения файла в память
+    'temp_store': 'MEMORY',
+    # Политика контрольных точек: автоматическая точка каждые N страниц WAL
+    # и усечение файла WAL до указанного размера после нее
+    'wal_autocheckpoint': 1000,
+    'journal_size_limit': 16777216,  # 16 МБ
+}
+
 # Настройки экспорта
 PDF_PAGE_SIZE = "A4"
 PDF_MARGIN = 50
@@ -117,6 +132,20 @@ EXCEL_SHEET_NAME = "Отчет"
 MAX_PHOTO_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_SEARCH_RESULTS = 1000
 TREEVIEW_HEIGHT = 15
+TREEVIEW_BUFFER_ROWS = 50  # Строк запаса над и под видимой частью таблицы
+HISTORY_PAGE_SIZE = 200  # Записей журнала, подгружаемых за одну прокрутку
+QUERY_CACHE_SIZE = 256  # Результатов запросов в кэше DatabaseManager
+SERVER_SORT_THRESHOLD = 5000  # Строк в таблице, начиная с которых сортировка выполняется в БД
+SERVER_PAGE_SIZE = 500  # Строк, загружаемых за одну прокрутку при сортировке в БД
+SEARCH_DEBOUNCE_MS = 300  # Пауза ввода перед запуском поиска, мс
+SEARCH_MIN_LENGTH = 2  # Минимальная длина непустого текста поиска
+ACTIVE_TREND_PERIODS = (30, 90, 365)  # Периоды графика динамики активных выдач, дней
+NOTIFICATION_TOAST_MAX_ITEMS = 5  # Уведомлений, одновременно показываемых на панели
+NOTIFICATION_TOAST_HIDE_MS = 20000  # Время показа панели уведомлений после последнего уведомления, мс
+TELEGRAM_QUEUE_MAX_SIZE = 1000  # Сообщений в очереди отправки Telegram бота
+TELEGRAM_GLOBAL_RATE = 25  # Сообщений в секунду от бота во все чаты (лимит Telegram - 30)
+TELEGRAM_CHAT_RATE = 1  # Сообщений в секунду в один чат
+TELEGRAM_MAX_RETRIES = 3  # Повторов неудачной отправки сообщения
 
 # Сообщения
 MESSAGES = {
@@ -3,49 +3,617 @@
 """
 
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+import functools
+import copy
+from datetime import date, datetime, timedelta
 import os
 
+from config.constants import DB_PRAGMAS
+from query_cache import QueryCache
+from analytics_snapshot import AnalyticsSnapshot
+
+
+# Пересчет счетчиков статистики по текущему содержимому таблиц
+STAT_COUNTERS_REBUILD_SQL = """
+    DELETE FROM stat_counters;
+    INSERT INTO stat_counters(name, value)
+        SELECT 'instruments', COUNT(*) FROM instruments;
+    INSERT INTO stat_counters(name, value)
+        SELECT 'instruments_status:' || COALESCE(status, ''), COUNT(*)
+        FROM instruments GROUP BY COALESCE(status, '');
+    INSERT INTO stat_counters(name, value)
+        SELECT 'active_employees', COUNT(*) FROM employees WHERE status = 'Активен';
+    INSERT INTO stat_counters(name, value)
+        SELECT 'active_issues', COUNT(*) FROM issues WHERE status = 'Выдан';
+    INSERT INTO stat_counters(name, value)
+        SELECT 'operations', COUNT(*) FROM operation_history;
+"""
+
+
+def _counter_delta_sql(name_expr, delta_expr):
+    """SQL изменения счетчика stat_counters на величину delta_expr (для триггеров)"""
+    return (f"INSERT INTO stat_counters(name, value) VALUES ({name_expr}, {delta_expr}) "
+            f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;")
+
+
+def _table_version_triggers(table):
+    """Триггеры увеличения версии таблицы в table_versions при любом изменении строк"""
+    bump = (f"INSERT INTO table_versions(name, version) VALUES ('{table}', 1) "
+            f"ON CONFLICT(name) DO UPDATE SET version = version + 1;")
+    return "\n".join(
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_a{suffix} AFTER {event} ON {table} "
+        f"BEGIN {bump} END;"
+        for suffix, event in (('i', 'INSERT'), ('u', 'UPDATE'), ('d', 'DELETE'))
+    )
+
+
+# Сводные таблицы выдач: (таблица, ключевые столбцы, ключ события выдачи, ключ события возврата,
+# хранить ли минимум/максимум срока использования). {r} - строка issues (new/old в триггерах).
+# Выдача учитывается в день выдачи, возврат и срок использования - в день возврата.
+ROLLUP_TABLES = (
+    ('rollup_daily', ('day',),
+     ("date({r}.issue_date)",),
+     ("date({r}.actual_return_date)",), True),
+    ('rollup_employee', ('employee_id', 'month'),
+     ("COALESCE({r}.employee_id, 0)", "strftime('%Y-%m', {r}.issue_date)"),
+     ("COALESCE({r}.employee_id, 0)", "strftime('%Y-%m', {r}.actual_return_date)"), False),
+    ('rollup_instrument', ('instrument_id', 'month'),
+     ("COALESCE({r}.instrument_id, 0)", "strftime('%Y-%m', {r}.issue_date)"),
+     ("COALESCE({r}.instrument_id, 0)", "strftime('%Y-%m', {r}.actual_return_date)"), False),
+    ('rollup_address', ('day', 'address_id'),
+     ("date({r}.issue_date)", "COALESCE({r}.address_id, 0)"),
+     ("date({r}.actual_return_date)", "COALESCE({r}.address_id, 0)"), False),
+)
+
+_ROLLUP_ISSUE_WHEN = "{r}.issue_date IS NOT NULL"
+_ROLLUP_RETURN_WHEN = "{r}.actual_return_date IS NOT NULL AND {r}.issue_date IS NOT NULL"
+_ROLLUP_USAGE = "julianday({r}.actual_return_date) - julianday({r}.issue_date)"
+# Активные выдачи по сроку возврата: просрочка - диапазон due_date по первичному ключу
+_ROLLUP_DUE_KEY = ("COALESCE({r}.expected_return_date, '')", "COALESCE({r}.employee_id, 0)",
+                   "COALESCE({r}.instrument_id, 0)")
+
+
+def _rollup_delta_sql(row, sign):
+    """SQL изменения сводных таблиц на вклад строки issues row ('new'/'old') со знаком sign (+1/-1)"""
+    statements = []
+    for table, keys, issue_key, return_key, extremes in ROLLUP_TABLES:
+        key_list = ", ".join(keys)
+        issue_exprs = ", ".join(expr.format(r=row) for expr in issue_key)
+        return_exprs = ", ".join(expr.format(r=row) for expr in return_key)
+        usage = _ROLLUP_USAGE.format(r=row)
+        statements.append(
+            f"INSERT INTO {table}({key_list}, issues, returns, usage_days) "
+            f"SELECT {issue_exprs}, {sign}, 0, 0 WHERE {_ROLLUP_ISSUE_WHEN.format(r=row)} "
+            f"ON CONFLICT({key_list}) DO UPDATE SET issues = issues + excluded.issues;"
+        )
+        columns = f"{key_list}, issues, returns, usage_days"
+        values = f"{return_exprs}, 0, {sign}, {sign} * ({usage})"
+        updates = "returns = returns + excluded.returns, usage_days = usage_days + excluded.usage_days"
+        if extremes and sign > 0:
+            # Добавление только расширяет границы; после удаления они пересчитываются
+            columns += ", min_usage_days, max_usage_days"
+            values += f", {usage}, {usage}"
+            updates += (", min_usage_days = min(COALESCE(min_usage_days, excluded.min_usage_days), "
+                        "excluded.min_usage_days)"
+                        ", max_usage_days = max(COALESCE(max_usage_days, excluded.max_usage_days), "
+                        "excluded.max_usage_days)")
+        statements.append(
+            f"INSERT INTO {table}({columns}) "
+            f"SELECT {values} WHERE {_ROLLUP_RETURN_WHEN.format(r=row)} "
+            f"ON CONFLICT({key_list}) DO UPDATE SET {updates};"
+        )
+    due_exprs = ", ".join(expr.format(r=row) for expr in _ROLLUP_DUE_KEY)
+    statements.append(
+        f"INSERT INTO rollup_due(due_date, employee_id, instrument_id, active) "
+        f"SELECT {due_exprs}, {sign} WHERE {row}.status = 'Выдан' "
+        f"ON CONFLICT(due_date, employee_id, instrument_id) DO UPDATE SET active = active + excluded.active;"
+    )
+    return "\n".join(statements)
+
+
+def _rollup_extremes_sql(row):
+    """SQL пересчета минимума/максимума срока использования за день возврата строки row
+
+    Выполняется после удаления вклада строки: границы дня берутся из issues
+    по диапазону индекса idx_issues_actual_return.
+    """
+    usage = _ROLLUP_USAGE.format(r='i')
+    return (
+        f"UPDATE rollup_daily SET (min_usage_days, max_usage_days) = ("
+        f"SELECT MIN({usage}), MAX({usage}) FROM issues i "
+        f"WHERE i.actual_return_date >= date({row}.actual_return_date) "
+        f"AND i.actual_return_date < date({row}.actual_return_date, '+1 day') "
+        f"AND i.issue_date IS NOT NULL) "
+        f"WHERE day = date({row}.actual_return_date) AND {_ROLLUP_RETURN_WHEN.format(r=row)};"
+    )
+
+
+def _rollup_rebuild_sql():
+    """SQL полного пересчета сводных таблиц по содержимому issues"""
+    statements = []
+    for table, keys, issue_key, return_key, extremes in ROLLUP_TABLES:
+        aliases = [f"k{n}" for n in range(len(keys))]
+        issue_exprs = ", ".join(f"{expr.format(r='i')} AS {alias}"
+                                for expr, alias in zip(issue_key, aliases))
+        return_exprs = ", ".join(f"{expr.format(r='i')} AS {alias}"
+                                 for expr, alias in zip(return_key, aliases))
+        usage = _ROLLUP_USAGE.format(r='i')
+        columns = f"{', '.join(keys)}, issues, returns, usage_days"
+        totals = "SUM(issues), SUM(returns), TOTAL(usage)"
+        if extremes:
+            columns += ", min_usage_days, max_usage_days"
+            totals += ", MIN(usage), MAX(usage)"
+        statements.append(f"""
+    DELETE FROM {table};
+    INSERT INTO {table}({columns})
+        SELECT {', '.join(aliases)}, {totals} FROM (
+            SELECT {issue_exprs}, 1 AS issues, 0 AS returns, NULL AS usage
+            FROM issues i WHERE {_ROLLUP_ISSUE_WHEN.format(r='i')}
+            UNION ALL
+            SELECT {return_exprs}, 0, 1, {usage}
+            FROM issues i WHERE {_ROLLUP_RETURN_WHEN.format(r='i')}
+        ) GROUP BY {', '.join(aliases)};""")
+    due_exprs = ", ".join(expr.format(r='i') for expr in _ROLLUP_DUE_KEY)
+    statements.append(f"""
+    DELETE FROM rollup_due;
+    INSERT INTO rollup_due(due_date, employee_id, instrument_id, active)
+        SELECT {due_exprs}, COUNT(*) FROM issues i WHERE i.status = 'Выдан'
+        GROUP BY 1, 2, 3;""")
+    return "\n".join(statements) + "\n"
+
+
+# Пересчет сводных таблиц по текущему содержимому issues
+ROLLUPS_REBUILD_SQL = _rollup_rebuild_sql()
+
+# Нумерованные миграции схемы: (версия, описание, SQL-скрипт).
+# Каждая миграция применяется один раз в отдельной транзакции,
+# примененные версии фиксируются в таблице schema_version.
+SCHEMA_MIGRATIONS = [
+    (1, "Индексы для основных запросов", """
+        -- Активные выдачи: фильтр по статусу с сортировкой по дате выдачи
+        CREATE INDEX IF NOT EXISTS idx_issues_status_issue_date
+            ON issues(status, issue_date);
+        -- Просроченные выдачи: покрывающий индекс для подсчета
+        CREATE INDEX IF NOT EXISTS idx_issues_status_expected
+            ON issues(status, expected_return_date);
+        -- Текущая выдача инструмента, проверки перед удалением
+        CREATE INDEX IF NOT EXISTS idx_issues_instrument_status
+            ON issues(instrument_id, status);
+        CREATE INDEX IF NOT EXISTS idx_issues_employee_status
+            ON issues(employee_id, status);
+        CREATE INDEX IF NOT EXISTS idx_issues_address_status
+            ON issues(address_id, status);
+        -- Аналитика по периодам
+        CREATE INDEX IF NOT EXISTS idx_issues_issue_date
+            ON issues(issue_date);
+        CREATE INDEX IF NOT EXISTS idx_issues_actual_return
+            ON issues(actual_return_date);
+        -- Журнал операций: сортировка по дате и фильтр по типу операции
+        CREATE INDEX IF NOT EXISTS idx_history_operation_date
+            ON operation_history(operation_date);
+        CREATE INDEX IF NOT EXISTS idx_history_type_date
+            ON operation_history(operation_type, operation_date);
+        CREATE INDEX IF NOT EXISTS idx_history_instrument
+            ON operation_history(instrument_id);
+        -- Статистика по статусам
+        CREATE INDEX IF NOT EXISTS idx_instruments_status
+            ON instruments(status);
+        CREATE INDEX IF NOT EXISTS idx_employees_status
+            ON employees(status);
+    """),
+    (2, "Полнотекстовый поиск FTS5", """
+        -- Токенизатор trigram ищет подстроки (как LIKE '%...%') и приводит
+        -- регистр по правилам Unicode, включая кириллицу.
+        -- Индексы внешнего содержимого синхронизируются триггерами.
+        CREATE VIRTUAL TABLE IF NOT EXISTS instruments_fts USING fts5(
+            name, inventory_number, serial_number, category,
+            content='instruments', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS instruments_fts_ai AFTER INSERT ON instruments BEGIN
+            INSERT INTO instruments_fts(rowid, name, inventory_number, serial_number, category)
+            VALUES (new.id, new.name, new.inventory_number, new.serial_number, new.category);
+        END;
+        CREATE TRIGGER IF NOT EXISTS instruments_fts_ad AFTER DELETE ON instruments BEGIN
+            INSERT INTO instruments_fts(instruments_fts, rowid, name, inventory_number, serial_number, category)
+            VALUES ('delete', old.id, old.name, old.inventory_number, old.serial_number, old.category);
+        END;
+        CREATE TRIGGER IF NOT EXISTS instruments_fts_au
+        AFTER UPDATE OF name, inventory_number, serial_number, category ON instruments BEGIN
+            INSERT INTO instruments_fts(instruments_fts, rowid, name, inventory_number, serial_number, category)
+            VALUES ('delete', old.id, old.name, old.inventory_number, old.serial_number, old.category);
+            INSERT INTO instruments_fts(rowid, name, inventory_number, serial_number, category)
+            VALUES (new.id, new.name, new.inventory_number, new.serial_number, new.category);
+        END;
+        INSERT INTO instruments_fts(instruments_fts) VALUES ('rebuild');
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS employees_fts USING fts5(
+            full_name, position, department,
+            content='employees', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS employees_fts_ai AFTER INSERT ON employees BEGIN
+            INSERT INTO employees_fts(rowid, full_name, position, department)
+            VALUES (new.id, new.full_name, new.position, new.department);
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_fts_ad AFTER DELETE ON employees BEGIN
+            INSERT INTO employees_fts(employees_fts, rowid, full_name, position, department)
+            VALUES ('delete', old.id, old.full_name, old.position, old.department);
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_fts_au
+        AFTER UPDATE OF full_name, position, department ON employees BEGIN
+            INSERT INTO employees_fts(employees_fts, rowid, full_name, position, department)
+            VALUES ('delete', old.id, old.full_name, old.position, old.department);
+            INSERT INTO employees_fts(rowid, full_name, position, department)
+            VALUES (new.id, new.full_name, new.position, new.department);
+        END;
+        INSERT INTO employees_fts(employees_fts) VALUES ('rebuild');
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS addresses_fts USING fts5(
+            name, full_address,
+            content='addresses', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS addresses_fts_ai AFTER INSERT ON addresses BEGIN
+            INSERT INTO addresses_fts(rowid, name, full_address)
+            VALUES (new.id, new.name, new.full_address);
+        END;
+        CREATE TRIGGER IF NOT EXISTS addresses_fts_ad AFTER DELETE ON addresses BEGIN
+            INSERT INTO addresses_fts(addresses_fts, rowid, name, full_address)
+            VALUES ('delete', old.id, old.name, old.full_address);
+        END;
+        CREATE TRIGGER IF NOT EXISTS addresses_fts_au
+        AFTER UPDATE OF name, full_address ON addresses BEGIN
+            INSERT INTO addresses_fts(addresses_fts, rowid, name, full_address)
+            VALUES ('delete', old.id, old.name, old.full_address);
+            INSERT INTO addresses_fts(rowid, name, full_address)
+            VALUES (new.id, new.name, new.full_address);
+        END;
+        INSERT INTO addresses_fts(addresses_fts) VALUES ('rebuild');
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            operation_type, performed_by, notes,
+            content='operation_history', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS history_fts_ai AFTER INSERT ON operation_history BEGIN
+            INSERT INTO history_fts(rowid, operation_type, performed_by, notes)
+            VALUES (new.id, new.operation_type, new.performed_by, new.notes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_fts_ad AFTER DELETE ON operation_history BEGIN
+            INSERT INTO history_fts(history_fts, rowid, operation_type, performed_by, notes)
+            VALUES ('delete', old.id, old.operation_type, old.performed_by, old.notes);
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_fts_au
+        AFTER UPDATE OF operation_type, performed_by, notes ON operation_history BEGIN
+            INSERT INTO history_fts(history_fts, rowid, operation_type, performed_by, notes)
+            VALUES ('delete', old.id, old.operation_type, old.performed_by, old.notes);
+            INSERT INTO history_fts(rowid, operation_type, performed_by, notes)
+            VALUES (new.id, new.operation_type, new.performed_by, new.notes);
+        END;
+        INSERT INTO history_fts(history_fts) VALUES ('rebuild');
+
+        -- Поиск по журналу через связанные инструменты, сотрудников и адреса
+        CREATE INDEX IF NOT EXISTS idx_history_employee
+            ON operation_history(employee_id);
+        CREATE INDEX IF NOT EXISTS idx_history_issue
+            ON operation_history(issue_id);
+    """),
+    (3, "Счетчики статистики", f"""
+        -- Итоги для статистики, поддерживаются триггерами: чтение не зависит от объема данных
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS instruments_counters_ai AFTER INSERT ON instruments BEGIN
+            {_counter_delta_sql("'instruments'", "1")}
+            {_counter_delta_sql("'instruments_status:' || COALESCE(new.status, '')", "1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS instruments_counters_ad AFTER DELETE ON instruments BEGIN
+            {_counter_delta_sql("'instruments'", "-1")}
+            {_counter_delta_sql("'instruments_status:' || COALESCE(old.status, '')", "-1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS instruments_counters_au AFTER UPDATE OF status ON instruments
+        WHEN old.status IS NOT new.status BEGIN
+            {_counter_delta_sql("'instruments_status:' || COALESCE(old.status, '')", "-1")}
+            {_counter_delta_sql("'instruments_status:' || COALESCE(new.status, '')", "1")}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS employees_counters_ai AFTER INSERT ON employees
+        WHEN new.status = 'Активен' BEGIN
+            {_counter_delta_sql("'active_employees'", "1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_counters_ad AFTER DELETE ON employees
+        WHEN old.status = 'Активен' BEGIN
+            {_counter_delta_sql("'active_employees'", "-1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS employees_counters_au AFTER UPDATE OF status ON employees
+        WHEN old.status IS NOT new.status BEGIN
+            {_counter_delta_sql("'active_employees'", "(new.status IS 'Активен') - (old.status IS 'Активен')")}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS issues_counters_ai AFTER INSERT ON issues
+        WHEN new.status = 'Выдан' BEGIN
+            {_counter_delta_sql("'active_issues'", "1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS issues_counters_ad AFTER DELETE ON issues
+        WHEN old.status = 'Выдан' BEGIN
+            {_counter_delta_sql("'active_issues'", "-1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS issues_counters_au AFTER UPDATE OF status ON issues
+        WHEN old.status IS NOT new.status BEGIN
+            {_counter_delta_sql("'active_issues'", "(new.status IS 'Выдан') - (old.status IS 'Выдан')")}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS history_counters_ai AFTER INSERT ON operation_history BEGIN
+            {_counter_delta_sql("'operations'", "1")}
+        END;
+        CREATE TRIGGER IF NOT EXISTS history_counters_ad AFTER DELETE ON operation_history BEGIN
+            {_counter_delta_sql("'operations'", "-1")}
+        END;
+    """ + STAT_COUNTERS_REBUILD_SQL),
+    (4, "Версии таблиц", f"""
+        -- Номер изменения таблицы: по нему кэши аналитики определяют, что данные устарели
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        {_table_version_triggers('instruments')}
+        {_table_version_triggers('issues')}
+        {_table_version_triggers('operation_history')}
+        {_table_version_triggers('addresses')}
+    """),
+    (5, "Сводные таблицы", f"""
+        -- Итоги по дням, сотрудникам, инструментам и адресам: отчеты не читают issues целиком
+        CREATE TABLE IF NOT EXISTS rollup_daily (
+            day TEXT PRIMARY KEY,
+            issues INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            usage_days REAL NOT NULL DEFAULT 0,
+            min_usage_days REAL,
+            max_usage_days REAL
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollup_employee (
+            employee_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            issues INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            usage_days REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (employee_id, month)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rollup_instrument (
+            instrument_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            issues INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            usage_days REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (instrument_id, month)
+        ) WITHOUT ROWID;
+        -- По дням, а не месяцам: отчет по адресам строится за скользящий период
+        CREATE TABLE IF NOT EXISTS rollup_address (
+            day TEXT NOT NULL,
+            address_id INTEGER NOT NULL,
+            issues INTEGER NOT NULL DEFAULT 0,
+            returns INTEGER NOT NULL DEFAULT 0,
+            usage_days REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, address_id)
+        ) WITHOUT ROWID;
+        -- Активные выдачи по сроку возврата ('' - срок не указан)
+        CREATE TABLE IF NOT EXISTS rollup_due (
+            due_date TEXT NOT NULL,
+            employee_id INTEGER NOT NULL,
+            instrument_id INTEGER NOT NULL,
+            active INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (due_date, employee_id, instrument_id)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS issues_rollups_ai AFTER INSERT ON issues BEGIN
+            {_rollup_delta_sql('new', 1)}
+        END;
+        CREATE TRIGGER IF NOT EXISTS issues_rollups_ad AFTER DELETE ON issues BEGIN
+            {_rollup_delta_sql('old', -1)}
+            {_rollup_extremes_sql('old')}
+        END;
+        CREATE TRIGGER IF NOT EXISTS issues_rollups_au AFTER UPDATE OF
+            issue_date, actual_return_date, expected_return_date, status,
+            employee_id, instrument_id, address_id ON issues BEGIN
+            {_rollup_delta_sql('old', -1)}
+            {_rollup_delta_sql('new', 1)}
+            {_rollup_extremes_sql('old')}
+        END;
+    """ + ROLLUPS_REBUILD_SQL),
+    (6, "Состояние уведомлений", """
+        -- Последнее отправленное уведомление по выдаче: уровень и время отправки
+        CREATE TABLE IF NOT EXISTS notification_state (
+            issue_id INTEGER PRIMARY KEY,
+            level INTEGER NOT NULL,
+            last_sent_at TIMESTAMP NOT NULL
+        );
+    """),
+]
+
+# Актуальная версия схемы, хранится в PRAGMA user_version файла БД
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+def _lower_py(s):
+    """Преобразование в нижний регистр средствами Python (работает с кириллицей)"""
+    return s.lower() if s else s
+
+
+def connection_scope(method):
+    """Декоратор метода, получающего соединение из пула
+
+    При выходе из метода, в том числе по исключению до вызова close(),
+    невозвращенные выдачи соединения снимаются, а транзакция, которую
+    никто больше не держит, откатывается.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        conn = getattr(self._local, 'conn', None)
+        leases = conn.leases if conn is not None else 0
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._release_leases(conn, leases)
+    return wrapper
+
+
+def cached_query(*tables):
+    """Декоратор метода чтения: результат кэшируется, если кэш включен (enable_cache)
+
+    Args:
+        tables: таблицы, от которых зависит результат
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self._cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+
+            self._sync_cache_with_connection()
+            # Текущая дата входит в ключ: просрочка и сроки использования считаются от сегодня
+            key = (method.__name__, args, tuple(sorted(kwargs.items())), datetime.now().date())
+            try:
+                found, value = cache.get(key)
+            except TypeError:
+                # Нехэшируемые аргументы - выполняем запрос без кэша
+                return method(self, *args, **kwargs)
+            if not found:
+                generation = cache.generation
+                value = method(self, *args, **kwargs)
+                cache.put(key, value, tables, generation)
+            return _copy_result(value)
+        return connection_scope(wrapper)
+    return decorator
+
+
+def invalidates(*tables):
+    """Декоратор метода записи: сбрасывает кэшированные результаты по указанным таблицам
+    и сообщает об изменении подписчикам (add_change_listener)"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if self._cache is not None:
+                    self._cache.invalidate(tables)
+                    self._remember_connection_state()
+                self._notify_change(tables)
+        return connection_scope(wrapper)
+    return decorator
+
+
+def _copy_result(value):
+    """Копия результата из кэша, чтобы изменения вызывающего кода не попали в кэш"""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return copy.deepcopy(value)
+    return value
+
+
+class PooledConnection(sqlite3.Connection):
+    """Соединение из пула DatabaseManager
+
+    Вызов close() не закрывает соединение, а возвращает его в пул:
+    незавершенная транзакция откатывается, как это произошло бы
+    при настоящем закрытии. Физически соединение закрывает dispose().
+
+    Поток получает одно и то же соединение и во вложенных вызовах (метод,
+    вызванный внутри транзакции другого метода), поэтому выдачи считаются:
+    транзакция откатывается, только когда соединение вернули все получившие его.
+    Выдачи, не возвращенные из-за исключения, снимает connection_scope.
+    """
+
+    leases = 0  # сколько раз соединение выдано и еще не возвращено
+
+    def close(self):
+        if self.leases > 0:
+            self.leases -= 1
+        if self.leases == 0 and self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        super().close()
+
 
 class DatabaseManager:
-    def __init__(self, db_path='tool_management.db'):
+    def __init__(self, db_path='tool_management.db', pragmas=None):
         self.db_path = db_path
         self.conn = None  # Для отслеживания соединения
+        # Профиль PRAGMA: значения по умолчанию с возможностью переопределения
+        self.pragmas = dict(DB_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        # Пул соединений: одно долгоживущее соединение на поток
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._pool = {}  # поток -> соединение
+        self._fts_available = None  # наличие таблиц FTS5, определяется при первом поиске
+        self._cache = None  # кэш результатов запросов, включается через enable_cache()
+        self._change_listeners = []  # подписчики на изменения таблиц
+        # Количество записей через методы с @invalidates: изменения data_version
+        # соединений других потоков, объясняемые этими записями, не сбрасывают кэш
+        self._write_count = 0
+        self._write_lock = threading.Lock()
+        # Снимок аналитики, общий для всех графиков вкладки аналитики
+        self._analytics_snapshot = AnalyticsSnapshot(self, ttl=self.ANALYTICS_SNAPSHOT_TTL)
         self.init_database()
         
     def init_database(self):
         """Инициализация базы данных"""
+        # Соединения пула могли быть открыты к прежнему файлу БД
+        self._close_pool()
+        self._fts_available = None
+        if self._cache is not None:
+            self._cache.clear()
+
         conn = sqlite3.connect(self.db_path)
+        # Версия схемы читается из заголовка файла одной операцией
+        user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        if user_version >= SCHEMA_VERSION:
+            # Схема актуальна: DDL и проверки таблиц не нужны
+            conn.close()
+            self._ensure_photo_dirs()
+            return
+
+        self._apply_pragmas(conn)
         cursor = conn.cursor()
 
-        # Выполнение SQL скрипта создания таблиц (всегда, для гарантии)
-        try:
-            with open('database/01_create_tables.sql', 'r', encoding='utf-8') as f:
-                sql_script = f.read()
-                cursor.executescript(sql_script)
-            print("✅ Таблицы базы данных созданы")
-        except FileNotFoundError:
-            print("❌ Ошибка: файл database/01_create_tables.sql не найден")
-            raise
-        except Exception as e:
-            print(f"❌ Ошибка создания таблиц: {e}")
-            raise
+        if user_version == 0:
+            # Новая база или база, созданная до введения версий схемы:
+            # выполняем SQL скрипт создания таблиц
+            try:
+                with open('database/01_create_tables.sql', 'r', encoding='utf-8') as f:
+                    sql_script = f.read()
+                    cursor.executescript(sql_script)
+                print("✅ Таблицы базы данных созданы")
+            except FileNotFoundError:
+                print("❌ Ошибка: файл database/01_create_tables.sql не найден")
+                raise
+            except Exception as e:
+                print(f"❌ Ошибка создания таблиц: {e}")
+                raise
 
         conn.commit()
         conn.close()
 
-        # Выполняем миграцию (добавление колонок)
+        # Выполняем миграцию (добавление колонок и нумерованные миграции)
         try:
-            self.migrate_database()
+            self.migrate_database(from_version=user_version)
             print("✅ Миграция базы данных выполнена")
         except Exception as e:
             print(f"❌ Ошибка миграции: {e}")
             raise
 
         # Вставка тестовых данных только если таблицы пустые
-        if self._is_database_empty():
+        if user_version == 0 and self._is_database_empty():
             self.insert_sample_data()
 
+    @cached_query('instruments', 'employees', 'issues')
     def get_statistics(self):
         """Получение общей статистики системы"""
         try:
@@ -53,35 +621,25 @@ class DatabaseManager:
             cursor = conn.cursor()
             stats = {}
 
-            # Статистика инструментов
+            counters = self._read_stat_counters(cursor)
 
-            # Общее количество инструментов
-            cursor.execute("SELECT COUNT(*) FROM instruments")
-            stats['total_instruments'] = cursor.fetchone()[0]
+            # Статистика инструментов
+            stats['total_instruments'] = counters.get('instruments', 0)
 
             # Количество по статусам
-            cursor.execute("SELECT status, COUNT(*) FROM instruments GROUP BY status")
-            status_counts = dict(cursor.fetchall())
-
+            status_counts = self._instruments_by_status(counters)
             stats['available_instruments'] = status_counts.get('Доступен', 0)
             stats['issued_instruments'] = status_counts.get('Выдан', 0)
             stats['repair_instruments'] = status_counts.get('На ремонте', 0)
 
             # Статистика сотрудников
-            cursor.execute("SELECT COUNT(*) FROM employees WHERE status = 'Активен'")
-            stats['total_employees'] = cursor.fetchone()[0]
+            stats['total_employees'] = counters.get('active_employees', 0)
 
             # Активные выдачи
-            cursor.execute("SELECT COUNT(*) FROM issues WHERE status = 'Выдан'")
-            stats['active_issues'] = cursor.fetchone()[0]
+            stats['active_issues'] = counters.get('active_issues', 0)
 
             # Просроченные возвраты
-            cursor.execute("""
-                SELECT COUNT(*) FROM issues
-                WHERE status = 'Выдан'
-                AND expected_return_date < date('now')
-            """)
-            stats['overdue_issues'] = cursor.fetchone()[0]
+            stats['overdue_issues'] = self._count_overdue_issues(cursor)
 
             conn.close()
             return stats
@@ -123,12 +681,139 @@ class DatabaseManager:
         if self.conn:
             self.conn.close()
             self.conn = None
+        self._close_pool()
+
+    @connection_scope
+    def checkpoint(self, mode='PASSIVE'):
+        """Контрольная точка WAL: перенос изменений из журнала в файл БД
+
+        Args:
+            mode: режим контрольной точки ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+        Returns:
+            bool: True, если все кадры журнала перенесены в файл БД
+        """
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Неизвестный режим контрольной точки: {mode}")
+
+        conn = self.get_connection()
+        try:
+            busy, log_frames, checkpointed = conn.execute(
+                f"PRAGMA wal_checkpoint({mode})"
+            ).fetchone()
+            return busy == 0 and log_frames == checkpointed
+        except sqlite3.Error as e:
+            print(f"Ошибка контрольной точки WAL: {e}")
+            return False
+        finally:
+            conn.close()
+
+    @connection_scope
+    def backup_to(self, path):
+        """Резервная копия базы данных в файл средствами SQLite (backup API)
+
+        Копия согласована и включает изменения, еще не перенесенные из журнала WAL.
+        Копия пишется во временный файл и заменяет path только после успешного завершения.
+
+        Returns:
+            tuple: (успех, сообщение)
+        """
+        temp_path = path + '.tmp'
+        conn = self.get_connection()
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                conn.backup(target)
+            finally:
+                target.close()
+            os.replace(temp_path, path)
+            return True, f"Резервная копия сохранена: {path}"
+        except (sqlite3.Error, OSError) as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False, f"Ошибка создания резервной копии: {e}"
+        finally:
+            conn.close()
+
+    @connection_scope
+    def restore_from(self, path):
+        """Замена содержимого базы данных копией из файла (backup API)
+
+        Страницы записываются средствами SQLite в одной транзакции, поэтому
+        журнал WAL текущей базы учитывается, а не удаляется вручную; другие
+        соединения с базой (например, Telegram бота) видят либо прежнее,
+        либо восстановленное содержимое.
+
+        Returns:
+            tuple: (успех, сообщение)
+        """
+        conn = self.get_connection()
+        try:
+            source = sqlite3.connect(path)
+            try:
+                source.backup(conn)
+            finally:
+                source.close()
+        except sqlite3.Error as e:
+            return False, f"Ошибка восстановления базы данных: {e}"
+        finally:
+            conn.close()
+
+        # Кэш и наличие таблиц FTS относятся к прежнему содержимому
+        self._fts_available = None
+        if self._cache is not None:
+            self._cache.clear()
+        return True, "База данных восстановлена"
+
+    def _close_pool(self):
+        """Закрытие всех соединений пула"""
+        with self._pool_lock:
+            if self._pool:
+                # Переносим журнал в файл БД, чтобы WAL не оставался на диске;
+                # при открытых соединениях других процессов перенос может быть неполным
+                conn = next(iter(self._pool.values()))
+                try:
+                    busy, log_frames, checkpointed = conn.execute(
+                        "PRAGMA wal_checkpoint(TRUNCATE)"
+                    ).fetchone()
+                    if busy or log_frames != checkpointed:
+                        print(f"Журнал WAL перенесен в файл БД не полностью: "
+                              f"{checkpointed} из {log_frames} кадров")
+                except sqlite3.Error as e:
+                    print(f"Ошибка контрольной точки WAL: {e}")
+            connections = list(self._pool.values())
+            self._pool.clear()
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.dispose()
+            except sqlite3.Error as e:
+                print(f"Ошибка закрытия соединения: {e}")
+
+    def migrate_database(self, from_version=0):
+        """Обновление схемы базы данных до актуальной версии
 
-    def migrate_database(self):
-        """Обновление схемы базы данных до актуальной версии"""
+        Args:
+            from_version: версия схемы из PRAGMA user_version; при версии 0
+                дополнительно проверяются таблицы и колонки старых баз
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        if from_version == 0:
+            self._migrate_legacy_columns(cursor)
+            conn.commit()
+
+        # Применяем нумерованные миграции
+        self._apply_migrations(conn)
+
+        self._ensure_photo_dirs()
+
+        conn.commit()
+        conn.close()
+
+    def _migrate_legacy_columns(self, cursor):
+        """Проверка таблиц и добавление колонок, появившихся до введения версий схемы"""
         # Проверяем существование основных таблиц
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('instruments', 'employees', 'addresses', 'issues')")
         existing_tables = [row[0] for row in cursor.fetchall()]
@@ -177,17 +862,72 @@ class DatabaseManager:
         if 'photo_path' not in employee_columns:
             cursor.execute("ALTER TABLE employees ADD COLUMN photo_path TEXT")
 
-        # Создаем папку для фотографий, если её нет
+    def _ensure_photo_dirs(self):
+        """Создание папки для фотографий, если её нет"""
         photos_dir = 'photos'
         if not os.path.exists(photos_dir):
             os.makedirs(photos_dir)
             # Создаем подпапки
             os.makedirs(os.path.join(photos_dir, 'instruments'))
             os.makedirs(os.path.join(photos_dir, 'employees'))
-
-        conn.commit()
-        conn.close()
     
+    def _apply_migrations(self, conn):
+        """Применение нумерованных миграций, еще не отмеченных в schema_version"""
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+
+        applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+        for version, description, script in SCHEMA_MIGRATIONS:
+            if version in applied:
+                continue
+            try:
+                conn.executescript("BEGIN;\n" + script)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, description)
+                )
+                conn.commit()
+                print(f"✅ Применена миграция {version}: {description}")
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if 'fts5' not in str(e):
+                    raise
+                # SQLite собран без FTS5: поиск будет работать через LIKE
+                print(f"⚠️ Миграция {version} пропущена, FTS5 недоступен: {e}")
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (version, f"{description} (пропущена: FTS5 недоступен)")
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+
+        # Отмечаем актуальную версию в заголовке файла для быстрого старта
+        applied_version = conn.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+        ).fetchone()[0]
+        conn.execute(f"PRAGMA user_version = {int(applied_version)}")
+
+    @connection_scope
+    def get_schema_version(self):
+        """Текущая версия схемы базы данных"""
+        conn = self.get_connection()
+        try:
+            return conn.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    @invalidates('instruments', 'employees', 'issues', 'operation_history', 'addresses')
     def insert_sample_data(self):
         """Вставка тестовых данных"""
         try:
@@ -203,21 +943,337 @@ class DatabaseManager:
         except Exception as e:
             print(f"Ошибка при вставке тестовых данных: {e}")
     
+    # ========== КЭШ ЗАПРОСОВ ==========
+
+    def enable_cache(self, maxsize=256):
+        """Включение кэша результатов методов чтения
+
+        Результаты хранятся до записи в таблицы, от которых они зависят.
+        Изменения, сделанные в обход методов DatabaseManager (другим процессом
+        или напрямую через соединение), сбрасывают кэш целиком.
+        """
+        self._cache = QueryCache(maxsize)
+
+    def disable_cache(self):
+        """Отключение кэша результатов"""
+        self._cache = None
+
+    def clear_cache(self):
+        """Очистка кэша результатов"""
+        if self._cache is not None:
+            self._cache.clear()
+
+    def get_cache_stats(self):
+        """Статистика кэша (попадания, промахи, размер) или None, если кэш выключен"""
+        return self._cache.stats() if self._cache is not None else None
+
+    def add_change_listener(self, callback):
+        """Подписка на изменения: callback(tables) вызывается после каждого метода записи
+
+        Вызов выполняется в потоке, изменившем данные, поэтому callback должен
+        быть коротким (например, будить поток-обработчик).
+        """
+        self._change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        """Отмена подписки на изменения"""
+        if callback in self._change_listeners:
+            self._change_listeners.remove(callback)
+
+    def _notify_change(self, tables):
+        for callback in list(self._change_listeners):
+            try:
+                callback(tables)
+            except Exception as e:
+                print(f"Ошибка обработчика изменения данных: {e}")
+
+    def _connection_state(self, conn):
+        """Признаки изменения данных: data_version (записи других соединений),
+        total_changes (записи этого соединения) и число записей через методы записи"""
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes, self._write_count
+
+    def _sync_cache_with_connection(self):
+        """Полный сброс кэша, если данные изменены в обход методов записи
+
+        Записи методов с @invalidates уже учтены в кэше по таблицам. Если с прошлой
+        проверки соединения такие записи были, изменение data_version считается
+        вызванным ими (одновременная запись в обход методов в этом случае не
+        обнаруживается); иначе data_version изменили чужие записи.
+        """
+        conn = self.get_connection()
+        state = self._connection_state(conn)
+        known = getattr(conn, 'cache_state', None)
+        if known is None or state[1] != known[1] or (state[0] != known[0] and state[2] == known[2]):
+            self._cache.clear()
+        conn.cache_state = state
+        conn.close()
+
+    def _remember_connection_state(self):
+        """Фиксация состояния соединения после записи, уже учтенной в кэше"""
+        with self._write_lock:
+            self._write_count += 1
+        conn = self.get_connection()
+        conn.cache_state = self._connection_state(conn)
+        conn.close()
+
     def get_connection(self):
-        """Получение соединения с БД"""
-        conn = sqlite3.connect(self.db_path)
+        """Получение соединения с БД
+
+        Каждый поток получает собственное долгоживущее соединение из пула,
+        поэтому открытие файла и регистрация функций выполняются один раз.
+        Вызов close() у полученного соединения возвращает его в пул; открытая
+        транзакция вызывающего кода при повторном получении сохраняется.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._create_connection()
+            self._local.conn = conn
+            with self._pool_lock:
+                # Соединения завершившихся потоков больше никто не использует
+                for thread in [t for t in self._pool if not t.is_alive()]:
+                    self._pool.pop(thread).dispose()
+                self._pool[threading.current_thread()] = conn
+        elif conn.in_transaction and conn.leases == 0:
+            # Соединение уже возвращено в пул, но после этого на нем начата транзакция
+            conn.rollback()
+        conn.leases += 1
+        return conn
+
+    def _release_leases(self, entry_conn, leases):
+        """Возврат выдач соединения потока к числу на входе в метод (см. connection_scope)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        if conn is not entry_conn:
+            leases = 0
+        if conn.leases <= leases:
+            return
+        conn.leases = leases
+        if leases == 0 and conn.in_transaction:
+            conn.rollback()
+
+    def _create_connection(self):
+        """Создание нового соединения для пула"""
+        # check_same_thread=False нужен только для закрытия соединений
+        # из другого потока в close(); запросы выполняет поток-владелец
+        conn = sqlite3.connect(self.db_path, factory=PooledConnection,
+                               check_same_thread=False)
+        self._apply_pragmas(conn)
         # Регистрируем функцию для корректного преобразования в нижний регистр (работает с кириллицей)
-        conn.create_function("LOWER_PY", 1, lambda s: s.lower() if s else s)
+        conn.create_function("LOWER_PY", 1, _lower_py, deterministic=True)
         return conn
+
+    def _apply_pragmas(self, conn):
+        """Применение профиля PRAGMA к соединению"""
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                print(f"Не удалось установить PRAGMA {name}: {e}")
+
+    def interrupt(self, thread):
+        """Прерывание запроса, выполняемого соединением указанного потока
+
+        Выполняемый запрос завершается ошибкой sqlite3.OperationalError ("interrupted").
+        Если соединение потока сейчас не выполняет запросов, вызов ничего не делает.
+        """
+        with self._pool_lock:
+            conn = self._pool.get(thread)
+        if conn is not None:
+            conn.interrupt()
+
+    # Токенизатор trigram не находит строки короче трех символов
+    FTS_MIN_QUERY_LENGTH = 3
+
+    def _fts_query(self, conn, search_text):
+        """Строка запроса FTS5 для поиска подстроки
+
+        Returns:
+            str: фраза для MATCH или None, если поиск нужно выполнить через LIKE
+            (FTS5 недоступен или запрос слишком короткий)
+        """
+        if len(search_text.strip()) < self.FTS_MIN_QUERY_LENGTH:
+            return None
+
+        if self._fts_available is None:
+            cursor = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN "
+                "('instruments_fts', 'employees_fts', 'addresses_fts', 'history_fts')"
+            )
+            self._fts_available = cursor.fetchone()[0] == 4
+        if not self._fts_available:
+            return None
+
+        # Весь текст ищется как одна фраза, кавычки экранируются удвоением
+        return '"' + search_text.strip().replace('"', '""') + '"'
+
+    # Поля, по которым разрешена сортировка на стороне БД: имя поля -> выражение SQL.
+    # В ORDER BY попадают только выражения из этих списков, значения от вызывающего
+    # кода в текст запроса не подставляются.
+    INSTRUMENT_SORT_FIELDS = {
+        'id': 'ins.id',
+        'name': 'ins.name',
+        'inventory_number': 'ins.inventory_number',
+        'serial_number': 'ins.serial_number',
+        'category': 'ins.category',
+        'current_address': 'current_address',
+        'status': 'ins.status',
+    }
+    EMPLOYEE_SORT_FIELDS = {
+        'id': 'id',
+        'full_name': 'full_name',
+        'position': 'position',
+        'department': 'department',
+        'phone': 'phone',
+        'email': 'email',
+        'status': 'status',
+    }
+    ISSUE_SORT_FIELDS = {
+        'id': 'i.id',
+        'inventory_number': 'ins.inventory_number',
+        'name': 'ins.name',
+        'employee': 'e.full_name',
+        'address': 'address',
+        'issue_date': 'i.issue_date',
+        'expected_return_date': 'i.expected_return_date',
+        'issued_by': 'i.issued_by',
+        'notes': 'i.notes',
+    }
+    HISTORY_SORT_FIELDS = {
+        'id': 'oh.id',
+        'operation_type': 'oh.operation_type',
+        'inventory_number': 'ins.inventory_number',
+        'name': 'ins.name',
+        'employee': 'e.full_name',
+        'address': 'address',
+        'operation_date': 'oh.operation_date',
+        'performed_by': 'oh.performed_by',
+        'notes': 'oh.notes',
+    }
+
+    def _order_clause(self, fields, order_by, direction, tiebreak):
+        """ORDER BY по полю из списка разрешенных
+
+        Args:
+            fields: словарь разрешенных полей (имя -> выражение SQL)
+            order_by: имя поля
+            direction: 'asc' или 'desc'
+            tiebreak: выражение для однозначного порядка при равных значениях
+
+        Raises:
+            ValueError: поле или направление не входит в разрешенные
+        """
+        if order_by not in fields:
+            raise ValueError(f"Недопустимое поле сортировки: {order_by}")
+        direction = (direction or 'asc').upper()
+        if direction not in ('ASC', 'DESC'):
+            raise ValueError(f"Недопустимое направление сортировки: {direction}")
+        expression = fields[order_by]
+        if expression == tiebreak:
+            return f" ORDER BY {expression} {direction}"
+        return f" ORDER BY {expression} {direction}, {tiebreak} {direction}"
+
+    @staticmethod
+    def _limit_clause(limit, offset, params):
+        """LIMIT/OFFSET с передачей значений параметрами запроса"""
+        if limit is None:
+            if offset:
+                params.extend([-1, int(offset)])
+                return " LIMIT ? OFFSET ?"
+            return ""
+        params.extend([int(limit), int(offset or 0)])
+        return " LIMIT ? OFFSET ?"
+
+    @connection_scope
+    def get_table_row_count(self, table):
+        """Количество строк в таблице для выбора способа загрузки в интерфейс
+
+        Для инструментов, активных выдач и журнала значение берется из счетчиков
+        статистики без просмотра таблиц.
+        """
+        counters = {
+            'instruments': 'instruments',
+            'issues': 'active_issues',
+            'operation_history': 'operations',
+        }
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if table in counters:
+            cursor.execute("SELECT value FROM stat_counters WHERE name = ?", (counters[table],))
+            row = cursor.fetchone()
+            count = row[0] if row else 0
+        elif table in ('employees', 'addresses'):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            count = cursor.fetchone()[0]
+        else:
+            conn.close()
+            raise ValueError(f"Неизвестная таблица: {table}")
+        conn.close()
+        return count
     
     # ========== ИНСТРУМЕНТЫ ==========
     
-    def get_instruments(self, search_text=''):
-        """Получение списка инструментов"""
+    @cached_query('instruments', 'issues', 'addresses')
+    def get_instruments(self, search_text='', ranked=False, order_by=None, direction='asc',
+                        limit=None, offset=0, count=False):
+        """Получение списка инструментов
+
+        Args:
+            search_text: текст для поиска по названию, номерам, категории и адресу
+            ranked: упорядочить результаты поиска по релевантности
+            order_by: поле сортировки из INSTRUMENT_SORT_FIELDS (по умолчанию - по названию)
+            direction: направление сортировки ('asc' или 'desc')
+            limit: максимальное количество записей (None - все)
+            offset: количество пропускаемых записей
+            count: вернуть количество найденных записей вместо списка
+        """
+        if count and not search_text:
+            return self.get_table_row_count('instruments')
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        if search_text:
+        fts_query = self._fts_query(conn, search_text) if search_text else None
+        order_clause = " ORDER BY ins.name, ins.inventory_number"
+        if order_by:
+            order_clause = self._order_clause(self.INSTRUMENT_SORT_FIELDS, order_by, direction, 'ins.id')
+        limit_params = []
+        limit_clause = self._limit_clause(limit, offset, limit_params)
+        
+        if fts_query:
+            # Поиск через индексы FTS5: совпадения в инструменте или в адресе текущей выдачи
+            # Вычисление релевантности (bm25) заметно дороже простого совпадения
+            if ranked and not order_by:
+                rank_column = "rank"
+                order_clause = " ORDER BY m.rank, ins.name, ins.inventory_number"
+            else:
+                rank_column = "0"
+            query = f"""
+                WITH matched(id, rank) AS (
+                    SELECT rowid, {rank_column} FROM instruments_fts WHERE instruments_fts MATCH ?
+                    UNION ALL
+                    SELECT iss.instrument_id, 0 FROM issues iss
+                    WHERE iss.status = 'Выдан'
+                      AND iss.address_id IN (
+                          SELECT rowid FROM addresses_fts WHERE addresses_fts MATCH ?
+                      )
+                )
+                SELECT 
+                    ins.id,
+                    ins.name,
+                    ins.inventory_number,
+                    ins.serial_number,
+                    ins.category,
+                    COALESCE(NULLIF(addr.full_address, ''), addr.name, '') as current_address,
+                    ins.status,
+                    COALESCE(ins.photo_path, '') as photo_path
+                FROM (SELECT id, MIN(rank) as rank FROM matched GROUP BY id) m
+                JOIN instruments ins ON ins.id = m.id
+                LEFT JOIN issues i ON i.instrument_id = ins.id AND i.status = 'Выдан'
+                LEFT JOIN addresses addr ON i.address_id = addr.id
+            """
+            params = [fts_query, fts_query]
+        elif search_text:
             # Преобразуем поисковый текст в нижний регистр в Python для корректной работы с кириллицей
             search_text_lower = search_text.lower()
             query = """
@@ -238,10 +1294,9 @@ class DatabaseManager:
                       OR LOWER_PY(ins.serial_number) LIKE ? 
                       OR LOWER_PY(ins.category) LIKE ?
                       OR LOWER_PY(COALESCE(NULLIF(addr.full_address, ''), addr.name, '')) LIKE ?
-                ORDER BY ins.name, ins.inventory_number
             """
             search_pattern = f'%{search_text_lower}%'
-            cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern, search_pattern))
+            params = [search_pattern] * 5
         else:
             query = """
                 SELECT 
@@ -256,15 +1311,20 @@ class DatabaseManager:
                 FROM instruments ins
                 LEFT JOIN issues i ON i.instrument_id = ins.id AND i.status = 'Выдан'
                 LEFT JOIN addresses addr ON i.address_id = addr.id
-                ORDER BY ins.name, ins.inventory_number
             """
-            cursor.execute(query)
+            params = []
         
-        instruments = cursor.fetchall()
+        if count:
+            cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+            instruments = cursor.fetchone()[0]
+        else:
+            cursor.execute(query + order_clause + limit_clause, params + limit_params)
+            instruments = cursor.fetchall()
         conn.close()
         
         return instruments
     
+    @cached_query('instruments')
     def get_instrument_by_id(self, instrument_id):
         """Получение инструмента по ID"""
         conn = self.get_connection()
@@ -283,6 +1343,7 @@ class DatabaseManager:
         
         return instrument
     
+    @invalidates('instruments')
     def add_instrument(self, data):
         """Добавление нового инструмента
         data: кортеж (name, description, inventory_number, serial_number, category,
@@ -311,6 +1372,7 @@ class DatabaseManager:
             conn.close()
             return False
     
+    @invalidates('instruments')
     def update_instrument(self, instrument_id, data):
         """Обновление данных инструмента
         data: кортеж (name, description, inventory_number, serial_number, category,
@@ -340,6 +1402,7 @@ class DatabaseManager:
             conn.close()
             return False
     
+    @invalidates('instruments', 'issues', 'operation_history')
     def delete_instrument(self, instrument_id):
         """Удаление инструмента"""
         conn = self.get_connection()
@@ -367,12 +1430,37 @@ class DatabaseManager:
     
     # ========== СОТРУДНИКИ ==========
     
-    def get_employees(self, search_text=''):
-        """Получение списка сотрудников"""
+    @cached_query('employees')
+    def get_employees(self, search_text='', order_by=None, direction='asc', limit=None, offset=0,
+                      count=False):
+        """Получение списка сотрудников
+
+        Args:
+            search_text: текст для поиска по ФИО, должности и отделу
+            order_by: поле сортировки из EMPLOYEE_SORT_FIELDS (по умолчанию - по ФИО)
+            direction: направление сортировки ('asc' или 'desc')
+            limit: максимальное количество записей (None - все)
+            offset: количество пропускаемых записей
+            count: вернуть количество найденных записей вместо списка
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        if search_text:
+        fts_query = self._fts_query(conn, search_text) if search_text else None
+        order_clause = " ORDER BY full_name"
+        if order_by:
+            order_clause = self._order_clause(self.EMPLOYEE_SORT_FIELDS, order_by, direction, 'id')
+        limit_params = []
+        limit_clause = self._limit_clause(limit, offset, limit_params)
+        
+        if fts_query:
+            query = """
+                SELECT id, full_name, position, department, phone, email, status, COALESCE(photo_path, '') as photo_path
+                FROM employees
+                WHERE id IN (SELECT rowid FROM employees_fts WHERE employees_fts MATCH ?)
+            """
+            params = [fts_query]
+        elif search_text:
             # Преобразуем поисковый текст в нижний регистр в Python для корректной работы с кириллицей
             search_text_lower = search_text.lower()
             query = """
@@ -380,23 +1468,27 @@ class DatabaseManager:
                 FROM employees
                 WHERE LOWER_PY(full_name) LIKE ? OR LOWER_PY(position) LIKE ?
                       OR LOWER_PY(department) LIKE ?
-                ORDER BY full_name
             """
             search_pattern = f'%{search_text_lower}%'
-            cursor.execute(query, (search_pattern, search_pattern, search_pattern))
+            params = [search_pattern] * 3
         else:
             query = """
                 SELECT id, full_name, position, department, phone, email, status, COALESCE(photo_path, '') as photo_path
                 FROM employees
-                ORDER BY full_name
             """
-            cursor.execute(query)
+            params = []
         
-        employees = cursor.fetchall()
+        if count:
+            cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+            employees = cursor.fetchone()[0]
+        else:
+            cursor.execute(query + order_clause + limit_clause, params + limit_params)
+            employees = cursor.fetchall()
         conn.close()
         
         return employees
     
+    @cached_query('employees')
     def get_employee_by_id(self, employee_id):
         """Получение сотрудника по ID"""
         conn = self.get_connection()
@@ -414,6 +1506,7 @@ class DatabaseManager:
         
         return employee
     
+    @invalidates('employees')
     def add_employee(self, data):
         """Добавление нового сотрудника
         data: кортеж (full_name, position, department, phone, email, status, photo_path)
@@ -440,6 +1533,7 @@ class DatabaseManager:
             conn.close()
             return False
     
+    @invalidates('employees')
     def update_employee(self, employee_id, data):
         """Обновление данных сотрудника
         data: кортеж (full_name, position, department, phone, email, status, photo_path)
@@ -467,6 +1561,7 @@ class DatabaseManager:
             conn.close()
             return False
     
+    @invalidates('employees', 'issues', 'operation_history')
     def delete_employee(self, employee_id):
         """Удаление сотрудника"""
         conn = self.get_connection()
@@ -494,11 +1589,29 @@ class DatabaseManager:
     
     # ========== ВЫДАЧИ ==========
     
-    def get_active_issues(self):
-        """Получение списка активных выдач"""
+    @cached_query('issues', 'instruments', 'employees', 'addresses')
+    def get_active_issues(self, order_by=None, direction='asc', limit=None, offset=0, count=False):
+        """Получение списка активных выдач
+
+        Args:
+            order_by: поле сортировки из ISSUE_SORT_FIELDS (по умолчанию - новые выдачи первыми)
+            direction: направление сортировки ('asc' или 'desc')
+            limit: максимальное количество записей (None - все)
+            offset: количество пропускаемых записей
+            count: вернуть количество активных выдач вместо списка
+        """
+        if count:
+            return self.get_table_row_count('issues')
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        order_clause = " ORDER BY i.issue_date DESC"
+        if order_by:
+            order_clause = self._order_clause(self.ISSUE_SORT_FIELDS, order_by, direction, 'i.id')
+        params = []
+        limit_clause = self._limit_clause(limit, offset, params)
+        
         cursor.execute("""
             SELECT 
                 i.id,
@@ -506,7 +1619,7 @@ class DatabaseManager:
                 ins.inventory_number,
                 ins.name,
                 e.full_name,
-                COALESCE(NULLIF(a.full_address, ''), a.name, ''),
+                COALESCE(NULLIF(a.full_address, ''), a.name, '') as address,
                 datetime(i.issue_date, 'localtime'),
                 i.expected_return_date,
                 i.issued_by,
@@ -517,14 +1630,14 @@ class DatabaseManager:
             JOIN employees e ON i.employee_id = e.id
             LEFT JOIN addresses a ON i.address_id = a.id
             WHERE i.status = 'Выдан'
-            ORDER BY i.issue_date DESC
-        """)
+        """ + order_clause + limit_clause, params)
         
         issues = cursor.fetchall()
         conn.close()
         
         return issues
     
+    @cached_query('issues', 'instruments', 'employees', 'addresses')
     def get_active_issues_for_return(self):
         """Получение активных выдач для возврата"""
         conn = self.get_connection()
@@ -555,6 +1668,129 @@ class DatabaseManager:
         
         return issues
     
+    @connection_scope
+    def get_active_due_dates(self):
+        """Различные сроки возврата активных выдач (по индексу idx_issues_status_expected)"""
+        conn = self.get_connection()
+        dates = [row[0] for row in conn.execute("""
+            SELECT DISTINCT expected_return_date FROM issues
+            WHERE status = 'Выдан' AND expected_return_date >= '0'
+        """)]
+        conn.close()
+        return dates
+
+    @connection_scope
+    def get_notification_state(self):
+        """Состояние уведомлений: {issue_id: (уровень, время последней отправки)}"""
+        conn = self.get_connection()
+        state = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT issue_id, level, last_sent_at FROM notification_state"
+        )}
+        conn.close()
+        return state
+
+    @connection_scope
+    def update_notification_state(self, updates, removed_ids=()):
+        """Сохранение состояния уведомлений одной транзакцией
+
+        Args:
+            updates: строки (issue_id, уровень, время последней отправки)
+            removed_ids: выдачи, больше не требующие уведомлений
+        """
+        conn = self.get_connection()
+        try:
+            conn.executemany("""
+                INSERT INTO notification_state (issue_id, level, last_sent_at) VALUES (?, ?, ?)
+                ON CONFLICT(issue_id) DO UPDATE SET
+                    level = excluded.level, last_sent_at = excluded.last_sent_at
+            """, updates)
+            conn.executemany("DELETE FROM notification_state WHERE issue_id = ?",
+                             [(issue_id,) for issue_id in removed_ids])
+            conn.commit()
+            return True, "Состояние уведомлений сохранено"
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Ошибка сохранения состояния уведомлений: {e}"
+        finally:
+            conn.close()
+
+    def get_overdue_issues(self, today=None):
+        """Просроченные активные выдачи: срок возврата раньше today
+
+        Returns:
+            list: строки get_deadline_issues, сначала самые просроченные
+        """
+        today = today or date.today().isoformat()
+        return self._deadline_issues(today, None, today)
+
+    def get_upcoming_issues(self, days, today=None):
+        """Активные выдачи со сроком возврата от today до today + days дней включительно"""
+        today = today or date.today().isoformat()
+        return self._deadline_issues(today, today, self._days_after(today, days + 1))
+
+    def get_deadline_issues(self, days, today=None):
+        """Просроченные выдачи и выдачи со сроком в ближайшие days дней одним запросом
+
+        Args:
+            days: горизонт предупреждения о сроке возврата, дней
+            today: текущая дата 'YYYY-MM-DD' (по умолчанию - локальная дата)
+
+        Returns:
+            list: (id, instrument_id, inventory_number, name, full_name, address,
+                   issue_date, expected_return_date, overdue_days), упорядочены по сроку
+                   возврата. overdue_days > 0 - дней просрочки, иначе -overdue_days - дней до срока
+        """
+        today = today or date.today().isoformat()
+        return self._deadline_issues(today, None, self._days_after(today, days + 1))
+
+    @staticmethod
+    def _days_after(day, days):
+        """Дата 'YYYY-MM-DD' через days дней после day"""
+        return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+    @cached_query('issues', 'instruments', 'employees', 'addresses')
+    def _deadline_issues(self, today, date_from, date_until):
+        """Активные выдачи со сроком возврата в [date_from, date_until)
+
+        Диапазон читается по индексу idx_issues_status_expected, поэтому стоимость
+        зависит от числа найденных выдач, а не от числа всех активных выдач.
+
+        Args:
+            today: дата отсчета дней просрочки
+            date_from: нижняя граница срока (None - включая все просроченные)
+            date_until: верхняя граница срока, не включительно
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        # Граница '0' отсекает выдачи без срока возврата (NULL и пустая строка)
+        cursor.execute("""
+            SELECT 
+                i.id,
+                ins.id as instrument_id,
+                ins.inventory_number,
+                ins.name,
+                e.full_name,
+                COALESCE(NULLIF(a.full_address, ''), a.name, '') as address,
+                datetime(i.issue_date, 'localtime'),
+                i.expected_return_date,
+                CAST(julianday(?) - julianday(i.expected_return_date) AS INTEGER) as overdue_days
+            FROM issues i
+            JOIN instruments ins ON i.instrument_id = ins.id
+            JOIN employees e ON i.employee_id = e.id
+            LEFT JOIN addresses a ON i.address_id = a.id
+            WHERE i.status = 'Выдан'
+                AND i.expected_return_date >= ?
+                AND i.expected_return_date < ?
+            ORDER BY i.expected_return_date, i.id
+        """, (today, date_from or '0', date_until))
+
+        issues = cursor.fetchall()
+        conn.close()
+
+        return issues
+
+    @cached_query('issues', 'instruments', 'employees', 'addresses')
     def get_issue_by_id(self, issue_id):
         """Получение выдачи по ID"""
         conn = self.get_connection()
@@ -587,6 +1823,7 @@ class DatabaseManager:
         
         return issue
     
+    @invalidates('issues', 'instruments', 'operation_history')
     def issue_instrument(self, instrument_id, employee_id, expected_return_date, notes, issued_by, address_id=None):
         """Выдача инструмента"""
         conn = self.get_connection()
@@ -640,6 +1877,108 @@ class DatabaseManager:
             conn.close()
             return False, f"Ошибка выдачи: {e}"
     
+    @invalidates('issues', 'instruments', 'operation_history')
+    def issue_instruments_batch(self, instrument_ids, employee_id, expected_return_date, notes,
+                                issued_by, address_id=None, allow_partial=False):
+        """Групповая выдача инструментов одной транзакцией
+
+        Выдача оформляется групповым актом в таблице batch_issues.
+        Если часть инструментов недоступна, по умолчанию ничего не выдается.
+
+        Args:
+            instrument_ids: ID выдаваемых инструментов
+            allow_partial: выдать доступные инструменты, даже если часть недоступна
+
+        Returns:
+            tuple: (успех, сообщение, конфликты), где конфликты - список
+            кортежей (instrument_id, причина)
+        """
+        instrument_ids = list(dict.fromkeys(instrument_ids))  # без повторов, с сохранением порядка
+        if not instrument_ids:
+            return False, "Не выбраны инструменты для выдачи", []
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            # Блокировка на запись до проверки статусов, чтобы их не изменили параллельно
+            cursor.execute("BEGIN IMMEDIATE")
+
+            id_filter, params = self._id_filter(cursor, instrument_ids)
+            cursor.execute(f"""
+                SELECT id, status FROM instruments WHERE id IN ({id_filter})
+            """, params)
+            statuses = dict(cursor.fetchall())
+
+            available = []
+            conflicts = []
+            for instrument_id in instrument_ids:
+                status = statuses.get(instrument_id)
+                if status is None:
+                    conflicts.append((instrument_id, "Инструмент не найден"))
+                elif status != 'Доступен':
+                    conflicts.append((instrument_id, f"Инструмент недоступен (статус: {status})"))
+                else:
+                    available.append(instrument_id)
+
+            if not available or (conflicts and not allow_partial):
+                conn.rollback()
+                self._drop_id_filter(cursor)
+                conn.close()
+                return False, f"Выдача отменена: недоступно инструментов: {len(conflicts)}", conflicts
+
+            # Групповой акт
+            cursor.execute("""
+                INSERT INTO batch_issues
+                (employee_id, expected_return_date, notes, issued_by)
+                VALUES (?, ?, ?, ?)
+            """, (employee_id, expected_return_date, notes, issued_by))
+            batch_id = cursor.lastrowid
+
+            # Записи о выдаче; их ID нужны для истории
+            issue_ids = []
+            for instrument_id in available:
+                cursor.execute("""
+                    INSERT INTO issues 
+                    (batch_id, instrument_id, employee_id, expected_return_date, 
+                     notes, issued_by, status, address_id)
+                    VALUES (?, ?, ?, ?, ?, ?, 'Выдан', ?)
+                """, (batch_id, instrument_id, employee_id, expected_return_date,
+                      notes, issued_by, address_id))
+                issue_ids.append(cursor.lastrowid)
+
+            # Обновление статусов инструментов
+            cursor.executemany("""
+                UPDATE instruments 
+                SET status = 'Выдан'
+                WHERE id = ?
+            """, [(instrument_id,) for instrument_id in available])
+
+            # Запись в историю по всем выдачам акта (по только что записанным
+            # строкам, без поиска выдач акта в таблице issues)
+            cursor.executemany("""
+                INSERT INTO operation_history
+                (issue_id, operation_type, instrument_id, employee_id, 
+                 performed_by, notes)
+                VALUES (?, 'Выдача', ?, ?, ?, ?)
+            """, [(issue_id, instrument_id, employee_id, issued_by, notes)
+                  for issue_id, instrument_id in zip(issue_ids, available)])
+
+            conn.commit()
+            self._drop_id_filter(cursor)
+            conn.close()
+
+            message = f"Успешно выдано инструментов: {len(available)}"
+            if conflicts:
+                message += f"\nНе выдано: {len(conflicts)}"
+            return True, message, conflicts
+        except Exception as e:
+            conn.rollback()
+            self._drop_id_filter(cursor)
+            conn.close()
+            return False, f"Ошибка выдачи: {e}", []
+    
+    @invalidates('issues', 'instruments', 'operation_history')
     def return_instrument(self, issue_id, notes, returned_by):
         """Возврат инструмента"""
         conn = self.get_connection()
@@ -698,71 +2037,78 @@ class DatabaseManager:
             conn.close()
             return False, f"Ошибка возврата: {e}"
 
+    @invalidates('issues', 'instruments', 'operation_history')
     def return_instruments_batch(self, issue_ids, notes, returned_by):
-        """Массовый возврат инструментов"""
+        """Массовый возврат инструментов
+
+        Все выдачи проверяются одним запросом, возврат выполняется
+        групповыми UPDATE/INSERT в одной транзакции.
+        """
+        issue_ids = list(dict.fromkeys(issue_ids))  # без повторов, с сохранением порядка
         conn = self.get_connection()
         cursor = conn.cursor()
 
         try:
-            returned_count = 0
             errors = []
+            cursor.execute("BEGIN IMMEDIATE")
+
+            # Проверка всех выдач одним запросом
+            id_filter, params = self._id_filter(cursor, issue_ids)
+            cursor.execute(f"""
+                SELECT id, status
+                FROM issues
+                WHERE id IN ({id_filter})
+            """, params)
+            statuses = dict(cursor.fetchall())
 
+            returned_ids = []
             for issue_id in issue_ids:
-                try:
-                    # Получение информации о выдаче
-                    cursor.execute("""
-                        SELECT instrument_id, employee_id, status
-                        FROM issues
-                        WHERE id = ?
-                    """, (issue_id,))
-
-                    issue = cursor.fetchone()
-                    if not issue:
-                        errors.append(f"Выдача ID {issue_id}: не найдена")
-                        continue
-
-                    if issue[2] != 'Выдан':
-                        errors.append(f"Выдача ID {issue_id}: инструмент уже возвращен")
-                        continue
-
-                    instrument_id, employee_id, _ = issue
-
-                    # Обновление записи о выдаче
-                    cursor.execute("""
-                        UPDATE issues
-                        SET actual_return_date = CURRENT_TIMESTAMP,
-                            status = 'Возвращен',
-                            notes = CASE
-                                WHEN notes IS NULL OR notes = '' THEN ?
-                                ELSE notes || '; ' || ?
-                            END
-                        WHERE id = ?
-                    """, (notes, notes, issue_id))
-
-                    # Обновление статуса инструмента
-                    cursor.execute("""
-                        UPDATE instruments
-                        SET status = 'Доступен'
-                        WHERE id = ?
-                    """, (instrument_id,))
-
-                    # Запись в историю
-                    cursor.execute("""
-                        INSERT INTO operation_history
-                        (issue_id, operation_type, instrument_id, employee_id,
-                         performed_by, notes)
-                        VALUES (?, 'Возврат', ?, ?, ?, ?)
-                    """, (issue_id, instrument_id, employee_id, returned_by, notes))
-
-                    returned_count += 1
-
-                except Exception as e:
-                    errors.append(f"Выдача ID {issue_id}: {e}")
+                status = statuses.get(issue_id)
+                if status is None:
+                    errors.append(f"Выдача ID {issue_id}: не найдена")
+                elif status != 'Выдан':
+                    errors.append(f"Выдача ID {issue_id}: инструмент уже возвращен")
+                else:
+                    returned_ids.append(issue_id)
+
+            if returned_ids:
+                id_filter, params = self._id_filter(cursor, returned_ids)
+
+                # Обновление записей о выдаче
+                cursor.execute(f"""
+                    UPDATE issues
+                    SET actual_return_date = CURRENT_TIMESTAMP,
+                        status = 'Возвращен',
+                        notes = CASE
+                            WHEN notes IS NULL OR notes = '' THEN ?
+                            ELSE notes || '; ' || ?
+                        END
+                    WHERE id IN ({id_filter})
+                """, (notes, notes, *params))
+
+                # Обновление статусов инструментов
+                cursor.execute(f"""
+                    UPDATE instruments
+                    SET status = 'Доступен'
+                    WHERE id IN (SELECT instrument_id FROM issues WHERE id IN ({id_filter}))
+                """, params)
+
+                # Запись в историю
+                cursor.execute(f"""
+                    INSERT INTO operation_history
+                    (issue_id, operation_type, instrument_id, employee_id,
+                     performed_by, notes)
+                    SELECT id, 'Возврат', instrument_id, employee_id, ?, ?
+                    FROM issues
+                    WHERE id IN ({id_filter})
+                    ORDER BY id
+                """, (returned_by, notes, *params))
 
             conn.commit()
+            self._drop_id_filter(cursor)
             conn.close()
 
-            result_message = f"Успешно возвращено: {returned_count} инструментов"
+            result_message = f"Успешно возвращено: {len(returned_ids)} инструментов"
             if errors:
                 result_message += f"\nОшибки: {len(errors)}"
                 result_message += "\n" + "\n".join(errors[:5])  # Показываем первые 5 ошибок
@@ -770,27 +2116,50 @@ class DatabaseManager:
             return True, result_message
 
         except Exception as e:
+            conn.rollback()
+            self._drop_id_filter(cursor)
             conn.close()
             return False, f"Ошибка массового возврата: {e}"
+
+    # Больше этого числа ID передаются через временную таблицу, а не параметрами IN (...)
+    ID_FILTER_TEMP_TABLE_THRESHOLD = 500
+
+    def _id_filter(self, cursor, ids):
+        """Подзапрос для условия "id IN (...)" по списку ID
+
+        Небольшие списки передаются параметрами, большие - через временную
+        таблицу, чтобы не упираться в ограничение SQLite на число параметров.
+
+        Returns:
+            tuple: (текст для подстановки в IN (...), параметры)
+        """
+        if len(ids) <= self.ID_FILTER_TEMP_TABLE_THRESHOLD:
+            return ', '.join('?' * len(ids)) or 'NULL', list(ids)
+
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_ids (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.batch_ids")
+        cursor.executemany("INSERT OR IGNORE INTO temp.batch_ids (id) VALUES (?)",
+                           [(item_id,) for item_id in ids])
+        return "SELECT id FROM temp.batch_ids", []
+
+    def _drop_id_filter(self, cursor):
+        """Очистка временной таблицы, созданной _id_filter"""
+        try:
+            cursor.execute("DROP TABLE IF EXISTS temp.batch_ids")
+        except sqlite3.Error:
+            pass
     
+    @cached_query('issues')
     def get_issues_statistics(self):
         """Получение статистики по выдачам"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         # Всего активных выдач
-        cursor.execute("""
-            SELECT COUNT(*) FROM issues WHERE status = 'Выдан'
-        """)
-        total = cursor.fetchone()[0]
+        total = self._read_stat_counters(cursor).get('active_issues', 0)
         
         # Просроченные выдачи
-        cursor.execute("""
-            SELECT COUNT(*) FROM issues 
-            WHERE status = 'Выдан' 
-            AND expected_return_date < date('now')
-        """)
-        overdue = cursor.fetchone()[0]
+        overdue = self._count_overdue_issues(cursor)
         
         conn.close()
         
@@ -798,7 +2167,9 @@ class DatabaseManager:
     
     # ========== ЖУРНАЛ ОПЕРАЦИЙ ==========
     
-    def get_operation_history(self, filter_type='Все', limit=100, search_text='', date_from=None, date_to=None):
+    @cached_query('instruments', 'employees', 'issues', 'operation_history', 'addresses')
+    def get_operation_history(self, filter_type='Все', limit=100, search_text='', date_from=None, date_to=None,
+                              order_by=None, direction='desc', offset=0, count=False):
         """Получение журнала операций с поиском по всем столбцам и фильтром по дате
         
         Args:
@@ -807,13 +2178,90 @@ class DatabaseManager:
             search_text: текст для поиска
             date_from: начальная дата (строка в формате 'YYYY-MM-DD' или None)
             date_to: конечная дата (строка в формате 'YYYY-MM-DD' или None)
+            order_by: поле сортировки из HISTORY_SORT_FIELDS (по умолчанию - по дате операции)
+            direction: направление сортировки ('asc' или 'desc')
+            offset: количество пропускаемых записей
+            count: вернуть количество найденных записей вместо списка
         """
+        if count and filter_type == 'Все' and not (search_text or '').strip() \
+                and not date_from and not date_to:
+            return self.get_table_row_count('operation_history')
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Функция для преобразования текста в нижний регистр (для поиска)
-        conn.create_function('LOWER_PY', 1, lambda x: x.lower() if x else '')
+        query, params = self._build_history_query(conn, filter_type, search_text, date_from, date_to)
+        if count:
+            cursor.execute(f"SELECT COUNT(*) FROM ({query})", params)
+            total = cursor.fetchone()[0]
+            conn.close()
+            return total
+        query += self._order_clause(self.HISTORY_SORT_FIELDS, order_by or 'operation_date', direction, 'oh.id')
+        query += self._limit_clause(limit, offset, params)
+        
+        cursor.execute(query, params)
+        history = cursor.fetchall()
+        conn.close()
+        
+        return history
+
+    @cached_query('instruments', 'employees', 'issues', 'operation_history', 'addresses')
+    def get_operation_history_page(self, filter_type='Все', search_text='', date_from=None, date_to=None,
+                                   page_size=200, after=None):
+        """Страница журнала операций с постраничной выборкой по ключу (operation_date, id)
+
+        В отличие от OFFSET, стоимость получения страницы не растет с ее номером:
+        выборка продолжается по индексу сразу после последней записи предыдущей страницы.
+
+        Args:
+            filter_type, search_text, date_from, date_to: фильтры как в get_operation_history
+            page_size: количество записей на странице
+            after: курсор, возвращенный предыдущим вызовом (None - первая страница)
+
+        Returns:
+            tuple: (записи, курсор следующей страницы или None, если страница последняя)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
+        query, params = self._build_history_query(conn, filter_type, search_text, date_from, date_to,
+                                                  after=after, with_sort_key=True)
+        query += " ORDER BY oh.operation_date DESC, oh.id DESC LIMIT ?"
+        params.append(page_size)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        # Последняя колонка - ключ сортировки, в результат она не входит
+        history = [row[:-1] for row in rows]
+        next_cursor = None
+        if len(rows) == page_size:
+            next_cursor = (rows[-1][-1], rows[-1][0])
+        return history, next_cursor
+
+    def iter_operation_history(self, filter_type='Все', search_text='', date_from=None, date_to=None,
+                               page_size=500):
+        """Последовательный обход всех записей журнала страницами (для экспорта)"""
+        after = None
+        while True:
+            history, after = self.get_operation_history_page(
+                filter_type, search_text, date_from, date_to, page_size=page_size, after=after
+            )
+            yield from history
+            if after is None:
+                break
+
+    def _build_history_query(self, conn, filter_type, search_text, date_from, date_to,
+                             after=None, with_sort_key=False):
+        """Запрос журнала операций с условиями фильтрации, без сортировки и ограничения
+
+        Args:
+            after: курсор (operation_date, id) - выбрать записи, идущие после него
+                при сортировке по убыванию
+            with_sort_key: добавить в конец строки исходное значение operation_date
+                для построения курсора следующей страницы
+        """
         search_text_lower = search_text.lower().strip() if search_text else ''
         has_search = bool(search_text_lower)
         
@@ -828,13 +2276,13 @@ class DatabaseManager:
                 COALESCE(NULLIF(a.full_address, ''), a.name, '') as address,
                 datetime(oh.operation_date, 'localtime') as operation_date,
                 oh.performed_by,
-                oh.notes
+                oh.notes{sort_key_column}
             FROM operation_history oh
             JOIN instruments ins ON oh.instrument_id = ins.id
             JOIN employees e ON oh.employee_id = e.id
             LEFT JOIN issues iss ON oh.issue_id = iss.id
             LEFT JOIN addresses a ON iss.address_id = a.id
-        """
+        """.format(sort_key_column=",\n                oh.operation_date" if with_sort_key else "")
         
         # Условия WHERE
         where_conditions = []
@@ -846,16 +2294,54 @@ class DatabaseManager:
             params.append(filter_type)
         
         # Фильтр по диапазону дат
+        # Сравнение без date() по самой колонке позволяет использовать индекс
         if date_from:
-            where_conditions.append("date(oh.operation_date) >= ?")
+            where_conditions.append("oh.operation_date >= ?")
             params.append(date_from)
         
         if date_to:
-            where_conditions.append("date(oh.operation_date) <= ?")
+            where_conditions.append("oh.operation_date < date(?, '+1 day')")
             params.append(date_to)
         
+        fts_query = self._fts_query(conn, search_text_lower) if has_search else None
+        
         # Поиск по всем столбцам
-        if has_search:
+        if fts_query:
+            # Совпадения в самой записи журнала, в инструменте, сотруднике или адресе выдачи
+            search_conditions = ["""oh.id IN (
+                SELECT rowid FROM history_fts WHERE history_fts MATCH ?
+                UNION
+                SELECT h.id FROM operation_history h
+                WHERE h.instrument_id IN (
+                    SELECT rowid FROM instruments_fts WHERE instruments_fts MATCH ?
+                )
+                UNION
+                SELECT h.id FROM operation_history h
+                WHERE h.employee_id IN (
+                    SELECT rowid FROM employees_fts WHERE employees_fts MATCH ?
+                )
+                UNION
+                SELECT h.id FROM operation_history h
+                WHERE h.issue_id IN (
+                    SELECT id FROM issues WHERE address_id IN (
+                        SELECT rowid FROM addresses_fts WHERE addresses_fts MATCH ?
+                    )
+                )
+            )"""]
+            params.extend([
+                fts_query,
+                '{name inventory_number} : ' + fts_query,
+                'full_name : ' + fts_query,
+                fts_query,
+            ])
+            # Номер записи и дата есть только в самой таблице журнала
+            if all(ch.isdigit() or ch in '-:. ' for ch in search_text_lower):
+                search_pattern = f'%{search_text_lower}%'
+                search_conditions.append("CAST(oh.id AS TEXT) LIKE ?")
+                search_conditions.append("datetime(oh.operation_date, 'localtime') LIKE ?")
+                params.extend([search_pattern, search_pattern])
+            where_conditions.append(f"({' OR '.join(search_conditions)})")
+        elif has_search:
             search_pattern = f'%{search_text_lower}%'
             search_conditions = [
                 "CAST(oh.id AS TEXT) LIKE ?",
@@ -871,23 +2357,22 @@ class DatabaseManager:
             where_conditions.append(f"({' OR '.join(search_conditions)})")
             params.extend([search_pattern] * len(search_conditions))
         
+        # Продолжение после курсора предыдущей страницы
+        if after:
+            where_conditions.append("(oh.operation_date, oh.id) < (?, ?)")
+            params.extend(after)
+        
         # Формируем полный запрос
         if where_conditions:
             query = base_query + " WHERE " + " AND ".join(where_conditions)
         else:
             query = base_query
         
-        query += " ORDER BY oh.operation_date DESC LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        history = cursor.fetchall()
-        conn.close()
-        
-        return history
+        return query, params
 
     # ========== АДРЕСА ==========
 
+    @cached_query('addresses')
     def get_addresses(self):
         """Получение списка адресов"""
         conn = self.get_connection()
@@ -903,6 +2388,7 @@ class DatabaseManager:
         conn.close()
         return addresses
 
+    @invalidates('addresses')
     def add_address(self, name, full_address=''):
         """Добавление нового адреса"""
         if not name:
@@ -925,6 +2411,7 @@ class DatabaseManager:
             conn.close()
             return False, str(e)
 
+    @cached_query('addresses')
     def get_address_by_id(self, address_id):
         """Получение адреса по ID"""
         conn = self.get_connection()
@@ -940,6 +2427,7 @@ class DatabaseManager:
         conn.close()
         return address
     
+    @invalidates('addresses')
     def update_address(self, address_id, name, full_address=''):
         """Обновление адреса"""
         if not name:
@@ -962,6 +2450,7 @@ class DatabaseManager:
             conn.close()
             return False, str(e)
     
+    @invalidates('addresses', 'issues')
     def delete_address(self, address_id):
         """Удаление адреса"""
         conn = self.get_connection()
@@ -988,48 +2477,89 @@ class DatabaseManager:
     
     # ========== СТАТИСТИКА ==========
     
+    @cached_query('instruments', 'employees', 'issues', 'operation_history', 'addresses')
     def get_general_statistics(self):
         """Получение общей статистики"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         stats = {}
+        counters = self._read_stat_counters(cursor)
         
         # Всего инструментов
-        cursor.execute("SELECT COUNT(*) FROM instruments")
-        stats['total_instruments'] = cursor.fetchone()[0]
+        stats['total_instruments'] = counters.get('instruments', 0)
         
         # Инструменты по статусам
-        cursor.execute("""
-            SELECT status, COUNT(*) 
-            FROM instruments 
-            GROUP BY status
-        """)
-        stats['instruments_by_status'] = dict(cursor.fetchall())
+        stats['instruments_by_status'] = self._instruments_by_status(counters)
         
         # Всего сотрудников
-        cursor.execute("SELECT COUNT(*) FROM employees WHERE status = 'Активен'")
-        stats['active_employees'] = cursor.fetchone()[0]
+        stats['active_employees'] = counters.get('active_employees', 0)
         
         # Всего активных выдач
-        cursor.execute("SELECT COUNT(*) FROM issues WHERE status = 'Выдан'")
-        stats['active_issues'] = cursor.fetchone()[0]
+        stats['active_issues'] = counters.get('active_issues', 0)
         
         # Просроченные выдачи
-        cursor.execute("""
-            SELECT COUNT(*) FROM issues 
-            WHERE status = 'Выдан' 
-            AND expected_return_date < date('now')
-        """)
-        stats['overdue_issues'] = cursor.fetchone()[0]
+        stats['overdue_issues'] = self._count_overdue_issues(cursor)
         
         # Всего операций в истории
-        cursor.execute("SELECT COUNT(*) FROM operation_history")
-        stats['total_operations'] = cursor.fetchone()[0]
+        stats['total_operations'] = counters.get('operations', 0)
         
         conn.close()
         return stats
     
+    def _read_stat_counters(self, cursor):
+        """Счетчики статистики из таблицы stat_counters (поддерживаются триггерами)"""
+        cursor.execute("SELECT name, value FROM stat_counters")
+        return dict(cursor.fetchall())
+    
+    @staticmethod
+    def _instruments_by_status(counters):
+        """Количество инструментов по статусам из счетчиков статистики"""
+        prefix = 'instruments_status:'
+        return {
+            name[len(prefix):]: value
+            for name, value in counters.items()
+            if name.startswith(prefix) and value > 0
+        }
+    
+    def _count_overdue_issues(self, cursor):
+        """Количество просроченных выдач (диапазон по индексу idx_issues_status_expected)"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM issues 
+            WHERE status = 'Выдан' 
+            AND expected_return_date < date('now')
+        """)
+        return cursor.fetchone()[0]
+    
+    @connection_scope
+    def rebuild_stat_counters(self):
+        """Пересчет счетчиков статистики по текущему содержимому таблиц"""
+        conn = self.get_connection()
+        try:
+            conn.executescript("BEGIN;\n" + STAT_COUNTERS_REBUILD_SQL + "\nCOMMIT;")
+            return True, "Счетчики статистики пересчитаны"
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Ошибка пересчета счетчиков: {e}"
+        finally:
+            conn.close()
+
+    @connection_scope
+    def rebuild_rollups(self):
+        """Пересчет сводных таблиц выдач по текущему содержимому issues"""
+        conn = self.get_connection()
+        try:
+            conn.executescript("BEGIN;\n" + ROLLUPS_REBUILD_SQL + "\nCOMMIT;")
+            self.clear_cache()
+            self._analytics_snapshot.invalidate()
+            return True, "Сводные данные пересчитаны"
+        except sqlite3.Error as e:
+            conn.rollback()
+            return False, f"Ошибка пересчета сводных данных: {e}"
+        finally:
+            conn.close()
+    
+    @cached_query('instruments', 'issues')
     def get_instruments_by_category(self):
         """Статистика инструментов по категориям"""
         conn = self.get_connection()
@@ -1050,24 +2580,35 @@ class DatabaseManager:
         conn.close()
         return result
     
+    @cached_query('employees', 'issues')
     def get_top_employees_by_issues(self, limit=10):
         """Топ сотрудников по количеству выдач"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Итоги из сводных таблиц rollup_employee и rollup_due
         cursor.execute("""
             SELECT 
                 e.full_name,
                 e.department,
-                COUNT(i.id) as total_issues,
-                SUM(CASE WHEN i.status = 'Выдан' THEN 1 ELSE 0 END) as active_issues,
-                SUM(CASE WHEN i.status = 'Выдан' AND i.expected_return_date < date('now') THEN 1 ELSE 0 END) as overdue
-            FROM employees e
-            LEFT JOIN issues i ON e.id = i.employee_id
-            WHERE e.status = 'Активен'
-            GROUP BY e.id, e.full_name, e.department
-            HAVING COUNT(i.id) > 0
-            ORDER BY total_issues DESC
+                r.total_issues,
+                COALESCE(d.active_issues, 0) as active_issues,
+                COALESCE(d.overdue, 0) as overdue
+            FROM (
+                SELECT employee_id, SUM(issues) as total_issues
+                FROM rollup_employee
+                GROUP BY employee_id
+            ) r
+            JOIN employees e ON e.id = r.employee_id
+            LEFT JOIN (
+                SELECT employee_id,
+                       SUM(active) as active_issues,
+                       SUM(CASE WHEN due_date > '' AND due_date < date('now') THEN active ELSE 0 END) as overdue
+                FROM rollup_due
+                GROUP BY employee_id
+            ) d ON d.employee_id = r.employee_id
+            WHERE e.status = 'Активен' AND r.total_issues > 0
+            ORDER BY r.total_issues DESC
             LIMIT ?
         """, (limit,))
         
@@ -1075,8 +2616,9 @@ class DatabaseManager:
         conn.close()
         return result
     
+    @cached_query('instruments', 'issues')
     def get_most_used_instruments(self, limit=10):
-        """Самые используемые инструменты"""
+        """Самые используемые инструменты (выдачи и возвраты из rollup_instrument)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -1085,13 +2627,16 @@ class DatabaseManager:
                 ins.name,
                 ins.inventory_number,
                 ins.category,
-                COUNT(oh.id) as usage_count,
-                SUM(CASE WHEN oh.operation_type = 'Выдача' THEN 1 ELSE 0 END) as issues_count,
-                SUM(CASE WHEN oh.operation_type = 'Возврат' THEN 1 ELSE 0 END) as returns_count
-            FROM instruments ins
-            LEFT JOIN operation_history oh ON ins.id = oh.instrument_id
-            GROUP BY ins.id, ins.name, ins.inventory_number, ins.category
-            HAVING COUNT(oh.id) > 0
+                r.issues_count + r.returns_count as usage_count,
+                r.issues_count,
+                r.returns_count
+            FROM (
+                SELECT instrument_id, SUM(issues) as issues_count, SUM(returns) as returns_count
+                FROM rollup_instrument
+                GROUP BY instrument_id
+            ) r
+            JOIN instruments ins ON ins.id = r.instrument_id
+            WHERE r.issues_count + r.returns_count > 0
             ORDER BY usage_count DESC
             LIMIT ?
         """, (limit,))
@@ -1100,40 +2645,39 @@ class DatabaseManager:
         conn.close()
         return result
     
+    @cached_query('issues')
     def get_issues_by_period(self, days=30):
-        """Статистика выдач за период"""
+        """Статистика выдач за период (по сводной таблице rollup_daily)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
             SELECT 
-                date(issue_date) as issue_day,
-                COUNT(*) as count
-            FROM issues
-            WHERE issue_date >= date('now', '-' || ? || ' days')
-            GROUP BY date(issue_date)
-            ORDER BY issue_day DESC
+                day as issue_day,
+                issues as count
+            FROM rollup_daily
+            WHERE day >= date('now', '-' || ? || ' days')
+                AND issues > 0
+            ORDER BY day DESC
         """, (days,))
         
         result = cursor.fetchall()
         conn.close()
         return result
     
+    @cached_query('issues')
     def get_average_usage_time(self):
-        """Среднее время использования инструментов"""
+        """Среднее время использования инструментов (по сводной таблице rollup_daily)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
             SELECT 
-                AVG(julianday(actual_return_date) - julianday(issue_date)) as avg_days,
-                MIN(julianday(actual_return_date) - julianday(issue_date)) as min_days,
-                MAX(julianday(actual_return_date) - julianday(issue_date)) as max_days,
-                COUNT(*) as total_returns
-            FROM issues
-            WHERE status = 'Возвращен' 
-            AND actual_return_date IS NOT NULL
-            AND issue_date IS NOT NULL
+                SUM(usage_days) / SUM(returns) as avg_days,
+                MIN(min_usage_days) as min_days,
+                MAX(max_usage_days) as max_days,
+                COALESCE(SUM(returns), 0) as total_returns
+            FROM rollup_daily
         """)
         
         result = cursor.fetchone()
@@ -1148,111 +2692,132 @@ class DatabaseManager:
             }
         return None
 
+    # Время жизни снимка аналитики, секунд (см. AnalyticsSnapshot)
+    ANALYTICS_SNAPSHOT_TTL = 300
+
+    # Разделы аналитики и таблицы, от которых они зависят
+    ANALYTICS_SECTIONS = {
+        'issues_by_month': ('issues',),
+        'returns_by_month': ('issues',),
+        'avg_usage_days': ('issues',),
+        'overdue_by_category': ('issues', 'instruments'),
+        'issues_by_address': ('issues', 'addresses'),
+        'instrument_status_stats': ('instruments',),
+        'active_issues_trend': ('issues',),
+    }
+
+    @cached_query('instruments', 'employees', 'issues', 'operation_history', 'addresses')
     def get_analytics_data(self):
         """Получение данных для расширенной аналитики"""
+        return self.get_analytics_sections()
+
+    def get_analytics_snapshot(self, force=False):
+        """Данные аналитики из снимка: пересчитываются только устаревшие разделы
+
+        Args:
+            force: проверить изменения таблиц, не дожидаясь истечения времени жизни снимка
+        """
+        return self._analytics_snapshot.get(force)
+
+    @connection_scope
+    def get_table_versions(self):
+        """Версии таблиц: номер увеличивается при каждом изменении строк таблицы"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        versions = dict(conn.execute("SELECT name, version FROM table_versions").fetchall())
+        conn.close()
+        return versions
 
-        try:
-            analytics = {}
+    @connection_scope
+    def get_analytics_sections(self, sections=None):
+        """Вычисление разделов аналитики
 
-            # 1. Выдачи по месяцам за последний год
-            cursor.execute("""
+        Args:
+            sections: имена разделов из ANALYTICS_SECTIONS (None - все разделы)
+
+        Returns:
+            dict: раздел -> данные или None при ошибке
+        """
+        queries = {
+            # Выдачи по месяцам за последний год
+            'issues_by_month': """
                 SELECT
-                    strftime('%Y-%m', issue_date) as month,
-                    COUNT(*) as issue_count
-                FROM issues
-                WHERE issue_date >= date('now', '-12 months')
-                GROUP BY strftime('%Y-%m', issue_date)
+                    substr(day, 1, 7) as month,
+                    SUM(issues) as issue_count
+                FROM rollup_daily
+                WHERE day >= date('now', '-12 months')
+                GROUP BY substr(day, 1, 7)
+                HAVING SUM(issues) > 0
                 ORDER BY month
-            """)
-            analytics['issues_by_month'] = cursor.fetchall()
-
-            # 2. Возвраты по месяцам за последний год
-            cursor.execute("""
+            """,
+            # Возвраты по месяцам за последний год
+            'returns_by_month': """
                 SELECT
-                    strftime('%Y-%m', actual_return_date) as month,
-                    COUNT(*) as return_count
-                FROM issues
-                WHERE actual_return_date IS NOT NULL
-                    AND actual_return_date >= date('now', '-12 months')
-                GROUP BY strftime('%Y-%m', actual_return_date)
+                    substr(day, 1, 7) as month,
+                    SUM(returns) as return_count
+                FROM rollup_daily
+                WHERE day >= date('now', '-12 months')
+                GROUP BY substr(day, 1, 7)
+                HAVING SUM(returns) > 0
                 ORDER BY month
-            """)
-            analytics['returns_by_month'] = cursor.fetchall()
-
-            # 3. Среднее время использования инструментов
-            cursor.execute("""
+            """,
+            # Среднее время использования инструментов
+            'avg_usage_days': """
                 SELECT
-                    AVG(julianday(actual_return_date) - julianday(issue_date)) as avg_days
-                FROM issues
-                WHERE actual_return_date IS NOT NULL
-                    AND status = 'Возвращен'
-                    AND actual_return_date >= date('now', '-12 months')
-            """)
-            avg_usage_result = cursor.fetchone()
-            analytics['avg_usage_days'] = avg_usage_result[0] if avg_usage_result[0] else 0
-
-            # 4. Просроченные выдачи по категориям
-            cursor.execute("""
+                    SUM(usage_days) / SUM(returns) as avg_days
+                FROM rollup_daily
+                WHERE day >= date('now', '-12 months')
+            """,
+            # Просроченные выдачи по категориям
+            'overdue_by_category': """
                 SELECT
                     COALESCE(i.category, 'Без категории') as category,
-                    COUNT(*) as overdue_count
-                FROM issues isu
-                JOIN instruments i ON isu.instrument_id = i.id
-                WHERE isu.status = 'Выдан'
-                    AND isu.expected_return_date < date('now')
+                    SUM(d.active) as overdue_count
+                FROM rollup_due d
+                JOIN instruments i ON d.instrument_id = i.id
+                WHERE d.due_date > '' AND d.due_date < date('now')
                 GROUP BY i.category
+                HAVING SUM(d.active) > 0
                 ORDER BY overdue_count DESC
-            """)
-            analytics['overdue_by_category'] = cursor.fetchall()
-
-            # 5. Выдачи по адресам
-            cursor.execute("""
+            """,
+            # Выдачи по адресам
+            'issues_by_address': """
                 SELECT
                     COALESCE(a.name, 'Не указан') as address,
-                    COUNT(*) as issue_count
-                FROM issues isu
-                LEFT JOIN addresses a ON isu.address_id = a.id
-                WHERE isu.issue_date >= date('now', '-6 months')
+                    SUM(r.issues) as issue_count
+                FROM rollup_address r
+                LEFT JOIN addresses a ON r.address_id = a.id
+                WHERE r.day >= date('now', '-6 months')
                 GROUP BY a.name
+                HAVING SUM(r.issues) > 0
                 ORDER BY issue_count DESC
                 LIMIT 10
-            """)
-            analytics['issues_by_address'] = cursor.fetchall()
-
-            # 6. Статистика по статусам инструментов
-            cursor.execute("""
+            """,
+            # Статистика по статусам инструментов
+            'instrument_status_stats': """
                 SELECT
                     status,
                     COUNT(*) as count
                 FROM instruments
                 GROUP BY status
-            """)
-            analytics['instrument_status_stats'] = cursor.fetchall()
+            """,
+        }
 
-            # 7. Динамика активных выдач по дням (последние 30 дней)
-            cursor.execute("""
-                SELECT
-                    date('now', '-' || (30 - n) || ' days') as date,
-                    (
-                        SELECT COUNT(*)
-                        FROM issues
-                        WHERE status = 'Выдан'
-                            AND issue_date <= date('now', '-' || (30 - n) || ' days')
-                            AND (actual_return_date IS NULL OR actual_return_date > date('now', '-' || (30 - n) || ' days'))
-                    ) as active_count
-                FROM (
-                    SELECT 1 as n UNION SELECT 2 UNION SELECT 3 UNION SELECT 4 UNION SELECT 5 UNION
-                    SELECT 6 UNION SELECT 7 UNION SELECT 8 UNION SELECT 9 UNION SELECT 10 UNION
-                    SELECT 11 UNION SELECT 12 UNION SELECT 13 UNION SELECT 14 UNION SELECT 15 UNION
-                    SELECT 16 UNION SELECT 17 UNION SELECT 18 UNION SELECT 19 UNION SELECT 20 UNION
-                    SELECT 21 UNION SELECT 22 UNION SELECT 23 UNION SELECT 24 UNION SELECT 25 UNION
-                    SELECT 26 UNION SELECT 27 UNION SELECT 28 UNION SELECT 29 UNION SELECT 30
-                )
-                ORDER BY date
-            """)
-            analytics['active_issues_trend'] = cursor.fetchall()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        try:
+            analytics = {}
+            for name in (sections or self.ANALYTICS_SECTIONS):
+                if name == 'active_issues_trend':
+                    # Динамика активных выдач по дням (последние 30 дней)
+                    analytics[name] = self.get_active_issues_trend(30)
+                    continue
+                cursor.execute(queries[name])
+                if name == 'avg_usage_days':
+                    avg_usage_result = cursor.fetchone()
+                    analytics[name] = avg_usage_result[0] if avg_usage_result[0] else 0
+                else:
+                    analytics[name] = cursor.fetchall()
 
             conn.close()
             return analytics
@@ -1262,3 +2827,60 @@ class DatabaseManager:
             conn.close()
             return None
 
+    @cached_query('issues')
+    def get_active_issues_trend(self, days=30, end_date=None):
+        """Количество активных выдач на конец каждого дня периода
+
+        Вычисляется одним проходом по событиям выдачи (+1) и возврата (-1)
+        внутри периода: количество активных выдач на сегодня берется из
+        счетчика, а значения прошлых дней получаются вычитанием событий,
+        произошедших позже. Время зависит от длины периода и числа событий
+        в нем, но не от объема всей истории выдач.
+
+        Args:
+            days: длина периода в днях
+            end_date: последний день периода ('YYYY-MM-DD', по умолчанию сегодня)
+
+        Returns:
+            list: [(дата, количество активных выдач), ...] по возрастанию даты
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        # Даты выдачи и возврата хранятся в UTC (CURRENT_TIMESTAMP)
+        if end_date is None:
+            end_date = cursor.execute("SELECT date('now')").fetchone()[0]
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        start = (end - timedelta(days=days - 1)).isoformat()
+
+        active = self._read_stat_counters(cursor).get('active_issues', 0)
+
+        # Изменение количества активных выдач по дням начиная с первого дня периода.
+        # Выдача без даты возврата, но уже не активная, в счетчик не входит и не учитывается
+        cursor.execute("""
+            SELECT day, SUM(delta) FROM (
+                SELECT substr(issue_date, 1, 10) AS day, 1 AS delta
+                FROM issues
+                WHERE issue_date >= ? AND (status = 'Выдан' OR actual_return_date IS NOT NULL)
+                UNION ALL
+                SELECT substr(actual_return_date, 1, 10), -1
+                FROM issues
+                WHERE actual_return_date >= ?
+            )
+            GROUP BY day
+        """, (start, start))
+        deltas = dict(cursor.fetchall())
+        conn.close()
+
+        # Активные на конец дня d = активные сейчас - изменения после дня d
+        active -= sum(delta for day, delta in deltas.items() if day > end_date)
+        trend = []
+        day = end
+        for _ in range(days):
+            iso_day = day.isoformat()
+            trend.append((iso_day, active))
+            active -= deltas.get(iso_day, 0)
+            day -= timedelta(days=1)
+        trend.reverse()
+        return trend
+
@@ -1980,35 +1980,46 @@ class IssueInstrumentDialog:
         return_date = self.return_date.get()
         notes = self.notes_text.get("1.0", tk.END).strip()
         
-        # Выполнение выдачи для всех инструментов
-        success_count = 0
-        error_messages = []
+        # Выдача всех инструментов одной транзакцией (групповой акт)
+        instrument_ids = [instrument_id for instrument_id, _ in self.selected_instruments]
+        display_texts = dict(self.selected_instruments)
         
-        for instrument_id, display_text in self.selected_instruments:
-            success, message = self.db.issue_instrument(
-                instrument_id, employee_id, return_date, notes, issued_by, address_id=address_id
+        success, message, conflicts = self.db.issue_instruments_batch(
+            instrument_ids, employee_id, return_date, notes, issued_by, address_id=address_id
+        )
+        
+        if not success and conflicts and len(conflicts) < len(instrument_ids):
+            # Часть инструментов недоступна - предлагаем выдать остальные
+            error_text = "\n".join(f"{display_texts[instrument_id]}: {reason}"
+                                   for instrument_id, reason in conflicts)
+            if not messagebox.askyesno(
+                "Частичная выдача",
+                f"Не удалось выдать:\n{error_text}\n\n"
+                f"Выдать остальные инструменты ({len(instrument_ids) - len(conflicts)})?"
+            ):
+                return
+            success, message, conflicts = self.db.issue_instruments_batch(
+                instrument_ids, employee_id, return_date, notes, issued_by,
+                address_id=address_id, allow_partial=True
             )
-            
-            if success:
-                success_count += 1
-            else:
-                error_messages.append(f"{display_text}: {message}")
+        
+        error_text = "\n".join(f"{display_texts[instrument_id]}: {reason}"
+                               for instrument_id, reason in conflicts)
         
         # Показываем результат
-        if success_count == len(self.selected_instruments):
-            messagebox.showinfo("Успех", f"Успешно выдано инструментов: {success_count}")
+        if success and not conflicts:
+            messagebox.showinfo("Успех", message)
             self.callback()
             close_dialog_with_save(self.dialog, "IssueInstrumentDialog")
-        elif success_count > 0:
-            error_text = "\n".join(error_messages)
+        elif success:
+            success_count = len(instrument_ids) - len(conflicts)
             messagebox.showwarning(
                 "Частичный успех", 
-                f"Выдано инструментов: {success_count} из {len(self.selected_instruments)}\n\nОшибки:\n{error_text}"
+                f"Выдано инструментов: {success_count} из {len(instrument_ids)}\n\nОшибки:\n{error_text}"
             )
             self.callback()
         else:
-            error_text = "\n".join(error_messages)
-            messagebox.showerror("Ошибка", f"Не удалось выдать инструменты:\n{error_text}")
+            messagebox.showerror("Ошибка", f"Не удалось выдать инструменты:\n{error_text or message}")
 
     def on_instrument_list_motion(self, event):
         """Обработка движения мыши для показа фото"""
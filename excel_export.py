@@ -35,7 +35,7 @@ class ExcelExporter:
         """Экспорт журнала операций в Excel
         
         Args:
-            history_data: список кортежей с данными об операциях
+            history_data: кортежи с данными об операциях (список или итератор)
             output_path: путь для сохранения Excel файла
             filter_type: тип фильтра ('Все', 'Выдача', 'Возврат')
         """
@@ -82,35 +82,37 @@ class ExcelExporter:
             cell.font = header_font
             cell.alignment = header_alignment
         
-        # Заполняем данные
-        if history_data:
-            for row_idx, record in enumerate(history_data, 5):
-                # Форматирование даты
-                operation_date = self._format_date(record[6]) if len(record) > 6 else ''
+        # Заполняем данные (history_data может быть итератором, поэтому строки считаем по ходу)
+        row_count = 0
+        for row_idx, record in enumerate(history_data, 5):
+            row_count += 1
+            # Форматирование даты
+            operation_date = self._format_date(record[6]) if len(record) > 6 else ''
+            
+            # Заполняем строку данными
+            data = [
+                row_idx - 4,  # №
+                str(record[1]) if len(record) > 1 else '',  # Тип
+                str(record[2]) if len(record) > 2 else '',  # Инв. номер
+                str(record[3]) if len(record) > 3 else '',  # Инструмент
+                str(record[4]) if len(record) > 4 else '',  # Сотрудник
+                str(record[5]) if len(record) > 5 else '',  # Адрес
+                operation_date,  # Дата операции
+                str(record[7]) if len(record) > 7 else '',  # Выполнил
+                str(record[8]) if len(record) > 8 else ''   # Примечание
+            ]
+            
+            for col_idx, value in enumerate(data, 1):
+                cell = self.ws.cell(row=row_idx, column=col_idx)
+                cell.value = value
+                cell.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
+                cell.font = Font(size=9)
                 
-                # Заполняем строку данными
-                data = [
-                    row_idx - 4,  # №
-                    str(record[1]) if len(record) > 1 else '',  # Тип
-                    str(record[2]) if len(record) > 2 else '',  # Инв. номер
-                    str(record[3]) if len(record) > 3 else '',  # Инструмент
-                    str(record[4]) if len(record) > 4 else '',  # Сотрудник
-                    str(record[5]) if len(record) > 5 else '',  # Адрес
-                    operation_date,  # Дата операции
-                    str(record[7]) if len(record) > 7 else '',  # Выполнил
-                    str(record[8]) if len(record) > 8 else ''   # Примечание
-                ]
-                
-                for col_idx, value in enumerate(data, 1):
-                    cell = self.ws.cell(row=row_idx, column=col_idx)
-                    cell.value = value
-                    cell.alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-                    cell.font = Font(size=9)
-                    
-                    # Чередование цветов строк
-                    if (row_idx - 4) % 2 == 0:
-                        cell.fill = PatternFill(start_color='F2F2F2', end_color='F2F2F2', fill_type='solid')
-        else:
+                # Чередование цветов строк
+                if (row_idx - 4) % 2 == 0:
+                    cell.fill = PatternFill(start_color='F2F2F2', end_color='F2F2F2', fill_type='solid')
+        
+        if not row_count:
             # Если нет данных
             self.ws['A5'] = "Нет данных для отображения"
             self.ws['A5'].alignment = Alignment(horizontal='center')
@@ -144,16 +146,16 @@ class ExcelExporter:
         )
         
         # Применяем границы ко всем ячейкам таблицы
-        if history_data:
-            max_row = 4 + len(history_data)
+        if row_count:
+            max_row = 4 + row_count
             for row in range(4, max_row + 1):
                 for col in range(1, 10):
                     self.ws.cell(row=row, column=col).border = thin_border
         
         # Итоговая информация
-        if history_data:
+        if row_count:
             info_row = max_row + 2
-            self.ws.cell(row=info_row, column=1).value = f"Всего записей: {len(history_data)}"
+            self.ws.cell(row=info_row, column=1).value = f"Всего записей: {row_count}"
             self.ws.cell(row=info_row, column=1).font = Font(bold=True, size=10)
         
         # Сохраняем файл
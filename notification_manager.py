@@ -4,24 +4,50 @@
 Система уведомлений о просроченных возвратах и других событиях
 """
 
+import heapq
 import threading
-import time
 import queue
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 
 
 class NotificationManager:
     """Класс для управления уведомлениями"""
 
+    # Уровни уведомления по выдаче: уведомление повторяется только при повышении
+    # уровня или по истечении интервала повтора для уровня
+    LEVEL_WARNING = 1
+    LEVEL_OVERDUE = 2
+    LEVEL_CRITICAL = 3
+
+    # Настройка интервала повтора (часов, 0 - не повторять) для каждого уровня
+    RENOTIFY_SETTINGS = {
+        LEVEL_WARNING: 'renotify_warning_hours',
+        LEVEL_OVERDUE: 'renotify_overdue_hours',
+        LEVEL_CRITICAL: 'renotify_critical_hours',
+    }
+
     def __init__(self, db_manager, telegram_bot=None):
         self.db = db_manager
         self.telegram_bot = telegram_bot
         self.is_running = False
-        self.check_interval = 300  # Проверка каждые 5 минут
         self.notification_thread = None
 
+        # Моменты смены состояния выдач (начало предупреждения, просрочка,
+        # критическая просрочка) - куча, поток просыпается к ближайшему из них
+        self._deadlines = []
+        self._rearm = True  # перестроить кучу по БД перед следующей проверкой
+        self._wakeup = threading.Event()
+        # Предельное время ожидания, секунд: защита от перевода системных часов.
+        # Пробуждение по нему без наступившего срока не обращается к БД
+        self.max_wait = 3600
+
         # Очередь для desktop уведомлений (для обработки в главном потоке)
         self.notification_queue = queue.Queue()
+        # Пробуждение главного потока при появлении уведомлений: не чаще одного
+        # раза до следующего вызова get_pending_notifications
+        self._pending_callback = None
+        self._pending_lock = threading.Lock()
+        self._wakeup_posted = False
 
         # Настройки уведомлений
         self.settings = {
@@ -29,6 +55,9 @@ class NotificationManager:
             'enable_telegram_notifications': True,
             'overdue_warning_days': 1,  # Предупреждать за 1 день до просрочки
             'overdue_critical_days': 3,  # Критическое уведомление через 3 дня просрочки
+            'renotify_warning_hours': 24,  # Повтор напоминания о сроке
+            'renotify_overdue_hours': 24,  # Повтор уведомления о просрочке
+            'renotify_critical_hours': 8,  # Повтор уведомления о критической просрочке
         }
 
         self.load_settings()
@@ -64,6 +93,8 @@ class NotificationManager:
             return
 
         self.is_running = True
+        self._rearm = True
+        self.db.add_change_listener(self._on_data_changed)
         self.notification_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.notification_thread.start()
         print("✅ Система уведомлений запущена")
@@ -71,71 +102,185 @@ class NotificationManager:
     def stop_monitoring(self):
         """Остановка мониторинга уведомлений"""
         self.is_running = False
+        self.db.remove_change_listener(self._on_data_changed)
+        self._wakeup.set()
         if self.notification_thread:
             self.notification_thread.join(timeout=5)
         print("❌ Система уведомлений остановлена")
 
+    def set_database(self, db_manager):
+        """Переключение на новый экземпляр DatabaseManager (например, после восстановления БД)
+
+        Подписка на изменения переносится на новый экземпляр, сроки перестраиваются
+        по его данным при ближайшей проверке.
+        """
+        if self.is_running:
+            self.db.remove_change_listener(self._on_data_changed)
+            db_manager.add_change_listener(self._on_data_changed)
+        self.db = db_manager
+        self._rearm = True
+        self._wakeup.set()
+
     def _monitoring_loop(self):
-        """Основной цикл мониторинга"""
+        """Основной цикл мониторинга: проверка при наступлении срока или изменении выдач"""
         while self.is_running:
+            # Сброс до проверки: изменение во время проверки разбудит поток снова
+            self._wakeup.clear()
             try:
-                self._check_overdue_items()
-                self._check_upcoming_deadlines()
+                if self._take_due_check(datetime.now()):
+                    self._check_deadlines()
             except Exception as e:
                 print(f"Ошибка в цикле уведомлений: {e}")
 
-            # Ждем следующей проверки
-            time.sleep(self.check_interval)
-
-    def _check_overdue_items(self):
-        """Проверка просроченных возвратов"""
+            self._wakeup.wait(self._seconds_until_next_check(datetime.now()))
+
+    def _on_data_changed(self, tables):
+        """Выдача или возврат: сроки перестраиваются, проверка выполняется сразу"""
+        if 'issues' in tables:
+            self._rearm = True
+            self._wakeup.set()
+
+    def _take_due_check(self, now):
+        """Нужна ли проверка сейчас; наступившие сроки снимаются с кучи"""
+        if self._rearm:
+            self._rearm = False
+            self._deadlines = self._build_deadlines(now)
+            return True
+        due = False
+        while self._deadlines and self._deadlines[0] <= now:
+            heapq.heappop(self._deadlines)
+            due = True
+        return due
+
+    def _build_deadlines(self, now):
+        """Куча будущих моментов смены состояния для сроков возврата активных выдач"""
+        warning_days = self.settings['overdue_warning_days']
+        critical_days = self.settings['overdue_critical_days']
+        moments = set()
+        for value in self.db.get_active_due_dates():
+            try:
+                due_date = date.fromisoformat(value[:10])
+            except ValueError:
+                continue
+            # Начало окна предупреждения, первый день просрочки, критическая просрочка
+            for day in (due_date - timedelta(days=warning_days),
+                        due_date + timedelta(days=1),
+                        due_date + timedelta(days=critical_days)):
+                moment = datetime.combine(day, time())
+                if moment > now:
+                    moments.add(moment)
+        deadlines = list(moments)
+        heapq.heapify(deadlines)
+        return deadlines
+
+    def _seconds_until_next_check(self, now):
+        """Время ожидания до ближайшего срока (не больше max_wait)"""
+        if self._rearm:
+            return 0
+        if not self._deadlines:
+            return self.max_wait
+        return max(0, min((self._deadlines[0] - now).total_seconds(), self.max_wait))
+
+    def get_next_check_time(self):
+        """Ближайший момент плановой проверки или None, если сроков нет"""
+        deadlines = self._deadlines
+        return deadlines[0] if deadlines else None
+
+    def _check_deadlines(self, now=None):
+        """Проверка просроченных возвратов и приближающихся сроков одним запросом
+
+        БД возвращает только просроченные выдачи и выдачи со сроком в ближайшие
+        overdue_warning_days дней, поэтому стоимость проверки не зависит от
+        общего числа активных выдач. Формируются и отправляются уведомления
+        только по выдачам, которые еще не были отправлены на текущем уровне.
+        """
         try:
-            # Получаем активные выдачи
-            active_issues = self.db.get_active_issues()
-
-            overdue_items = []
-            for issue in active_issues:
-                expected_return = issue[7]  # expected_return_date
-                if expected_return:
-                    expected_date = datetime.strptime(expected_return, '%Y-%m-%d')
-                    now = datetime.now()
+            now = now or datetime.now()
+            overdue_items, upcoming_items = self._split_deadline_issues(now.date())
 
-                    if now > expected_date:
-                        overdue_days = (now - expected_date).days
-                        overdue_items.append((issue, overdue_days))
+            levels = [(issue, days, self._overdue_level(days)) for issue, days in overdue_items]
+            levels += [(issue, days, self.LEVEL_WARNING) for issue, days in upcoming_items]
+            fresh = self._take_new_notifications(levels, now)
 
-            # Отправляем уведомления
+            overdue_items = [(issue, days) for issue, days, level in fresh if level != self.LEVEL_WARNING]
+            upcoming_items = [(issue, days) for issue, days, level in fresh if level == self.LEVEL_WARNING]
             if overdue_items:
                 self._send_overdue_notification(overdue_items)
-
-        except Exception as e:
-            print(f"Ошибка проверки просроченных возвратов: {e}")
-
-    def _check_upcoming_deadlines(self):
-        """Проверка приближающихся сроков возврата"""
-        try:
-            active_issues = self.db.get_active_issues()
-
-            upcoming_items = []
-            warning_days = self.settings['overdue_warning_days']
-
-            for issue in active_issues:
-                expected_return = issue[7]  # expected_return_date
-                if expected_return:
-                    expected_date = datetime.strptime(expected_return, '%Y-%m-%d')
-                    now = datetime.now()
-
-                    # Проверяем, что срок наступает в ближайшие дни
-                    if expected_date > now and (expected_date - now).days <= warning_days:
-                        days_left = (expected_date - now).days
-                        upcoming_items.append((issue, days_left))
-
-            # Отправляем предупреждения
             if upcoming_items:
                 self._send_upcoming_notification(upcoming_items)
 
         except Exception as e:
-            print(f"Ошибка проверки предстоящих сроков: {e}")
+            print(f"Ошибка проверки сроков возврата: {e}")
+
+    def _overdue_level(self, overdue_days):
+        """Уровень уведомления для просрочки в overdue_days дней"""
+        if overdue_days >= self.settings['overdue_critical_days']:
+            return self.LEVEL_CRITICAL
+        return self.LEVEL_OVERDUE
+
+    def _renotify_interval(self, level):
+        """Интервал повтора уведомления для уровня или None, если повтор отключен"""
+        hours = self.settings.get(self.RENOTIFY_SETTINGS[level], 0)
+        return timedelta(hours=hours) if hours else None
+
+    def _take_new_notifications(self, items, now):
+        """Отбор выдач, по которым нужно отправить уведомление, с сохранением состояния
+
+        Уведомление отправляется, если по выдаче еще ничего не отправлялось,
+        уровень повысился или истек интервал повтора. Понижение уровня (срок
+        продлен) запоминается без отправки. Состояние выдач, вышедших из списка
+        (возвращены или срок отодвинут), удаляется. Ближайший повтор добавляется
+        в кучу сроков, чтобы поток проснулся к нему.
+
+        Args:
+            items: (выдача, дни, уровень) для всех текущих просрочек и сроков
+            now: текущее время
+
+        Returns:
+            list: элементы items, требующие отправки
+        """
+        state = self.db.get_notification_state()
+        now_text = now.strftime('%Y-%m-%d %H:%M:%S')
+        fresh = []
+        updates = []
+        next_renotify = None
+
+        for issue, days, level in items:
+            known = state.pop(issue[0], None)
+            interval = self._renotify_interval(level)
+            sent_at = datetime.fromisoformat(known[1]) if known else None
+            if (known is None or level > known[0]
+                    or (interval is not None and now - sent_at >= interval)):
+                fresh.append((issue, days, level))
+                updates.append((issue[0], level, now_text))
+                sent_at = now
+            elif level != known[0]:
+                updates.append((issue[0], level, known[1]))
+
+            if interval is not None and (next_renotify is None or sent_at + interval < next_renotify):
+                next_renotify = sent_at + interval
+
+        if updates or state:
+            self.db.update_notification_state(updates, list(state))
+        if next_renotify is not None:
+            heapq.heappush(self._deadlines, next_renotify)
+        return fresh
+
+    def _split_deadline_issues(self, today=None):
+        """Просроченные (выдача, дней просрочки) и приближающиеся (выдача, дней до срока) выдачи"""
+        today = today or date.today()
+        issues = self.db.get_deadline_issues(self.settings['overdue_warning_days'],
+                                             today.isoformat())
+        overdue_items = []
+        upcoming_items = []
+        for issue in issues:
+            overdue_days = issue[8]
+            if overdue_days > 0:
+                overdue_items.append((issue, overdue_days))
+            else:
+                upcoming_items.append((issue, -overdue_days))
+        # Выдачи упорядочены по сроку: первыми идут самые просроченные
+        return overdue_items, upcoming_items
 
     def _send_overdue_notification(self, overdue_items):
         """Отправка уведомления о просроченных возвратах"""
@@ -145,7 +290,7 @@ class NotificationManager:
             regular_overdue = []
 
             for issue, days in overdue_items:
-                if days >= self.settings['overdue_critical_days']:
+                if self._overdue_level(days) == self.LEVEL_CRITICAL:
                     critical_overdue.append((issue, days))
                 else:
                     regular_overdue.append((issue, days))
@@ -167,8 +312,8 @@ class NotificationManager:
         message += f"Обнаружено {len(overdue_items)} просроченных возвратов:\n\n"
 
         for issue, days in overdue_items[:5]:  # Максимум 5 в уведомлении
-            instrument_name = issue[1]
-            employee_name = issue[2]
+            instrument_name = issue[3]
+            employee_name = issue[4]
             expected_return = issue[7]
 
             message += f"🔴 {instrument_name}\n"
@@ -181,7 +326,7 @@ class NotificationManager:
         message += "⚡ Требуется немедленное вмешательство!"
 
         # Отправляем уведомления
-        self._send_notification("Критическая просрочка инструментов", message)
+        self._send_notification("Критическая просрочка инструментов", message, overdue_items)
 
     def _send_regular_overdue_notification(self, overdue_items):
         """Отправка обычного уведомления о просрочке"""
@@ -189,8 +334,8 @@ class NotificationManager:
         message += f"Обнаружено {len(overdue_items)} просроченных возвратов:\n\n"
 
         for issue, days in overdue_items[:10]:  # Максимум 10 в уведомлении
-            instrument_name = issue[1]
-            employee_name = issue[2]
+            instrument_name = issue[3]
+            employee_name = issue[4]
             expected_return = issue[7]
 
             message += f"🟡 {instrument_name}\n"
@@ -203,7 +348,7 @@ class NotificationManager:
         message += "📞 Необходимо связаться с сотрудниками для возврата."
 
         # Отправляем уведомления
-        self._send_notification("Просроченные возвраты инструментов", message)
+        self._send_notification("Просроченные возвраты инструментов", message, overdue_items)
 
     def _send_upcoming_notification(self, upcoming_items):
         """Отправка уведомления о приближающихся сроках"""
@@ -211,8 +356,8 @@ class NotificationManager:
         message += f"В ближайшие дни истекают сроки возврата {len(upcoming_items)} инструментов:\n\n"
 
         for issue, days_left in upcoming_items[:10]:  # Максимум 10 в уведомлении
-            instrument_name = issue[1]
-            employee_name = issue[2]
+            instrument_name = issue[3]
+            employee_name = issue[4]
             expected_return = issue[7]
 
             urgency_icon = "🔴" if days_left == 0 else "🟡" if days_left == 1 else "🟢"
@@ -230,8 +375,12 @@ class NotificationManager:
         if self.settings['enable_desktop_notifications']:
             self._show_desktop_notification("Напоминание о возвратах", message)
 
-    def _send_notification(self, title, message):
-        """Отправка уведомления всеми доступными способами"""
+    def _send_notification(self, title, message, overdue_items):
+        """Отправка уведомления всеми доступными способами
+
+        Args:
+            overdue_items: (выдача, дней просрочки), вошедшие в уведомление
+        """
         # Desktop уведомление
         if self.settings['enable_desktop_notifications']:
             self._show_desktop_notification(title, message)
@@ -239,7 +388,7 @@ class NotificationManager:
         # Telegram уведомление
         if self.settings['enable_telegram_notifications'] and self.telegram_bot:
             try:
-                self.telegram_bot.send_overdue_notification()
+                self.telegram_bot.send_overdue_notification(overdue_issues=overdue_items)
             except Exception as e:
                 print(f"Ошибка отправки Telegram уведомления: {e}")
 
@@ -248,11 +397,38 @@ class NotificationManager:
         try:
             # Помещаем уведомление в очередь для обработки в главном потоке
             self.notification_queue.put((title, message))
+            self._post_wakeup()
         except Exception as e:
             print(f"Ошибка постановки уведомления в очередь: {e}")
 
+    def set_pending_callback(self, callback):
+        """Функция без аргументов, будящая главный поток при появлении уведомлений
+
+        Вызывается в потоке, поставившем уведомление, один раз на пачку:
+        следующий вызов возможен только после get_pending_notifications.
+        """
+        self._pending_callback = callback
+
+    def _post_wakeup(self):
+        callback = self._pending_callback
+        if callback is None:
+            return
+        with self._pending_lock:
+            if self._wakeup_posted:
+                return
+            self._wakeup_posted = True
+        try:
+            callback()
+        except Exception as e:
+            # Главный поток заберет уведомления при ближайшей обработке очереди
+            print(f"Ошибка пробуждения обработки уведомлений: {e}")
+
     def get_pending_notifications(self):
         """Получить все ожидающие уведомления из очереди"""
+        # Сброс до чтения очереди: уведомление, поставленное во время чтения,
+        # разбудит главный поток снова
+        with self._pending_lock:
+            self._wakeup_posted = False
         notifications = []
         try:
             while not self.notification_queue.empty():
@@ -265,43 +441,31 @@ class NotificationManager:
         """Обновление настроек уведомлений"""
         self.settings.update(new_settings)
         self.save_settings()
+        # Пороги предупреждения и критической просрочки меняют моменты проверок
+        self._rearm = True
+        self._wakeup.set()
 
     def get_overdue_summary(self):
         """Получение сводки по просроченным возвратах"""
         try:
-            active_issues = self.db.get_active_issues()
+            overdue_items, upcoming_items = self._split_deadline_issues()
 
-            overdue_summary = {
-                'total_overdue': 0,
-                'critical_overdue': 0,
-                'upcoming_deadlines': 0,
-                'overdue_items': []
+            return {
+                'total_overdue': len(overdue_items),
+                'critical_overdue': sum(1 for _, days in overdue_items
+                                        if days >= self.settings['overdue_critical_days']),
+                'upcoming_deadlines': len(upcoming_items),
+                'overdue_items': [
+                    {
+                        'instrument': issue[3],
+                        'employee': issue[4],
+                        'expected_return': issue[7],
+                        'overdue_days': days
+                    }
+                    for issue, days in overdue_items
+                ]
             }
 
-            for issue in active_issues:
-                expected_return = issue[7]
-                if expected_return:
-                    expected_date = datetime.strptime(expected_return, '%Y-%m-%d')
-                    now = datetime.now()
-
-                    if now > expected_date:
-                        overdue_days = (now - expected_date).days
-                        overdue_summary['total_overdue'] += 1
-
-                        if overdue_days >= self.settings['overdue_critical_days']:
-                            overdue_summary['critical_overdue'] += 1
-
-                        overdue_summary['overdue_items'].append({
-                            'instrument': issue[1],
-                            'employee': issue[2],
-                            'expected_return': expected_return,
-                            'overdue_days': overdue_days
-                        })
-                    elif (expected_date - now).days <= self.settings['overdue_warning_days']:
-                        overdue_summary['upcoming_deadlines'] += 1
-
-            return overdue_summary
-
         except Exception as e:
             print(f"Ошибка получения сводки просрочек: {e}")
             return {
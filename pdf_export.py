@@ -14,9 +14,40 @@ import os
 import platform
 
 
+class _StreamedStory(list):
+    """Список flowables для doc.build, пополняемый из итератора по ходу верстки
+
+    doc.build забирает flowables из начала списка; следующий flowable берется
+    из итератора, только когда список опустел, поэтому элементы документа
+    не создаются заранее все сразу.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def _fill(self):
+        if self._source is not None and not super().__len__():
+            for flowable in self._source:
+                self.append(flowable)
+                return
+            self._source = None
+
+    def __len__(self):
+        self._fill()
+        return super().__len__()
+
+    def __getitem__(self, index):
+        self._fill()
+        return super().__getitem__(index)
+
+
 class PDFExporter:
     """Класс для экспорта данных в PDF"""
     
+    # Строк журнала операций в одной таблице документа
+    TABLE_CHUNK_ROWS = 200
+    
     def __init__(self):
         self.page_width, self.page_height = A4
         self.styles = getSampleStyleSheet()
@@ -427,7 +458,7 @@ class PDFExporter:
         """Экспорт журнала операций в PDF
         
         Args:
-            history_data: список кортежей с данными об операциях
+            history_data: кортежи с данными об операциях (список или итератор)
             output_path: путь для сохранения PDF файла
             filter_type: тип фильтра ('Все', 'Выдача', 'Возврат')
             title: заголовок документа (если не указан, формируется автоматически)
@@ -452,103 +483,99 @@ class PDFExporter:
             bottomMargin=15*mm
         )
         
-        story = []
-        
+        # history_data может быть итератором (постраничная выгрузка): таблица
+        # формируется порциями по мере верстки, в памяти находится одна порция строк
+        doc.build(_StreamedStory(self._history_story(history_data, title)))
+    
+    def _history_story(self, history_data, title):
+        """Flowables журнала операций: заголовок, таблицы порций строк, итог"""
         # Заголовок
-        story.append(Paragraph(title, self.title_style))
-        story.append(Paragraph(
+        yield Paragraph(title, self.title_style)
+        yield Paragraph(
             f"Дата формирования: {datetime.now().strftime('%d.%m.%Y %H:%M')}",
             self.subtitle_style
-        ))
-        story.append(Spacer(1, 12*mm))
+        )
+        yield Spacer(1, 12*mm)
         
-        # Подготовка данных для таблицы
-        if not history_data:
-            story.append(Paragraph("Нет данных для отображения", self.normal_style))
-        else:
-            # Заголовки таблицы
-            headers = ['№', 'Тип', 'Инв. номер', 'Инструмент', 'Сотрудник', 
-                      'Адрес', 'Дата операции', 'Выполнил', 'Примечание']
-            
-            # Подготовка данных с использованием Paragraph для поддержки кириллицы
-            table_data = []
-            
-            # Заголовки
-            header_row = []
-            for header in headers:
-                header_row.append(Paragraph(header, self.table_header_style))
-            table_data.append(header_row)
-            
-            for idx, record in enumerate(history_data, 1):
-                # Форматирование даты
-                operation_date = self._format_date(record[6]) if len(record) > 6 else ''
-                
-                # Используем Paragraph для всех ячеек для поддержки кириллицы
-                row = [
-                    Paragraph(str(idx), self.normal_style),
-                    Paragraph(str(record[1]) if len(record) > 1 else '', self.normal_style),  # Тип
-                    Paragraph(str(record[2]) if len(record) > 2 else '', self.normal_style),  # Инв. номер
-                    Paragraph(str(record[3]) if len(record) > 3 else '', self.normal_style),  # Инструмент
-                    Paragraph(str(record[4]) if len(record) > 4 else '', self.normal_style),  # Сотрудник
-                    Paragraph(str(record[5]) if len(record) > 5 else '', self.normal_style),  # Адрес
-                    Paragraph(operation_date, self.normal_style),
-                    Paragraph(str(record[7]) if len(record) > 7 else '', self.normal_style),  # Выполнил
-                    Paragraph(str(record[8]) if len(record) > 8 else '', self.normal_style)  # Примечание
-                ]
-                table_data.append(row)
-            
-            # Создание таблицы
-            table = Table(table_data, repeatRows=1)
-            
-            # Вычисляем доступную ширину (альбомная ориентация A4 минус отступы)
-            available_width = landscape(A4)[0] - 30*mm  # минус левый и правый отступы
-            total_cols = 9
+        row_count = 0
+        chunk = []
+        for idx, record in enumerate(history_data, 1):
+            # Форматирование даты
+            operation_date = self._format_date(record[6]) if len(record) > 6 else ''
             
-            # Стилизация таблицы
-            table.setStyle(TableStyle([
-                # Заголовок
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), getattr(self, 'font_bold', 'Helvetica-Bold')),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-                ('TOPPADDING', (0, 0), (-1, 0), 6),
-                
-                # Чередование цветов строк
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F2F2F2')]),
-                
-                # Границы
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                
-                # Размеры столбцов (оптимизированы для альбомной ориентации)
-                ('COLWIDTH', (0, 0), (0, -1), 15*mm),  # №
-                ('COLWIDTH', (1, 0), (1, -1), 18*mm),  # Тип
-                ('COLWIDTH', (2, 0), (2, -1), 22*mm),  # Инв. номер
-                ('COLWIDTH', (3, 0), (3, -1), 35*mm),  # Инструмент
-                ('COLWIDTH', (4, 0), (4, -1), 30*mm),  # Сотрудник
-                ('COLWIDTH', (5, 0), (5, -1), 40*mm),  # Адрес
-                ('COLWIDTH', (6, 0), (6, -1), 25*mm),  # Дата операции
-                ('COLWIDTH', (7, 0), (7, -1), 22*mm),  # Выполнил
-                ('COLWIDTH', (8, 0), (8, -1), 35*mm),  # Примечание
-                
-                # Перенос текста
-                ('WORDWRAP', (0, 0), (-1, -1), True),
-                ('FONTSIZE', (0, 1), (-1, -1), 7),
-                ('LEFTPADDING', (0, 0), (-1, -1), 3),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-            ]))
-            
-            story.append(table)
+            # Используем Paragraph для всех ячеек для поддержки кириллицы
+            chunk.append([
+                Paragraph(str(idx), self.normal_style),
+                Paragraph(str(record[1]) if len(record) > 1 else '', self.normal_style),  # Тип
+                Paragraph(str(record[2]) if len(record) > 2 else '', self.normal_style),  # Инв. номер
+                Paragraph(str(record[3]) if len(record) > 3 else '', self.normal_style),  # Инструмент
+                Paragraph(str(record[4]) if len(record) > 4 else '', self.normal_style),  # Сотрудник
+                Paragraph(str(record[5]) if len(record) > 5 else '', self.normal_style),  # Адрес
+                Paragraph(operation_date, self.normal_style),
+                Paragraph(str(record[7]) if len(record) > 7 else '', self.normal_style),  # Выполнил
+                Paragraph(str(record[8]) if len(record) > 8 else '', self.normal_style)  # Примечание
+            ])
+            row_count = idx
+            if len(chunk) == self.TABLE_CHUNK_ROWS:
+                yield self._history_table(chunk)
+                chunk = []
+        
+        if chunk:
+            yield self._history_table(chunk)
+        if not row_count:
+            yield Paragraph("Нет данных для отображения", self.normal_style)
         
         # Итоговая информация
-        story.append(Spacer(1, 10*mm))
-        story.append(Paragraph(
-            f"<b>Всего записей:</b> {len(history_data)}",
+        yield Spacer(1, 10*mm)
+        yield Paragraph(
+            f"<b>Всего записей:</b> {row_count}",
             self.normal_style
-        ))
+        )
+    
+    def _history_table(self, rows):
+        """Таблица порции строк журнала операций с заголовком"""
+        # Заголовки таблицы
+        headers = ['№', 'Тип', 'Инв. номер', 'Инструмент', 'Сотрудник', 
+                  'Адрес', 'Дата операции', 'Выполнил', 'Примечание']
+        header_row = [Paragraph(header, self.table_header_style) for header in headers]
         
-        # Генерация PDF
-        doc.build(story)
+        # Создание таблицы
+        table = Table([header_row] + rows, repeatRows=1)
+        
+        # Стилизация таблицы
+        table.setStyle(TableStyle([
+            # Заголовок
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4472C4')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), getattr(self, 'font_bold', 'Helvetica-Bold')),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+            ('TOPPADDING', (0, 0), (-1, 0), 6),
+            
+            # Чередование цветов строк
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#F2F2F2')]),
+            
+            # Границы
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            
+            # Размеры столбцов (оптимизированы для альбомной ориентации)
+            ('COLWIDTH', (0, 0), (0, -1), 15*mm),  # №
+            ('COLWIDTH', (1, 0), (1, -1), 18*mm),  # Тип
+            ('COLWIDTH', (2, 0), (2, -1), 22*mm),  # Инв. номер
+            ('COLWIDTH', (3, 0), (3, -1), 35*mm),  # Инструмент
+            ('COLWIDTH', (4, 0), (4, -1), 30*mm),  # Сотрудник
+            ('COLWIDTH', (5, 0), (5, -1), 40*mm),  # Адрес
+            ('COLWIDTH', (6, 0), (6, -1), 25*mm),  # Дата операции
+            ('COLWIDTH', (7, 0), (7, -1), 22*mm),  # Выполнил
+            ('COLWIDTH', (8, 0), (8, -1), 35*mm),  # Примечание
+            
+            # Перенос текста
+            ('WORDWRAP', (0, 0), (-1, -1), True),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('LEFTPADDING', (0, 0), (-1, -1), 3),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+        ]))
+        return table
 
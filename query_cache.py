@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Кэш результатов запросов к базе данных
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    """Потокобезопасный LRU-кэш результатов запросов с инвалидацией по таблицам
+
+    Каждая запись помнит таблицы, от которых зависит результат. Запись в
+    таблицу удаляет из кэша только зависящие от нее результаты.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # ключ -> (результат, таблицы)
+        self._keys_by_table = {}  # таблица -> множество ключей
+        # Поколение данных: меняется при каждой инвалидации, чтобы не сохранить
+        # результат, прочитанный до записи, выполненной параллельно
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Результат из кэша: (найден, значение)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, tables, generation=None):
+        """Сохранение результата, зависящего от указанных таблиц
+
+        Args:
+            generation: поколение данных на момент начала запроса; если с тех пор
+                кэш инвалидировался, результат мог устареть и не сохраняется
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (value, tables)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate(self, tables):
+        """Удаление результатов, зависящих от любой из указанных таблиц"""
+        with self._lock:
+            self.generation += 1
+            for table in tables:
+                for key in self._keys_by_table.pop(table, ()):
+                    if key in self._entries:
+                        self._discard(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        """Полная очистка кэша"""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_table.clear()
+
+    def stats(self):
+        """Статистика работы кэша для подбора размера"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+            }
+
+    def _discard(self, key):
+        """Удаление записи и ее связей с таблицами (вызывается под блокировкой)"""
+        _, tables = self._entries.pop(key)
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
@@ -3,7 +3,6 @@
 Telegram бот для системы учета инструментов ToolManagement
 """
 
-import asyncio
 import logging
 import threading
 import os
@@ -11,6 +10,10 @@ from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes
 from database_manager import DatabaseManager
+from telegram_queue import TelegramSendQueue
+from config.constants import (
+    TELEGRAM_QUEUE_MAX_SIZE, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_MAX_RETRIES
+)
 
 # Настройка логирования
 logging.basicConfig(
@@ -28,6 +31,15 @@ class ToolManagementBot:
         self.db = None
         self.application = None
         self.chat_ids = set()  # ID чатов для рассылки уведомлений
+        # Очередь исходящих уведомлений, работает в цикле событий бота
+        self.send_queue = TelegramSendQueue(
+            self._send_message,
+            max_size=TELEGRAM_QUEUE_MAX_SIZE,
+            global_rate=TELEGRAM_GLOBAL_RATE,
+            chat_rate=TELEGRAM_CHAT_RATE,
+            max_retries=TELEGRAM_MAX_RETRIES,
+            retryable=self._is_retryable_error,
+        )
 
         # Инициализируем базу данных
         try:
@@ -197,7 +209,8 @@ class ToolManagementBot:
 
         search_text = ' '.join(context.args)
         try:
-            instruments = self.db.get_instruments(search_text)
+            # Первыми показываем наиболее релевантные результаты
+            instruments = self.db.get_instruments(search_text, ranked=True)
 
             if not instruments:
                 await self._reply_to_update(update, f"❌ Инструменты по запросу '{search_text}' не найдены")
@@ -286,24 +299,13 @@ class ToolManagementBot:
     async def overdue_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать просроченные возвраты"""
         try:
-            issues = self.db.get_active_issues()
-            overdue_issues = []
-
-            for issue in issues:
-                expected_return = issue[7]  # Ожидаемая дата возврата
-                if expected_return:
-                    expected_date = datetime.strptime(expected_return, '%Y-%m-%d')
-                    if datetime.now() > expected_date:
-                        overdue_days = (datetime.now() - expected_date).days
-                        overdue_issues.append((issue, overdue_days))
+            # Только просроченные выдачи, сначала самые просроченные
+            overdue_issues = [(issue, issue[8]) for issue in self.db.get_overdue_issues()]
 
             if not overdue_issues:
                 await self._reply_to_update(update, "✅ Нет просроченных возвратов инструментов")
                 return
 
-            # Сортируем по количеству дней просрочки (сначала самые просроченные)
-            overdue_issues.sort(key=lambda x: x[1], reverse=True)
-
             message = "⚠️ *ПРОСРОЧЕННЫЕ ВОЗВРАТЫ*\n\n"
 
             for issue, overdue_days in overdue_issues[:10]:  # Максимум 10
@@ -443,53 +445,56 @@ class ToolManagementBot:
             )
             # Здесь можно добавить логику отправки уведомления администратору
 
-    def send_overdue_notification(self, chat_id=None):
-        """Отправить уведомление о просроченных возвратах"""
-        try:
-            issues = self.db.get_active_issues()
-            overdue_issues = []
+    def send_overdue_notification(self, chat_id=None, overdue_issues=None):
+        """Отправить уведомление о просроченных возвратах
 
-            for issue in issues:
-                expected_return = issue[4]
-                if expected_return:
-                    expected_date = datetime.strptime(expected_return, '%Y-%m-%d')
-                    if datetime.now() > expected_date:
-                        overdue_days = (datetime.now() - expected_date).days
-                        overdue_issues.append((issue, overdue_days))
+        Args:
+            chat_id: чат получателя (None - все подписанные чаты)
+            overdue_issues: (выдача, дней просрочки) для уведомления
+                (None - все текущие просрочки)
+        """
+        try:
+            if overdue_issues is None:
+                overdue_issues = [(issue, issue[8]) for issue in self.db.get_overdue_issues()]
 
             if overdue_issues:
                 message = f"⚠️ *ПРОСРОЧЕННЫЕ ВОЗВРАТЫ* ({len(overdue_issues)})\n\n"
 
                 for issue, overdue_days in overdue_issues[:5]:  # Максимум 5 в уведомлении
-                    instrument_name = issue[1]
-                    employee_name = issue[2]
-                    expected_return = issue[4]
+                    instrument_name = issue[3]
+                    employee_name = issue[4]
 
                     message += f"🚨 {instrument_name}\n"
                     message += f"👤 {employee_name}\n"
                     message += f"⏰ Просрочено: {overdue_days} дней\n\n"
 
-                # Отправляем уведомление всем подписанным чатам
-                if chat_id:
-                    asyncio.create_task(self._send_message(chat_id, message))
-                else:
-                    for cid in self.chat_ids:
-                        asyncio.create_task(self._send_message(cid, message))
+                # Отправка через очередь бота: метод вызывается из потока уведомлений
+                self.send_queue.broadcast([chat_id] if chat_id else list(self.chat_ids), message)
 
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления: {e}")
 
     async def _send_message(self, chat_id, message):
-        """Отправить сообщение в чат"""
-        try:
-            if self.application:
-                await self.application.bot.send_message(
-                    chat_id=chat_id,
-                    text=message,
-                    parse_mode='Markdown'
-                )
-        except Exception as e:
-            logger.error(f"Ошибка отправки сообщения в чат {chat_id}: {e}")
+        """Отправить сообщение в чат (ошибки обрабатывает очередь отправки)"""
+        await self.application.bot.send_message(
+            chat_id=chat_id,
+            text=message,
+            parse_mode='Markdown'
+        )
+
+    @staticmethod
+    def _is_retryable_error(error):
+        """Повторять ли отправку: не повторяются отказы чата и ошибки в запросе"""
+        from telegram.error import BadRequest, Forbidden
+        return not isinstance(error, (BadRequest, Forbidden))
+
+    async def _post_init(self, application):
+        """Запуск очереди отправки в цикле событий бота"""
+        self.send_queue.start()
+
+    async def _post_shutdown(self, application):
+        """Остановка очереди отправки"""
+        await self.send_queue.stop()
 
     def run_bot(self):
         """Запуск бота"""
@@ -512,6 +517,9 @@ class ToolManagementBot:
             except:
                 pass  # Игнорируем если параметры не поддерживаются
 
+            # Очередь отправки живет в цикле событий, созданном run_polling
+            builder = builder.post_init(self._post_init).post_shutdown(self._post_shutdown)
+
             self.application = builder.build()
 
         except AttributeError as e:
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Очередь исходящих сообщений Telegram бота
+Ограничение частоты отправки, повтор при ошибках и ограничение размера очереди
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate отправок в секунду с запасом до capacity подряд"""
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, now):
+        """Секунд до появления разрешения на отправку (0 - можно отправлять)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """Расход одного разрешения"""
+        self._refill(now)
+        self.tokens -= 1
+
+
+class OutgoingMessage:
+    """Сообщение в очереди: чат, текст, номер попытки и время, раньше которого не отправлять"""
+
+    __slots__ = ('chat_id', 'text', 'attempt', 'not_before')
+
+    def __init__(self, chat_id, text):
+        self.chat_id = chat_id
+        self.text = text
+        self.attempt = 0
+        self.not_before = 0
+
+
+class TelegramSendQueue:
+    """Очередь отправки, работающая в цикле событий бота
+
+    Сообщения ставятся из любого потока (submit), отправляются одной задачей
+    в цикле событий бота. Частота ограничивается общим лимитом и лимитом
+    каждого чата (Telegram отклоняет слишком частые сообщения), сообщения
+    разных чатов не ждут друг друга. Неудачная отправка повторяется с
+    экспоненциальной задержкой (или через retry_after из ответа Telegram).
+    Когда в очереди max_size сообщений, новые отклоняются.
+    """
+
+    def __init__(self, send, max_size=1000, global_rate=25.0, global_burst=25,
+                 chat_rate=1.0, chat_burst=3, max_retries=3, backoff=1.0, max_backoff=60.0,
+                 retryable=None, clock=time.monotonic):
+        """
+        Args:
+            send: корутина send(chat_id, text), выполняющая отправку
+            max_size: максимальное количество сообщений в очереди
+            global_rate, global_burst: общий лимит, сообщений в секунду и подряд
+            chat_rate, chat_burst: лимит одного чата, сообщений в секунду и подряд
+            max_retries: количество повторов неудачной отправки
+            backoff: задержка перед первым повтором, секунд (удваивается)
+            max_backoff: максимальная задержка перед повтором, секунд
+            retryable: функция retryable(exception) - стоит ли повторять отправку
+                (по умолчанию повторяются все ошибки)
+            clock: источник времени (для тестов)
+        """
+        self.send = send
+        self.max_size = max_size
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retryable = retryable or (lambda error: True)
+        self.clock = clock
+        self._global = TokenBucket(global_rate, global_burst, clock())
+        self._chat_buckets = {}  # чат -> TokenBucket
+        self._chats = {}  # чат -> deque сообщений, в порядке постановки
+        self._size = 0
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._idle = None
+        # Итоги работы (для диагностики и тестов)
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+
+    # ========== УПРАВЛЕНИЕ ==========
+
+    def start(self):
+        """Запуск отправки; вызывается внутри цикла событий бота"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        """Остановка отправки; неотправленные сообщения отбрасываются"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    async def join(self):
+        """Ожидание отправки (или окончательной ошибки) всех сообщений очереди"""
+        await self._idle.wait()
+
+    def __len__(self):
+        return self._size
+
+    # ========== ПОСТАНОВКА В ОЧЕРЕДЬ ==========
+
+    def submit(self, chat_id, text):
+        """Постановка сообщения в очередь из любого потока
+
+        Returns:
+            concurrent.futures.Future с результатом True (принято) или False
+            (очередь заполнена); None, если очередь не запущена
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            logger.warning(f"Очередь отправки не запущена, сообщение в чат {chat_id} не отправлено")
+            return None
+        return asyncio.run_coroutine_threadsafe(self._put(chat_id, text), loop)
+
+    def broadcast(self, chat_ids, text):
+        """Постановка одного сообщения для нескольких чатов"""
+        return [self.submit(chat_id, text) for chat_id in chat_ids]
+
+    async def _put(self, chat_id, text):
+        if self._size >= self.max_size:
+            self.rejected += 1
+            logger.warning(f"Очередь отправки заполнена ({self.max_size}), сообщение в чат {chat_id} отклонено")
+            return False
+        self._chats.setdefault(chat_id, deque()).append(OutgoingMessage(chat_id, text))
+        self._size += 1
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    # ========== ОТПРАВКА ==========
+
+    async def _run(self):
+        while True:
+            now = self.clock()
+            chat_id, delay = self._next_chat(now)
+            if chat_id is None or delay > 0:
+                # Ждем разрешения на отправку или нового сообщения
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._send_next(chat_id, now)
+
+    def _next_chat(self, now):
+        """Чат, сообщение которого можно отправить раньше всех, и задержка до отправки
+
+        Returns:
+            (chat_id, delay) или (None, None), если очередь пуста
+        """
+        best_chat, best_delay = None, None
+        for chat_id, messages in self._chats.items():
+            bucket = self._chat_buckets.get(chat_id)
+            delay = bucket.delay(now) if bucket is not None else 0
+            delay = max(delay, messages[0].not_before - now)
+            if best_delay is None or delay < best_delay:
+                best_chat, best_delay = chat_id, delay
+        if best_chat is None:
+            return None, None
+        return best_chat, max(best_delay, self._global.delay(now))
+
+    async def _send_next(self, chat_id, now):
+        messages = self._chats[chat_id]
+        message = messages.popleft()
+        if not messages:
+            del self._chats[chat_id]
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        bucket.consume(now)
+        self._global.consume(now)
+
+        try:
+            await self.send(message.chat_id, message.text)
+            self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if message.attempt < self.max_retries and self.retryable(e):
+                message.attempt += 1
+                message.not_before = self.clock() + self._retry_delay(message.attempt, e)
+                # Повтор идет первым в своем чате: порядок сообщений чата сохраняется
+                self._chats.setdefault(chat_id, deque()).appendleft(message)
+                logger.warning(f"Ошибка отправки в чат {chat_id}, повтор {message.attempt}: {e}")
+                return
+            self.failed += 1
+            logger.error(f"Сообщение в чат {chat_id} не отправлено: {e}")
+
+        self._size -= 1
+        if self._size == 0:
+            self._idle.set()
+
+    def _retry_delay(self, attempt, error):
+        """Задержка перед повтором: retry_after из ответа Telegram или экспоненциальная"""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after is not None:
+            # В новых версиях python-telegram-bot - timedelta
+            if hasattr(retry_after, 'total_seconds'):
+                retry_after = retry_after.total_seconds()
+            return float(retry_after)
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
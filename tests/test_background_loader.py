@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля ui/background_loader.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from ui.background_loader import BackgroundLoader
+
+
+class FakeRoot:
+    """Замена корневого окна Tk: отложенные вызовы выполняются вручную"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, delay, callback):
+        self.jobs.append(callback)
+        return len(self.jobs)
+
+    def after_cancel(self, job):
+        pass
+
+    def run_pending(self, timeout=2.0):
+        """Выполнение отложенных вызовов, пока они появляются"""
+        deadline = time.monotonic() + timeout
+        while self.jobs and time.monotonic() < deadline:
+            callback = self.jobs.pop(0)
+            callback()
+            if self.jobs:
+                time.sleep(0.01)
+
+
+@pytest.fixture
+def loader():
+    root = FakeRoot()
+    loader = BackgroundLoader(root)
+    yield loader
+    loader.shutdown()
+
+
+class TestBackgroundLoader:
+    """Тесты фоновой загрузки данных"""
+
+    def test_result_delivered_in_caller_thread(self, loader):
+        """Результат передается обработчику в потоке, опрашивающем очередь"""
+        results = []
+        worker_threads = []
+
+        def fetch():
+            worker_threads.append(threading.current_thread())
+            return [1, 2, 3]
+
+        loader.submit('instruments', fetch, lambda data: results.append((data, threading.current_thread())))
+        loader.root.run_pending()
+
+        assert results == [([1, 2, 3], threading.current_thread())]
+        assert worker_threads[0] is not threading.current_thread()
+        assert not loader.is_loading('instruments')
+
+    def test_newer_request_supersedes_older(self, loader):
+        """Результат устаревшего запроса отбрасывается"""
+        results = []
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(1)
+            return 'старый'
+
+        loader.submit('instruments', slow_fetch, results.append)
+        loader.submit('instruments', lambda: 'новый', results.append)
+        release.set()
+        loader.root.run_pending()
+
+        assert results == ['новый']
+
+    def test_cancel_and_errors(self, loader):
+        """Отмененный запрос не доставляется, ошибка передается обработчику ошибок"""
+        results = []
+        errors = []
+
+        loader.submit('employees', lambda: 'данные', results.append)
+        loader.cancel('employees')
+        loader.submit('history', lambda: 1 / 0, results.append, errors.append)
+        loader.root.run_pending()
+
+        assert results == []
+        assert isinstance(errors[0], ZeroDivisionError)
+
+    def test_superseded_running_request_interrupted(self):
+        """Выполняемый устаревший запрос прерывается в своем потоке"""
+        interrupted = []
+        started = threading.Event()
+        release = threading.Event()
+        loader = BackgroundLoader(FakeRoot(), interrupt=lambda thread: (interrupted.append(thread), release.set()))
+        results = []
+
+        def slow_fetch():
+            started.set()
+            release.wait(1)
+            return 'старый'
+
+        try:
+            loader.submit('instruments', slow_fetch, results.append)
+            started.wait(1)
+            loader.submit('instruments', lambda: 'новый', results.append)
+            loader.root.run_pending()
+        finally:
+            loader.shutdown()
+
+        assert len(interrupted) == 1
+        assert interrupted[0] is not threading.current_thread()
+        assert results == ['новый']
+
+    def test_is_superseded_between_queries(self, loader):
+        """Функция запроса узнает, что ее заменил более новый запрос"""
+        checks = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fetch():
+            checks.append(loader.is_superseded())
+            started.set()
+            release.wait(1)
+            checks.append(loader.is_superseded())
+            return 'старый'
+
+        loader.submit('history', fetch, lambda data: None)
+        started.wait(1)
+        loader.submit('history', lambda: 'новый', lambda data: None)
+        release.set()
+        loader.root.run_pending()
+
+        assert checks == [False, True]
+        assert not loader.is_superseded()
@@ -3,6 +3,10 @@
 Тесты для модуля database_manager.py
 """
 
+import os
+import sqlite3
+import threading
+
 import pytest
 
 
@@ -289,4 +293,1121 @@ class TestDatabaseManager:
         assert len(results) == 0
 
 
+class TestConnectionPool:
+    """Тесты пула соединений DatabaseManager"""
+
+    def test_connection_reused_in_thread(self, db_manager):
+        """В одном потоке используется одно и то же соединение"""
+        conn = db_manager.get_connection()
+        conn.close()
+
+        assert db_manager.get_connection() is conn
+        # После close() соединение остается рабочим
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+        assert conn.execute("SELECT LOWER_PY('ДРЕЛЬ')").fetchone() == ('дрель',)
+
+    def test_separate_connection_per_thread(self, db_manager):
+        """Разные потоки получают разные соединения"""
+        main_conn = db_manager.get_connection()
+        result = {}
+
+        def worker():
+            conn = db_manager.get_connection()
+            result['conn'] = conn
+            result['count'] = len(db_manager.get_addresses())
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        assert result['conn'] is not main_conn
+        assert result['count'] == len(db_manager.get_addresses())
+
+    def test_close_rolls_back_uncommitted(self, db_manager):
+        """close() откатывает незавершенную транзакцию"""
+        count_before = len(db_manager.get_addresses())
+
+        conn = db_manager.get_connection()
+        conn.execute("INSERT INTO addresses (name) VALUES ('Незавершенная запись')")
+        conn.close()
+
+        assert len(db_manager.get_addresses()) == count_before
+
+    def test_nested_call_keeps_transaction(self, db_manager):
+        """Вложенное получение и возврат соединения не откатывают внешнюю транзакцию"""
+        count_before = len(db_manager.get_addresses())
+
+        conn = db_manager.get_connection()
+        conn.execute("INSERT INTO addresses (name) VALUES ('Запись внешней транзакции')")
+        # Метод чтения внутри транзакции получает и возвращает то же соединение
+        assert len(db_manager.get_addresses()) == count_before + 1
+        assert conn.in_transaction
+        conn.commit()
+        conn.close()
+
+        assert len(db_manager.get_addresses()) == count_before + 1
+
+    def test_failed_read_releases_connection(self, db_manager):
+        """Исключение в методе чтения не оставляет соединение выданным"""
+        count_before = len(db_manager.get_addresses())
+
+        with pytest.raises(ValueError):
+            db_manager.get_instruments(order_by='bogus')
+        conn = db_manager.get_connection()
+        assert conn.leases == 1
+
+        # Незавершенная транзакция по-прежнему откатывается при возврате соединения
+        conn.execute("INSERT INTO addresses (name) VALUES ('Незавершенная запись')")
+        conn.close()
+        assert db_manager.add_address("Новый адрес", "")[0]
+
+        names = [row[1] for row in db_manager.get_addresses()]
+        assert len(names) == count_before + 1
+        assert 'Незавершенная запись' not in names
+
+    def test_manager_close_disposes_pool(self, db_manager):
+        """DatabaseManager.close() закрывает соединения пула"""
+        conn = db_manager.get_connection()
+        db_manager.close()
+
+        with pytest.raises(Exception):
+            conn.execute("SELECT 1")
+
+        # Менеджер создает новое соединение по требованию
+        assert db_manager.get_connection() is not conn
+
+    def test_pragma_profile_applied(self, db_manager):
+        """К соединениям пула применяется профиль PRAGMA"""
+        conn = db_manager.get_connection()
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db_manager.pragmas['busy_timeout']
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == db_manager.pragmas['cache_size']
+        # synchronous = NORMAL
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+    def test_pragma_profile_override(self, tmp_path):
+        """Профиль PRAGMA можно переопределить при создании менеджера"""
+        from database_manager import DatabaseManager
+
+        manager = DatabaseManager(str(tmp_path / "pragmas.db"), pragmas={'busy_timeout': 1234})
+        try:
+            conn = manager.get_connection()
+            assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+        finally:
+            manager.close()
+
+    def test_checkpoint_truncates_wal(self, db_manager):
+        """Контрольная точка TRUNCATE переносит журнал и усекает файл WAL"""
+        db_manager.add_address("Склад для контрольной точки")
+
+        assert db_manager.checkpoint('TRUNCATE') is True
+        wal_path = db_manager.db_path + '-wal'
+        assert not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0
+
+    def test_backup_and_restore_keep_wal_changes(self, db_manager, tmp_path):
+        """Копия включает изменения из журнала WAL, восстановление видно другим соединениям"""
+        from database_manager import DatabaseManager
+
+        # Другое соединение с той же базой не дает перенести журнал в файл
+        other = DatabaseManager(db_manager.db_path)
+        reader = other.get_connection()
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM addresses").fetchone()
+        try:
+            db_manager.add_address("Склад до копии")
+            assert db_manager.checkpoint('PASSIVE') is False
+
+            backup_path = str(tmp_path / "backup.db")
+            assert db_manager.backup_to(backup_path)[0]
+            backup = sqlite3.connect(backup_path)
+            names = [row[0] for row in backup.execute("SELECT name FROM addresses")]
+            backup.close()
+            assert "Склад до копии" in names
+            reader.rollback()
+
+            db_manager.add_address("Склад после копии")
+            assert db_manager.restore_from(backup_path)[0]
+
+            for manager in (db_manager, other):
+                names = [row[1] for row in manager.get_addresses()]
+                assert "Склад до копии" in names
+                assert "Склад после копии" not in names
+        finally:
+            reader.close()
+            other.close()
+
+    def test_restore_from_invalid_file_keeps_data(self, db_manager, tmp_path):
+        """Ошибка восстановления не изменяет текущую базу"""
+        invalid_path = tmp_path / "invalid.db"
+        invalid_path.write_bytes(b"not a database" * 100)
+        count_before = len(db_manager.get_addresses())
+
+        success, message = db_manager.restore_from(str(invalid_path))
+
+        assert not success
+        assert len(db_manager.get_addresses()) == count_before
+
+    def test_interrupt_running_query(self, db_manager):
+        """interrupt() прерывает запрос, выполняемый соединением другого потока"""
+        started = threading.Event()
+        result = {}
+
+        def worker():
+            conn = db_manager.get_connection()
+            started.set()
+            try:
+                conn.execute(
+                    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+                    "SELECT COUNT(*) FROM n"
+                ).fetchone()
+            except Exception as e:
+                result['error'] = e
+            # После прерывания соединение остается рабочим
+            result['after'] = conn.execute("SELECT 1").fetchone()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        started.wait(5)
+        while thread.is_alive() and 'error' not in result:
+            db_manager.interrupt(thread)
+            thread.join(0.05)
+        thread.join(5)
+
+        assert "interrupted" in str(result['error'])
+        assert result['after'] == (1,)
+
+
+class TestSchemaIndexes:
+    """Тесты миграций схемы и индексов основных запросов"""
+
+    @staticmethod
+    def _query_plans(db_manager, *calls):
+        """Планы выполнения SELECT-запросов, выполненных указанными вызовами"""
+        conn = db_manager.get_connection()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            for call in calls:
+                call()
+        finally:
+            conn.set_trace_callback(None)
+
+        plans = {}
+        for statement in statements:
+            if statement.lstrip().upper().startswith('SELECT'):
+                plans[statement] = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + statement)]
+        conn.close()
+        return plans
+
+    def test_migrations_recorded(self, db_manager):
+        """Примененные миграции фиксируются в schema_version"""
+        from database_manager import SCHEMA_MIGRATIONS
+
+        assert db_manager.get_schema_version() == SCHEMA_MIGRATIONS[-1][0]
+
+        # Повторная инициализация не применяет миграции заново
+        db_manager.init_database()
+        conn = db_manager.get_connection()
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_version")]
+        conn.close()
+        assert versions == [migration[0] for migration in SCHEMA_MIGRATIONS]
+
+    def test_user_version_matches_schema(self, db_manager):
+        """Версия схемы записывается в PRAGMA user_version"""
+        from database_manager import SCHEMA_VERSION
+
+        conn = db_manager.get_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        conn.close()
+
+    def test_fast_path_skips_schema_script(self, db_manager, monkeypatch):
+        """При актуальной схеме запуск не выполняет DDL и не вставляет тестовые данные"""
+        from database_manager import DatabaseManager
+
+        conn = db_manager.get_connection()
+        conn.execute("DELETE FROM operation_history")
+        conn.execute("DELETE FROM issues")
+        conn.execute("DELETE FROM instruments")
+        conn.execute("DELETE FROM employees")
+        conn.execute("DELETE FROM addresses")
+        conn.commit()
+        conn.close()
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError("SQL скрипт не должен читаться при актуальной схеме")
+
+        monkeypatch.setattr('builtins.open', fail_open)
+        manager = DatabaseManager(db_manager.db_path)
+        monkeypatch.undo()
+        try:
+            assert manager.get_instruments() == []
+        finally:
+            manager.close()
+
+    def test_pending_migration_applied(self, db_manager, monkeypatch, capsys):
+        """При устаревшей версии применяется только недостающая миграция без скрипта создания таблиц"""
+        from database_manager import DatabaseManager, SCHEMA_MIGRATIONS, SCHEMA_VERSION
+
+        last_version = SCHEMA_MIGRATIONS[-1][0]
+        conn = db_manager.get_connection()
+        conn.execute("DROP TABLE notification_state")
+        conn.execute("DELETE FROM schema_version WHERE version = ?", (last_version,))
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+        conn.commit()
+        applied_before = conn.execute(
+            "SELECT version, applied_at FROM schema_version ORDER BY version"
+        ).fetchall()
+        conn.close()
+
+        def fail_open(*args, **kwargs):
+            raise AssertionError("SQL скрипт создания таблиц не должен выполняться")
+
+        def fail_legacy(*args, **kwargs):
+            raise AssertionError("Проверка колонок старых баз не должна выполняться")
+
+        capsys.readouterr()
+        monkeypatch.setattr('builtins.open', fail_open)
+        monkeypatch.setattr(DatabaseManager, '_migrate_legacy_columns', fail_legacy)
+        db_manager.init_database()
+        monkeypatch.undo()
+
+        output = capsys.readouterr().out
+        assert "Таблицы базы данных созданы" not in output
+        applied = [line for line in output.splitlines() if "Применена миграция" in line]
+        assert applied == [f"✅ Применена миграция {last_version}: {SCHEMA_MIGRATIONS[-1][1]}"]
+
+        conn = db_manager.get_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'notification_state'"
+        ).fetchone() is not None
+        # Ранее примененные миграции не выполнялись повторно
+        applied_after = conn.execute(
+            "SELECT version, applied_at FROM schema_version ORDER BY version"
+        ).fetchall()
+        conn.close()
+        assert applied_after[:-1] == applied_before
+        assert applied_after[-1][0] == last_version
+
+    def test_legacy_database_migrated(self, db_manager):
+        """База без версии схемы (user_version = 0) дополняется недостающими миграциями"""
+        from database_manager import SCHEMA_VERSION
+
+        conn = db_manager.get_connection()
+        conn.execute("DROP INDEX idx_history_type_date")
+        conn.execute("DELETE FROM schema_version WHERE version = 1")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        db_manager.init_database()
+
+        conn = db_manager.get_connection()
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = 'idx_history_type_date'"
+        ).fetchone() is not None
+        conn.close()
+
+    def test_hot_queries_use_indexes(self, db_manager):
+        """Основные запросы не выполняют полный просмотр таблиц"""
+        plans = self._query_plans(
+            db_manager,
+            db_manager.get_active_issues,
+            db_manager.get_statistics,
+            lambda: db_manager.get_operation_history(),
+            lambda: db_manager.get_operation_history('Выдача', date_from='2024-01-01', date_to='2024-12-31'),
+            db_manager.get_analytics_data,
+            lambda: db_manager.get_deadline_issues(3),
+        )
+        assert plans
+
+        # stat_counters - таблица фиксированного размера, ее просмотр не зависит от объема данных
+        bounded_tables = ('SCAN stat_counters',)
+        for statement, plan in plans.items():
+            for detail in plan:
+                if detail.startswith(bounded_tables):
+                    continue
+                if detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail and 'subquery' not in detail:
+                    assert 'INDEX' in detail, f"Полный просмотр таблицы: {detail}\n{statement}"
+
+        all_details = ' '.join(detail for plan in plans.values() for detail in plan)
+        assert 'idx_issues_status_issue_date' in all_details
+        assert 'idx_issues_status_expected' in all_details
+        assert 'idx_history_operation_date' in all_details
+        assert 'idx_history_type_date' in all_details
+
+
+class TestFullTextSearch:
+    """Тесты полнотекстового поиска FTS5"""
+
+    @staticmethod
+    def _add_instrument(db_manager, name, inventory_number, category="Измерительный инструмент"):
+        db_manager.add_instrument((name, "", inventory_number, f"SN-{inventory_number}",
+                                   category, "Доступен", None, None))
+        return [row for row in db_manager.get_instruments() if row[2] == inventory_number][0][0]
+
+    def test_search_case_insensitive_cyrillic(self, db_manager):
+        """Поиск по подстроке без учета регистра кириллицы"""
+        self._add_instrument(db_manager, "Штангенциркуль цифровой", "FTS-001")
+
+        for query in ("штангенциркуль", "ШТАНГЕН", "циркуль ЦИФР", "fts-001"):
+            results = db_manager.get_instruments(query)
+            assert [row[2] for row in results] == ["FTS-001"], query
+
+    def test_fts_matches_like_fallback(self, db_manager):
+        """Результаты FTS5 совпадают с прежним поиском через LIKE"""
+        self._add_instrument(db_manager, "Штангенциркуль цифровой", "FTS-001")
+        self._add_instrument(db_manager, "Микрометр гладкий", "FTS-002")
+
+        queries = ("измерительный", "микрометр", "дрель", "INV-00", "отсутствует")
+        fts_results = {q: db_manager.get_instruments(q) for q in queries}
+        employee_results = db_manager.get_employees("иван")
+        history_results = db_manager.get_operation_history(search_text="выдача")
+
+        db_manager._fts_available = False
+        for query in queries:
+            assert sorted(db_manager.get_instruments(query)) == sorted(fts_results[query]), query
+        assert sorted(db_manager.get_employees("иван")) == sorted(employee_results)
+        assert sorted(db_manager.get_operation_history(search_text="выдача")) == sorted(history_results)
+
+    def test_fts_synced_by_triggers(self, db_manager):
+        """Изменение и удаление записей отражаются в индексе"""
+        instrument_id = self._add_instrument(db_manager, "Нивелир лазерный", "FTS-010")
+
+        db_manager.update_instrument(instrument_id, ("Дальномер лазерный", "", "FTS-010", "SN-FTS-010",
+                                                     "Измерительный инструмент", "Доступен", None, None))
+        assert db_manager.get_instruments("нивелир") == []
+        assert len(db_manager.get_instruments("дальномер")) == 1
+
+        db_manager.delete_instrument(instrument_id)
+        assert db_manager.get_instruments("дальномер") == []
+
+    def test_history_search_by_employee(self, db_manager):
+        """Поиск в журнале по ФИО сотрудника через связанный индекс"""
+        instrument_id = self._add_instrument(db_manager, "Тепловизор", "FTS-020")
+        db_manager.add_employee(("Жуковский Игнат Павлович", "Инженер", "ОТК",
+                                 "", "", "Активен", None))
+        employee_id = db_manager.get_employees("жуковский")[0][0]
+
+        success, _ = db_manager.issue_instrument(instrument_id, employee_id, "2030-01-01", "", "Тест")
+        assert success
+
+        results = db_manager.get_operation_history(search_text="ЖУКОВСКИЙ")
+        assert len(results) == 1
+        assert results[0][2] == "FTS-020"
+
+
+class TestBatchIssue:
+    """Тесты групповой выдачи инструментов"""
+
+    @staticmethod
+    def _add_instruments(db_manager, count, prefix="BATCH"):
+        for i in range(count):
+            db_manager.add_instrument((f"Инструмент {prefix} {i}", "", f"{prefix}-{i:03d}", None,
+                                       "Ручной инструмент", "Доступен", None, None))
+        return [row[0] for row in db_manager.get_instruments() if row[2].startswith(f"{prefix}-")]
+
+    @staticmethod
+    def _employee_id(db_manager):
+        return db_manager.get_employees()[0][0]
+
+    def test_batch_issue_all(self, db_manager):
+        """Все инструменты выдаются одним групповым актом"""
+        instrument_ids = self._add_instruments(db_manager, 5)
+        employee_id = self._employee_id(db_manager)
+
+        success, message, conflicts = db_manager.issue_instruments_batch(
+            instrument_ids, employee_id, "2030-01-01", "Комплект бригаде", "Кладовщик"
+        )
+
+        assert success, message
+        assert conflicts == []
+
+        conn = db_manager.get_connection()
+        batch_ids = conn.execute(
+            f"SELECT DISTINCT batch_id FROM issues WHERE instrument_id IN ({', '.join('?' * 5)})",
+            instrument_ids
+        ).fetchall()
+        assert len(batch_ids) == 1 and batch_ids[0][0] is not None
+        assert conn.execute("SELECT employee_id, issued_by FROM batch_issues WHERE id = ?",
+                            batch_ids[0]).fetchone() == (employee_id, "Кладовщик")
+        history_count = conn.execute(
+            "SELECT COUNT(*) FROM operation_history oh JOIN issues i ON oh.issue_id = i.id "
+            "WHERE i.batch_id = ? AND oh.operation_type = 'Выдача' "
+            "AND oh.instrument_id = i.instrument_id AND oh.employee_id = i.employee_id", batch_ids[0]
+        ).fetchone()[0]
+        conn.close()
+        assert history_count == 5
+
+        for instrument_id in instrument_ids:
+            assert db_manager.get_instrument_by_id(instrument_id)[6] == 'Выдан'
+
+    def test_batch_issue_conflict_no_partial_commit(self, db_manager):
+        """При конфликте ничего не выдается"""
+        instrument_ids = self._add_instruments(db_manager, 3)
+        employee_id = self._employee_id(db_manager)
+        db_manager.issue_instrument(instrument_ids[1], employee_id, "2030-01-01", "", "Тест")
+        active_before = len(db_manager.get_active_issues())
+
+        success, _, conflicts = db_manager.issue_instruments_batch(
+            instrument_ids + [999999], employee_id, "2030-01-01", "", "Тест"
+        )
+
+        assert not success
+        assert conflicts == [
+            (instrument_ids[1], "Инструмент недоступен (статус: Выдан)"),
+            (999999, "Инструмент не найден"),
+        ]
+        assert len(db_manager.get_active_issues()) == active_before
+        assert db_manager.get_instrument_by_id(instrument_ids[0])[6] == 'Доступен'
+
+    def test_batch_issue_allow_partial(self, db_manager):
+        """С allow_partial выдаются доступные инструменты"""
+        instrument_ids = self._add_instruments(db_manager, 3)
+        employee_id = self._employee_id(db_manager)
+        db_manager.issue_instrument(instrument_ids[0], employee_id, "2030-01-01", "", "Тест")
+
+        success, _, conflicts = db_manager.issue_instruments_batch(
+            instrument_ids, employee_id, "2030-01-01", "", "Тест", allow_partial=True
+        )
+
+        assert success
+        assert [instrument_id for instrument_id, _ in conflicts] == [instrument_ids[0]]
+        assert all(db_manager.get_instrument_by_id(i)[6] == 'Выдан' for i in instrument_ids)
+
+
+class TestBatchReturn:
+    """Тесты массового возврата инструментов"""
+
+    @staticmethod
+    def _issue_instruments(db_manager, count):
+        ids = TestBatchIssue._add_instruments(db_manager, count, prefix="RET")
+        employee_id = TestBatchIssue._employee_id(db_manager)
+        success, message, _ = db_manager.issue_instruments_batch(ids, employee_id, "2030-01-01", "", "Тест")
+        assert success, message
+        conn = db_manager.get_connection()
+        issue_ids = [row[0] for row in conn.execute(
+            f"SELECT id FROM issues WHERE instrument_id IN ({', '.join('?' * len(ids))}) ORDER BY id", ids
+        )]
+        conn.close()
+        return ids, issue_ids
+
+    def test_batch_return_with_errors(self, db_manager):
+        """Возвращаются корректные выдачи, ошибки перечисляются в сообщении"""
+        instrument_ids, issue_ids = self._issue_instruments(db_manager, 3)
+        db_manager.return_instrument(issue_ids[0], "", "Тест")
+
+        success, message = db_manager.return_instruments_batch(issue_ids + [999999], "Конец смены", "Кладовщик")
+
+        assert success
+        assert message.startswith("Успешно возвращено: 2 инструментов")
+        assert f"Выдача ID {issue_ids[0]}: инструмент уже возвращен" in message
+        assert "Выдача ID 999999: не найдена" in message
+        assert all(db_manager.get_instrument_by_id(i)[6] == 'Доступен' for i in instrument_ids)
+
+        conn = db_manager.get_connection()
+        returns = conn.execute(
+            f"SELECT COUNT(*) FROM operation_history WHERE operation_type = 'Возврат' "
+            f"AND issue_id IN ({', '.join('?' * 3)})", issue_ids
+        ).fetchone()[0]
+        notes = conn.execute("SELECT notes FROM issues WHERE id = ?", (issue_ids[1],)).fetchone()[0]
+        conn.close()
+        assert returns == 3
+        assert notes == "Конец смены"
+
+    def test_batch_return_large_selection(self, db_manager):
+        """Большие выборки передаются через временную таблицу"""
+        count = db_manager.ID_FILTER_TEMP_TABLE_THRESHOLD + 20
+        instrument_ids, issue_ids = self._issue_instruments(db_manager, count)
+
+        success, message = db_manager.return_instruments_batch(issue_ids, "", "Кладовщик")
+
+        assert success
+        assert message == f"Успешно возвращено: {count} инструментов"
+        assert all(db_manager.get_instrument_by_id(i)[6] == 'Доступен' for i in instrument_ids)
+
+
+class TestHistoryPagination:
+    """Тесты постраничной выборки журнала операций"""
+
+    def test_pages_cover_history_without_gaps(self, db_manager):
+        """Страницы по ключу (operation_date, id) обходят журнал без пропусков и повторов"""
+        # Групповая выдача создает записи с одинаковым временем операции
+        TestBatchReturn._issue_instruments(db_manager, 25)
+        expected = db_manager.get_operation_history(limit=10000)
+
+        pages = []
+        after = None
+        while True:
+            history, after = db_manager.get_operation_history_page(page_size=7, after=after)
+            pages.append(history)
+            if after is None:
+                break
+
+        rows = [row for page in pages for row in page]
+        assert all(len(page) == 7 for page in pages[:-1])
+        assert [row[0] for row in rows] == [row[0] for row in expected]
+        assert rows == list(db_manager.iter_operation_history(page_size=4))
+
+    def test_page_filters(self, db_manager):
+        """Фильтры журнала применяются и к постраничной выборке"""
+        TestBatchReturn._issue_instruments(db_manager, 5)
+        history, after = db_manager.get_operation_history_page('Выдача', page_size=1000)
+
+        assert after is None
+        assert history
+        assert all(row[1] == 'Выдача' for row in history)
+        assert len(history) == len(db_manager.get_operation_history('Выдача', limit=1000))
+
+    def test_page_uses_index(self, db_manager):
+        """Продолжение страницы выполняется по индексу даты операции без сортировки"""
+        TestBatchReturn._issue_instruments(db_manager, 3)
+        _, after = db_manager.get_operation_history_page(page_size=1)
+
+        plans = TestSchemaIndexes._query_plans(
+            db_manager, lambda: db_manager.get_operation_history_page(page_size=1, after=after)
+        )
+        plan = next(iter(plans.values()))
+        assert any('idx_history_operation_date' in detail for detail in plan)
+        assert not any('TEMP B-TREE' in detail for detail in plan)
+
+
+class TestServerSorting:
+    """Тесты сортировки и постраничной выборки на стороне БД"""
+
+    def test_instruments_order_and_pages(self, db_manager):
+        """Страницы по LIMIT/OFFSET следуют выбранному порядку без пропусков"""
+        TestBatchIssue._add_instruments(db_manager, 12, prefix="SRT")
+        expected = sorted(db_manager.get_instruments(), key=lambda row: (row[2], row[0]), reverse=True)
+
+        rows = []
+        for offset in range(0, len(expected), 5):
+            rows += db_manager.get_instruments(
+                order_by='inventory_number', direction='desc', limit=5, offset=offset
+            )
+
+        assert [row[0] for row in rows] == [row[0] for row in expected]
+        assert db_manager.get_instruments(order_by='id', limit=3, offset=2) == \
+            sorted(db_manager.get_instruments())[2:5]
+
+    def test_search_and_default_order_preserved(self, db_manager):
+        """Поиск сочетается с сортировкой, без order_by порядок прежний"""
+        TestBatchIssue._add_instruments(db_manager, 4, prefix="SRT")
+
+        rows = db_manager.get_instruments("SRT", order_by='id', direction='desc')
+        assert rows and all("SRT" in row[2] for row in rows)
+        assert [row[0] for row in rows] == sorted((row[0] for row in rows), reverse=True)
+
+        names = [(row[1], row[2]) for row in db_manager.get_instruments()]
+        assert names == sorted(names)
+
+    def test_other_tables(self, db_manager):
+        """Сортировка сотрудников, выдач и журнала по разрешенным полям"""
+        TestBatchReturn._issue_instruments(db_manager, 5)
+
+        employees = db_manager.get_employees(order_by='id', direction='desc')
+        assert [row[0] for row in employees] == sorted((row[0] for row in employees), reverse=True)
+
+        issues = db_manager.get_active_issues(order_by='inventory_number', limit=3)
+        assert [row[2] for row in issues] == sorted(row[2] for row in db_manager.get_active_issues())[:3]
+
+        history = db_manager.get_operation_history(order_by='id', direction='asc', limit=None, offset=1)
+        ids = [row[0] for row in db_manager.get_operation_history(limit=None)]
+        assert [row[0] for row in history] == sorted(ids)[1:]
+
+    def test_unknown_field_rejected(self, db_manager):
+        """Поля вне списка разрешенных не попадают в запрос"""
+        with pytest.raises(ValueError):
+            db_manager.get_instruments(order_by='name; DROP TABLE instruments')
+        with pytest.raises(ValueError):
+            db_manager.get_employees(order_by='full_name', direction='sideways')
+
+    def test_table_row_count(self, db_manager):
+        """Размер таблицы читается из счетчиков без подсчета строк"""
+        TestBatchReturn._issue_instruments(db_manager, 3)
+        conn = db_manager.get_connection()
+        expected = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ('instruments', 'employees', 'operation_history', 'addresses')
+        }
+        expected['issues'] = conn.execute("SELECT COUNT(*) FROM issues WHERE status = 'Выдан'").fetchone()[0]
+        conn.close()
+
+        assert {table: db_manager.get_table_row_count(table) for table in expected} == expected
+
+    def test_filtered_count(self, db_manager):
+        """count=True возвращает размер выборки с теми же фильтрами"""
+        TestBatchIssue._add_instruments(db_manager, 4, prefix="CNT")
+        TestBatchReturn._issue_instruments(db_manager, 3)
+
+        for search in ('', 'CNT', 'CN'):
+            assert db_manager.get_instruments(search, count=True) == len(db_manager.get_instruments(search))
+        for search in ('', db_manager.get_employees()[0][1], 'zz'):
+            assert db_manager.get_employees(search, count=True) == len(db_manager.get_employees(search))
+        assert db_manager.get_active_issues(count=True) == len(db_manager.get_active_issues())
+        for filter_type, search in (('Все', ''), ('Выдача', ''), ('Все', 'CNT'), ('Возврат', 'ТЕСТ')):
+            assert db_manager.get_operation_history(filter_type, search_text=search, count=True) == \
+                len(db_manager.get_operation_history(filter_type, search_text=search, limit=None))
+
+
+class TestStatCounters:
+    """Тесты счетчиков статистики, поддерживаемых триггерами"""
+
+    @staticmethod
+    def _counted_statistics(db_manager):
+        """Статистика, посчитанная напрямую по таблицам"""
+        conn = db_manager.get_connection()
+        stats = {
+            'total_instruments': conn.execute("SELECT COUNT(*) FROM instruments").fetchone()[0],
+            'instruments_by_status': dict(conn.execute(
+                "SELECT status, COUNT(*) FROM instruments GROUP BY status"
+            ).fetchall()),
+            'active_employees': conn.execute(
+                "SELECT COUNT(*) FROM employees WHERE status = 'Активен'"
+            ).fetchone()[0],
+            'active_issues': conn.execute(
+                "SELECT COUNT(*) FROM issues WHERE status = 'Выдан'"
+            ).fetchone()[0],
+            'total_operations': conn.execute("SELECT COUNT(*) FROM operation_history").fetchone()[0],
+        }
+        conn.close()
+        return stats
+
+    def _assert_counters_match(self, db_manager):
+        expected = self._counted_statistics(db_manager)
+        stats = db_manager.get_general_statistics()
+        for key, value in expected.items():
+            assert stats[key] == value, key
+        assert db_manager.get_issues_statistics()['total'] == expected['active_issues']
+
+    def test_counters_follow_operations(self, db_manager):
+        """Счетчики совпадают с подсчетом по таблицам после выдач, возвратов и удалений"""
+        self._assert_counters_match(db_manager)
+
+        instrument_ids, issue_ids = TestBatchReturn._issue_instruments(db_manager, 6)
+        self._assert_counters_match(db_manager)
+
+        db_manager.return_instruments_batch(issue_ids[:4], "", "Кладовщик")
+        self._assert_counters_match(db_manager)
+
+        conn = db_manager.get_connection()
+        conn.execute("UPDATE instruments SET status = 'На ремонте' WHERE id = ?", (instrument_ids[0],))
+        conn.execute("UPDATE employees SET status = 'Уволен' WHERE id = (SELECT MIN(id) FROM employees)")
+        conn.execute("DELETE FROM operation_history WHERE issue_id = ?", (issue_ids[5],))
+        conn.execute("DELETE FROM issues WHERE id = ?", (issue_ids[5],))
+        conn.execute("DELETE FROM instruments WHERE id = ?", (instrument_ids[5],))
+        conn.commit()
+        conn.close()
+        self._assert_counters_match(db_manager)
+
+    def test_rebuild_counters(self, db_manager):
+        """Пересчет восстанавливает счетчики после ручного изменения"""
+        conn = db_manager.get_connection()
+        conn.execute("UPDATE stat_counters SET value = value + 100")
+        conn.commit()
+        conn.close()
+
+        success, _ = db_manager.rebuild_stat_counters()
+
+        assert success
+        self._assert_counters_match(db_manager)
+
+
+class TestQueryCache:
+    """Тесты кэша результатов запросов"""
+
+    def test_cache_disabled_by_default(self, db_manager):
+        """Без enable_cache запросы не кэшируются"""
+        db_manager.get_addresses()
+        assert db_manager.get_cache_stats() is None
+
+    def test_repeated_read_hits_cache(self, db_manager):
+        """Повторный запрос с теми же аргументами берется из кэша"""
+        db_manager.enable_cache()
+
+        first = db_manager.get_instruments()
+        second = db_manager.get_instruments()
+        db_manager.get_instruments("дрель")
+
+        stats = db_manager.get_cache_stats()
+        assert first == second
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+        assert stats['size'] == 2
+
+    def test_write_invalidates_dependent_results(self, db_manager):
+        """Запись сбрасывает только результаты, зависящие от измененной таблицы"""
+        db_manager.enable_cache()
+        instruments_before = db_manager.get_instruments()
+        db_manager.get_employees()
+
+        db_manager.add_instrument(("Кэш-инструмент", "", "CACHE-001", None,
+                                   "Ручной инструмент", "Доступен", None, None))
+        instruments_after = db_manager.get_instruments()
+        db_manager.get_employees()
+
+        assert len(instruments_after) == len(instruments_before) + 1
+        stats = db_manager.get_cache_stats()
+        assert stats['hits'] == 1  # сотрудники остались в кэше
+
+    def test_direct_write_clears_cache(self, db_manager):
+        """Изменения в обход методов DatabaseManager сбрасывают кэш целиком"""
+        db_manager.enable_cache()
+        addresses = db_manager.get_addresses()
+
+        conn = db_manager.get_connection()
+        conn.execute("INSERT INTO addresses (name, full_address) VALUES ('Склад кэша', '')")
+        conn.commit()
+        conn.close()
+
+        assert len(db_manager.get_addresses()) == len(addresses) + 1
+
+    def test_write_from_other_thread_keeps_unrelated_results(self, db_manager):
+        """Запись через методы в другом потоке не сбрасывает кэш чтений фонового потока"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        db_manager.enable_cache()
+        # Один фоновый поток с постоянным соединением, как у загрузчика таблиц
+        worker = ThreadPoolExecutor(max_workers=1)
+
+        def read_in_worker():
+            return worker.submit(
+                lambda: (len(db_manager.get_employees()), len(db_manager.get_addresses()))
+            ).result()
+
+        try:
+            employees, addresses = read_in_worker()
+            assert db_manager.add_address("Склад потока")[0]
+            assert read_in_worker() == (employees, addresses + 1)
+            assert db_manager.get_cache_stats()['hits'] == 1  # сотрудники остались в кэше
+
+            # Запись в обход методов по-прежнему сбрасывает кэш целиком
+            conn = db_manager.get_connection()
+            conn.execute("INSERT INTO employees (full_name) VALUES ('Сотрудник в обход')")
+            conn.commit()
+            conn.close()
+            assert read_in_worker()[0] == employees + 1
+        finally:
+            worker.shutdown()
+
+    def test_cached_result_is_copied(self, db_manager):
+        """Изменение возвращенного списка не портит кэш"""
+        db_manager.enable_cache()
+        employees = db_manager.get_employees()
+        employees.clear()
+
+        assert db_manager.get_employees()
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняется давно не использованный результат"""
+        from query_cache import QueryCache
+
+        cache = QueryCache(maxsize=2)
+        cache.put('a', 1, ('instruments',))
+        cache.put('b', 2, ('employees',))
+        cache.get('a')
+        cache.put('c', 3, ('addresses',))
+
+        assert cache.get('b') == (False, None)
+        assert cache.get('a') == (True, 1)
+        assert cache.stats()['evictions'] == 1
+
+    def test_stale_result_not_stored(self):
+        """Результат, прочитанный до параллельной инвалидации, не сохраняется"""
+        from query_cache import QueryCache
+
+        cache = QueryCache()
+        generation = cache.generation
+        cache.invalidate(('instruments',))
+        cache.put('a', 1, ('instruments',), generation)
+
+        assert cache.get('a') == (False, None)
+
+
+class TestAnalyticsSnapshot:
+    """Тесты снимка данных аналитики"""
+
+    @staticmethod
+    def _snapshot(db_manager, clock):
+        from analytics_snapshot import AnalyticsSnapshot
+
+        return AnalyticsSnapshot(db_manager, ttl=60, clock=lambda: clock[0])
+
+    def test_reused_within_ttl(self, db_manager):
+        """До истечения времени жизни снимок отдается без пересчета"""
+        clock = [0]
+        snapshot = self._snapshot(db_manager, clock)
+        data = snapshot.get()
+        assert snapshot.sections_computed == len(db_manager.ANALYTICS_SECTIONS)
+
+        db_manager.add_address("Склад для аналитики")
+        clock[0] = 59
+        assert snapshot.get() is data
+
+        # Без изменений таблиц истекший снимок продлевается без пересчета
+        clock[0] = 200
+        snapshot.get(force=True)
+        clock[0] = 400
+        snapshot.get()
+        assert snapshot.sections_computed == len(db_manager.ANALYTICS_SECTIONS) + 1
+
+    def test_only_dependent_sections_recomputed(self, db_manager):
+        """Пересчитываются только разделы, зависящие от изменившихся таблиц"""
+        clock = [0]
+        snapshot = self._snapshot(db_manager, clock)
+        snapshot.get()
+        computed = snapshot.sections_computed
+
+        db_manager.add_address("Склад для аналитики")
+        snapshot.get(force=True)
+        assert snapshot.sections_computed == computed + 1
+
+        TestBatchReturn._issue_instruments(db_manager, 2)
+        data = snapshot.get(force=True)
+        assert data == db_manager.get_analytics_sections()
+
+    def test_table_versions_follow_writes(self, db_manager):
+        """Версия таблицы увеличивается при вставке, изменении и удалении строк"""
+        before = db_manager.get_table_versions()
+
+        db_manager.add_address("Временный адрес")
+        conn = db_manager.get_connection()
+        conn.execute("UPDATE addresses SET full_address = 'ул. Тестовая' WHERE name = 'Временный адрес'")
+        conn.execute("DELETE FROM addresses WHERE name = 'Временный адрес'")
+        conn.commit()
+        conn.close()
+
+        after = db_manager.get_table_versions()
+        assert after['addresses'] == before.get('addresses', 0) + 3
+        assert after.get('issues') == before.get('issues')
+
+
+class TestActiveIssuesTrend:
+    """Тесты динамики активных выдач"""
+
+    @staticmethod
+    def _brute_force(db_manager, day):
+        """Количество выдач, активных на конец дня, подсчетом по всем выдачам"""
+        conn = db_manager.get_connection()
+        count = conn.execute("""
+            SELECT COUNT(*) FROM issues
+            WHERE date(issue_date) <= ?
+                AND (actual_return_date IS NULL OR date(actual_return_date) > ?)
+        """, (day, day)).fetchone()[0]
+        conn.close()
+        return count
+
+    def test_matches_direct_count(self, db_manager):
+        """Значения совпадают с прямым подсчетом, включая уже возвращенные выдачи"""
+        _, issue_ids = TestBatchReturn._issue_instruments(db_manager, 6)
+        conn = db_manager.get_connection()
+        today = conn.execute("SELECT date('now')").fetchone()[0]
+        for offset, issue_id in enumerate(issue_ids):
+            conn.execute(
+                "UPDATE issues SET issue_date = datetime('now', ?) WHERE id = ?",
+                (f'-{10 * (offset + 1)} days', issue_id)
+            )
+        conn.commit()
+        conn.close()
+        db_manager.return_instruments_batch(issue_ids[:3], "", "Кладовщик")
+        conn = db_manager.get_connection()
+        conn.execute(
+            "UPDATE issues SET actual_return_date = datetime('now', '-15 days') WHERE id = ?",
+            (issue_ids[2],)
+        )
+        conn.commit()
+        conn.close()
+
+        trend = db_manager.get_active_issues_trend(90)
+
+        assert len(trend) == 90
+        assert trend[-1][0] == today
+        for day, count in trend:
+            assert count == self._brute_force(db_manager, day), day
+
+    def test_period_in_past(self, db_manager):
+        """Период может заканчиваться в прошлом"""
+        TestBatchReturn._issue_instruments(db_manager, 2)
+
+        trend = db_manager.get_active_issues_trend(7, end_date='2020-01-31')
+
+        assert [day for day, _ in trend] == [f'2020-01-{day}' for day in range(25, 32)]
+        assert all(count == self._brute_force(db_manager, day) for day, count in trend)
+
+
+class TestDeadlineIssues:
+    """Тесты выборки просроченных и приближающихся сроков возврата"""
+
+    def _issue_with_due_dates(self, db_manager, due_dates):
+        _, issue_ids = TestBatchReturn._issue_instruments(db_manager, len(due_dates))
+        conn = db_manager.get_connection()
+        for issue_id, due_date in zip(issue_ids, due_dates):
+            conn.execute("UPDATE issues SET expected_return_date = ? WHERE id = ?", (due_date, issue_id))
+        conn.commit()
+        conn.close()
+        return issue_ids
+
+    def test_overdue_and_upcoming(self, db_manager):
+        """Просрочка считается от переданной даты, выдачи без срока и дальние сроки не попадают"""
+        conn = db_manager.get_connection()
+        conn.execute("UPDATE issues SET expected_return_date = '2099-01-01' WHERE status = 'Выдан'")
+        conn.commit()
+        conn.close()
+        issue_ids = self._issue_with_due_dates(
+            db_manager, ['2025-03-01', '2025-03-09', '2025-03-10', '2025-03-12', '2025-03-13', None]
+        )
+        today = '2025-03-10'
+
+        overdue = db_manager.get_overdue_issues(today)
+        upcoming = db_manager.get_upcoming_issues(2, today)
+        deadlines = db_manager.get_deadline_issues(2, today)
+
+        assert [(row[0], row[8]) for row in overdue] == [(issue_ids[0], 9), (issue_ids[1], 1)]
+        assert [(row[0], -row[8]) for row in upcoming] == [(issue_ids[2], 0), (issue_ids[3], 2)]
+        assert deadlines == overdue + upcoming
+
+    def test_returned_issues_excluded(self, db_manager):
+        """Возвращенные выдачи не считаются просроченными"""
+        issue_ids = self._issue_with_due_dates(db_manager, ['2000-01-01', '2000-01-02'])
+        db_manager.return_instrument(issue_ids[0], "", "Тест")
+
+        overdue_ids = [row[0] for row in db_manager.get_overdue_issues()]
+
+        assert issue_ids[0] not in overdue_ids
+        assert issue_ids[1] in overdue_ids
+
+
+    def test_notification_state(self, db_manager):
+        """Состояние уведомлений обновляется и удаляется одной операцией"""
+        success, message = db_manager.update_notification_state(
+            [(1, 2, '2025-03-10 09:00:00'), (2, 3, '2025-03-10 09:00:00')]
+        )
+        assert success, message
+
+        db_manager.update_notification_state([(1, 3, '2025-03-10 12:00:00')], removed_ids=[2])
+
+        assert db_manager.get_notification_state() == {1: (3, '2025-03-10 12:00:00')}
+
+
+class TestRollups:
+    """Тесты сводных таблиц выдач"""
+
+    TABLES = ('rollup_daily', 'rollup_employee', 'rollup_instrument', 'rollup_address', 'rollup_due')
+
+    @staticmethod
+    def _direct_reports(db_manager):
+        """Отчеты, посчитанные напрямую по таблице issues"""
+        conn = db_manager.get_connection()
+        reports = {
+            'by_day': conn.execute("""
+                SELECT date(issue_date), COUNT(*) FROM issues
+                GROUP BY date(issue_date) ORDER BY 1 DESC
+            """).fetchall(),
+            'usage': conn.execute("""
+                SELECT COUNT(*), MIN(julianday(actual_return_date) - julianday(issue_date)),
+                       MAX(julianday(actual_return_date) - julianday(issue_date))
+                FROM issues WHERE actual_return_date IS NOT NULL
+            """).fetchone(),
+            'employees': conn.execute("""
+                SELECT e.full_name, COUNT(*),
+                       SUM(i.status = 'Выдан'),
+                       SUM(i.status = 'Выдан' AND i.expected_return_date < date('now'))
+                FROM issues i JOIN employees e ON e.id = i.employee_id
+                WHERE e.status = 'Активен'
+                GROUP BY e.id ORDER BY 2 DESC, 1
+            """).fetchall(),
+            'overdue': sorted(conn.execute("""
+                SELECT COALESCE(ins.category, 'Без категории'), COUNT(*)
+                FROM issues i JOIN instruments ins ON ins.id = i.instrument_id
+                WHERE i.status = 'Выдан' AND i.expected_return_date < date('now')
+                GROUP BY ins.category
+            """).fetchall()),
+        }
+        conn.close()
+        return reports
+
+    @staticmethod
+    def _rollup_reports(db_manager):
+        """Те же отчеты из сводных таблиц"""
+        db_manager.clear_cache()
+        usage = db_manager.get_average_usage_time()
+        return {
+            'by_day': db_manager.get_issues_by_period(100000),
+            'usage': (usage['total_returns'], usage['min_days'], usage['max_days']) if usage else (0, None, None),
+            'employees': sorted(
+                (row[0], row[2], row[3], row[4]) for row in db_manager.get_top_employees_by_issues(1000)
+            ),
+            'overdue': sorted(db_manager.get_analytics_sections(['overdue_by_category'])['overdue_by_category']),
+        }
+
+    def _assert_consistent(self, db_manager):
+        direct = self._direct_reports(db_manager)
+        rollup = self._rollup_reports(db_manager)
+        assert rollup['by_day'] == direct['by_day']
+        count, min_days, max_days = direct['usage']
+        assert rollup['usage'][0] == count
+        if count:
+            assert rollup['usage'][1:] == (int(min_days), int(max_days))
+        assert rollup['employees'] == sorted(direct['employees'])
+        assert rollup['overdue'] == direct['overdue']
+
+    def _snapshot(self, db_manager):
+        conn = db_manager.get_connection()
+        tables = {}
+        for table in self.TABLES:
+            totals = 'active' if table == 'rollup_due' else 'issues + returns'
+            # Строки с нулевыми итогами после удаления выдач не влияют на отчеты
+            rows = conn.execute(f"SELECT * FROM {table} WHERE {totals} != 0 ORDER BY 1, 2, 3").fetchall()
+            tables[table] = [
+                tuple(round(value, 6) if isinstance(value, float) else value for value in row)
+                for row in rows
+            ]
+        conn.close()
+        return tables
+
+    def test_incremental_updates(self, db_manager):
+        """Выдача, возврат, изменение и удаление выдач отражаются в сводных таблицах"""
+        _, issue_ids = TestBatchReturn._issue_instruments(db_manager, 6)
+        conn = db_manager.get_connection()
+        for offset, issue_id in enumerate(issue_ids):
+            conn.execute(
+                "UPDATE issues SET issue_date = datetime('now', ?), expected_return_date = date('now', ?) "
+                "WHERE id = ?",
+                (f'-{5 * (offset + 1)} days', f'{3 - offset * 2} days', issue_id)
+            )
+        conn.commit()
+        conn.close()
+        self._assert_consistent(db_manager)
+
+        db_manager.return_instruments_batch(issue_ids[:3], "", "Кладовщик")
+        self._assert_consistent(db_manager)
+
+        conn = db_manager.get_connection()
+        conn.execute(
+            "UPDATE issues SET actual_return_date = datetime('now', '-1 days') WHERE id = ?",
+            (issue_ids[0],)
+        )
+        conn.execute("DELETE FROM issues WHERE id IN (?, ?)", (issue_ids[1], issue_ids[4]))
+        conn.commit()
+        conn.close()
+        self._assert_consistent(db_manager)
+
+    def test_rebuild_restores_rollups(self, db_manager):
+        """Пересчет восстанавливает сводные таблицы после их повреждения"""
+        _, issue_ids = TestBatchReturn._issue_instruments(db_manager, 4)
+        db_manager.return_instrument(issue_ids[0], "", "Тест")
+        expected = self._snapshot(db_manager)
+
+        conn = db_manager.get_connection()
+        for table in self.TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        conn.commit()
+        conn.close()
+
+        success, message = db_manager.rebuild_rollups()
 
+        assert success, message
+        assert self._snapshot(db_manager) == expected
+        self._assert_consistent(db_manager)
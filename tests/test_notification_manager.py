@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля notification_manager.py
+"""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from notification_manager import NotificationManager
+
+
+class FakeDatabase:
+    """Замена DatabaseManager со сроками возврата активных выдач"""
+
+    def __init__(self, due_dates):
+        self.due_dates = due_dates
+        self.listeners = []
+
+    def get_active_due_dates(self):
+        return list(self.due_dates)
+
+    def add_change_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        self.listeners.remove(callback)
+
+
+@pytest.fixture
+def manager():
+    manager = NotificationManager(FakeDatabase(['2025-03-10', 'без срока']))
+    manager.settings.update({'overdue_warning_days': 1, 'overdue_critical_days': 3})
+    return manager
+
+
+class TestDeadlineScheduler:
+    """Тесты планирования проверок по срокам возврата"""
+
+    def test_deadline_moments(self, manager):
+        """Куча содержит начало предупреждения, просрочку и критическую просрочку"""
+        deadlines = manager._build_deadlines(datetime(2025, 3, 1, 12, 0))
+
+        assert sorted(deadlines) == [
+            datetime(2025, 3, 9), datetime(2025, 3, 11), datetime(2025, 3, 13)
+        ]
+        # Прошедшие моменты не планируются
+        assert sorted(manager._build_deadlines(datetime(2025, 3, 11, 8, 0))) == [datetime(2025, 3, 13)]
+
+    def test_checks_only_when_deadline_reached(self, manager):
+        """Проверка выполняется при перестроении и при наступлении срока, а не по таймеру"""
+        now = datetime(2025, 3, 8, 23, 20)
+        assert manager._take_due_check(now)
+        assert manager._seconds_until_next_check(now) == 2400
+
+        now = datetime(2025, 3, 8, 23, 30)
+        assert not manager._take_due_check(now)
+        assert manager._seconds_until_next_check(now) == 1800
+
+        now = datetime(2025, 3, 9, 0, 0, 1)
+        assert manager._take_due_check(now)
+        assert manager.get_next_check_time() == datetime(2025, 3, 11)
+        assert manager._seconds_until_next_check(now) == manager.max_wait
+
+    def test_issue_event_wakes_monitor(self, db_manager):
+        """Выдача через DatabaseManager будит поток мониторинга без ожидания интервала"""
+        manager = NotificationManager(db_manager)
+        checked = threading.Semaphore(0)
+        manager._check_deadlines = checked.release
+        manager.start_monitoring()
+        try:
+            assert checked.acquire(timeout=5)  # первая проверка при запуске
+
+            conn = db_manager.get_connection()
+            instrument_id = conn.execute(
+                "SELECT id FROM instruments WHERE status = 'Доступен' LIMIT 1"
+            ).fetchone()[0]
+            employee_id = conn.execute("SELECT id FROM employees LIMIT 1").fetchone()[0]
+            conn.close()
+            success, message = db_manager.issue_instrument(
+                instrument_id, employee_id, '2000-01-01', '', 'Тест'
+            )
+            assert success, message
+
+            assert checked.acquire(timeout=5)
+            assert datetime(2000, 1, 2) not in manager._deadlines
+        finally:
+            manager.stop_monitoring()
+        assert manager._on_data_changed not in db_manager._change_listeners
+
+    def test_set_database_moves_listener(self, manager):
+        """После замены БД подписка переносится и сроки перестраиваются по новой БД"""
+        old_db = manager.db
+        checked = threading.Semaphore(0)
+        manager._check_deadlines = checked.release
+        manager.start_monitoring()
+        try:
+            assert checked.acquire(timeout=5)  # первая проверка при запуске
+            new_db = FakeDatabase(['2999-01-10'])
+            manager.set_database(new_db)
+
+            assert old_db.listeners == []
+            assert new_db.listeners == [manager._on_data_changed]
+            assert checked.acquire(timeout=5)
+            assert sorted(manager._deadlines)[0] == datetime(2999, 1, 9)
+        finally:
+            manager.stop_monitoring()
+        assert new_db.listeners == []
+
+
+class StateDatabase(FakeDatabase):
+    """Замена DatabaseManager с выдачами и состоянием уведомлений"""
+
+    def __init__(self, issues):
+        super().__init__([])
+        self.issues = issues  # строки get_deadline_issues
+        self.state = {}
+
+    def get_deadline_issues(self, days, today=None):
+        return list(self.issues)
+
+    def get_notification_state(self):
+        return dict(self.state)
+
+    def update_notification_state(self, updates, removed_ids=()):
+        for issue_id, level, sent_at in updates:
+            self.state[issue_id] = (level, sent_at)
+        for issue_id in removed_ids:
+            del self.state[issue_id]
+        return True, ""
+
+
+def _issue(issue_id, overdue_days):
+    return (issue_id, issue_id, f"INV-{issue_id}", f"Инструмент {issue_id}", "Сотрудник",
+            "", "2025-01-01 10:00:00", "2025-03-01", overdue_days)
+
+
+class TestNotificationState:
+    """Тесты повторной отправки уведомлений"""
+
+    @pytest.fixture
+    def check(self, manager):
+        """Проверка сроков в указанный момент: заголовки поставленных уведомлений"""
+        manager.db = StateDatabase([_issue(1, 1), _issue(2, 5), _issue(3, 0)])
+        manager.settings.update({'enable_telegram_notifications': False,
+                                 'renotify_warning_hours': 0,
+                                 'renotify_overdue_hours': 24,
+                                 'renotify_critical_hours': 8})
+
+        def run(now):
+            manager._check_deadlines(now)
+            return sorted(title for title, _ in manager.get_pending_notifications())
+        return run
+
+    def test_unchanged_set_not_resent(self, manager, check):
+        """Неизменный набор выдач отправляется один раз, до истечения интервала повтора"""
+        assert check(datetime(2025, 3, 10, 9, 0)) == [
+            "Критическая просрочка инструментов",
+            "Напоминание о возвратах",
+            "Просроченные возвраты инструментов",
+        ]
+        assert check(datetime(2025, 3, 10, 9, 5)) == []
+        assert manager.get_next_check_time() == datetime(2025, 3, 10, 17, 0)
+
+        # Истек интервал критической просрочки; напоминания о сроке не повторяются
+        assert check(datetime(2025, 3, 10, 17, 0)) == ["Критическая просрочка инструментов"]
+        assert check(datetime(2025, 3, 11, 0, 30)) == []
+        assert check(datetime(2025, 3, 11, 9, 0)) == [
+            "Критическая просрочка инструментов",
+            "Просроченные возвраты инструментов",
+        ]
+
+    def test_escalation_only(self, manager, check):
+        """Повышение уровня отправляется сразу, понижение и возврат - без уведомления"""
+        check(datetime(2025, 3, 10, 9, 0))
+
+        manager.db.issues = [_issue(1, 4), _issue(2, 1)]
+        messages = []
+        manager._show_desktop_notification = lambda title, message: messages.append(message)
+        manager._check_deadlines(datetime(2025, 3, 10, 10, 0))
+
+        # Только выдача 1 перешла в критическую просрочку
+        assert len(messages) == 1
+        assert "Инструмент 1" in messages[0] and "Инструмент 2" not in messages[0]
+        assert manager.db.state[1][0] == manager.LEVEL_CRITICAL
+        assert manager.db.state[2] == (manager.LEVEL_OVERDUE, '2025-03-10 09:00:00')
+        assert 3 not in manager.db.state
+
+
+class TestPendingWakeup:
+    """Тесты пробуждения главного потока при появлении уведомлений"""
+
+    def test_burst_posts_single_wakeup(self, manager):
+        """Пачка уведомлений будит главный поток один раз до чтения очереди"""
+        wakeups = []
+        manager.set_pending_callback(lambda: wakeups.append(1))
+
+        for number in range(3):
+            manager._show_desktop_notification(f"Уведомление {number}", "")
+        assert len(wakeups) == 1
+
+        assert len(manager.get_pending_notifications()) == 3
+        manager._show_desktop_notification("Еще одно", "")
+        assert len(wakeups) == 2
+
+    def test_failed_wakeup_keeps_notifications(self, manager):
+        """Ошибка пробуждения (mainloop еще не запущен) не теряет уведомления"""
+        def fail():
+            raise RuntimeError("main thread is not in main loop")
+        manager.set_pending_callback(fail)
+
+        manager._show_desktop_notification("Уведомление", "текст")
+
+        assert manager.get_pending_notifications() == [("Уведомление", "текст")]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля ui/search_controller.py
+"""
+
+import pytest
+
+from ui.search_controller import SearchController
+
+
+class FakeRoot:
+    """Замена корневого окна Tk с управляемым временем"""
+
+    def __init__(self):
+        self.now = 0
+        self.jobs = {}  # номер -> (время запуска, функция)
+        self.last_job = 0
+
+    def after(self, delay, callback):
+        self.last_job += 1
+        self.jobs[self.last_job] = (self.now + delay, callback)
+        return self.last_job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def advance(self, ms):
+        """Сдвиг времени с выполнением наступивших вызовов"""
+        self.now += ms
+        for job, (when, callback) in sorted(self.jobs.items()):
+            if when <= self.now:
+                del self.jobs[job]
+                callback()
+
+
+class FakeEntry:
+    """Замена поля ввода: события вызываются вручную"""
+
+    def __init__(self):
+        self.text = ''
+        self.bindings = {}
+
+    def get(self):
+        return self.text
+
+    def bind(self, event, handler, add=None):
+        self.bindings[event] = handler
+
+    def type(self, text):
+        """Ввод текста по одному символу с событием отпускания клавиши"""
+        for char in text:
+            self.text += char
+            self.bindings['<KeyRelease>'](None)
+
+
+@pytest.fixture
+def search():
+    root = FakeRoot()
+    controller = SearchController(root, debounce_ms=300, min_length=2)
+    entry = FakeEntry()
+    calls = []
+    controller.attach(entry, lambda: calls.append(entry.get()))
+    return controller, root, entry, calls
+
+
+class TestSearchController:
+    """Тесты отложенного поиска"""
+
+    def test_typing_triggers_single_search(self, search):
+        """Быстрый ввод слова запускает один поиск после паузы"""
+        _, root, entry, calls = search
+
+        entry.type("перфоратор")
+        root.advance(299)
+        assert calls == []
+
+        root.advance(1)
+        assert calls == ["перфоратор"]
+
+    def test_min_length_and_unchanged_text(self, search):
+        """Короткий текст и нажатия без изменения текста не запускают поиск"""
+        _, root, entry, calls = search
+
+        entry.type("п")
+        root.advance(300)
+        assert calls == []
+
+        entry.type("е")
+        root.advance(300)
+        entry.bindings['<KeyRelease>'](None)  # стрелка или Shift
+        root.advance(300)
+        assert calls == ["пе"]
+
+        # Очистка поля возвращает полный список
+        entry.text = ''
+        entry.bindings['<KeyRelease>'](None)
+        root.advance(300)
+        assert calls == ["пе", ""]
+
+    def test_enter_searches_immediately(self, search):
+        """Enter запускает поиск сразу, в том числе для короткого текста"""
+        controller, root, entry, calls = search
+
+        entry.type("п")
+        entry.bindings['<Return>'](None)
+        assert calls == ["п"]
+
+        # Отложенный запуск после Enter отменен
+        root.advance(300)
+        assert calls == ["п"]
+
+        entry.type("е")
+        controller.cancel_all()
+        root.advance(300)
+        assert calls == ["п"]
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля telegram_queue.py
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from telegram_queue import TelegramSendQueue, TokenBucket
+
+
+class RetryAfter(Exception):
+    """Ответ Telegram о превышении лимита: повторить через retry_after секунд"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Flood control, retry in {retry_after}")
+        self.retry_after = retry_after
+
+
+class FakeBot:
+    """Замена Bot API: запоминает отправленные сообщения, может отвечать ошибками"""
+
+    def __init__(self):
+        self.sent = []  # (чат, текст, время)
+        self.errors = {}  # текст -> список исключений для очередных попыток
+
+    async def send_message(self, chat_id, text):
+        errors = self.errors.get(text)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def run_queue(bot, messages, **options):
+    """Отправка сообщений [(чат, текст)] через очередь; возвращает очередь после отправки"""
+    async def main():
+        send_queue = TelegramSendQueue(bot.send_message, **options)
+        send_queue.start()
+        for chat_id, text in messages:
+            await send_queue._put(chat_id, text)
+        await asyncio.wait_for(send_queue.join(), 5)
+        await send_queue.stop()
+        return send_queue
+    return asyncio.run(main())
+
+
+class TestTokenBucket:
+    """Тесты ограничителя частоты"""
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+        for _ in range(2):
+            assert bucket.delay(0) == 0
+            bucket.consume(0)
+        assert bucket.delay(0) == pytest.approx(0.5)
+        assert bucket.delay(0.5) == 0
+
+
+class TestTelegramSendQueue:
+    """Тесты очереди отправки сообщений"""
+
+    def test_chat_rate_does_not_block_other_chats(self):
+        """Лимит чата задерживает только его сообщения"""
+        bot = FakeBot()
+        run_queue(bot, [(1, "a1"), (1, "a2"), (1, "a3"), (2, "b1")],
+                  chat_rate=10, chat_burst=1, global_rate=1000, global_burst=1000)
+
+        texts = [text for _, text, _ in bot.sent]
+        assert texts.index("b1") < texts.index("a2")
+        times = [moment for chat_id, _, moment in bot.sent if chat_id == 1]
+        assert all(later - earlier >= 0.09 for earlier, later in zip(times, times[1:]))
+
+    def test_global_rate(self):
+        """Общий лимит действует на все чаты вместе"""
+        bot = FakeBot()
+        started = time.monotonic()
+        run_queue(bot, [(chat_id, "текст") for chat_id in range(6)],
+                  global_rate=20, global_burst=2)
+
+        assert len(bot.sent) == 6
+        assert bot.sent[-1][2] - started >= 0.19
+
+    def test_retry_preserves_order(self):
+        """Неудачная отправка повторяется раньше следующих сообщений чата"""
+        bot = FakeBot()
+        bot.errors["первое"] = [RetryAfter(0.05), ConnectionError("сеть")]
+        send_queue = run_queue(bot, [(1, "первое"), (1, "второе")],
+                               chat_rate=1000, chat_burst=10, backoff=0.01)
+
+        assert [text for _, text, _ in bot.sent] == ["первое", "второе"]
+        assert (send_queue.sent, send_queue.failed) == (2, 0)
+
+    def test_give_up_after_retries(self):
+        """Неповторяемые ошибки и исчерпанные повторы не задерживают очередь"""
+        bot = FakeBot()
+        bot.errors["сбой"] = [ConnectionError("сеть")] * 5
+        bot.errors["запрет"] = [PermissionError("бот заблокирован")]
+        send_queue = run_queue(bot, [(1, "сбой"), (2, "запрет"), (3, "ок")],
+                               max_retries=2, backoff=0.01,
+                               retryable=lambda error: not isinstance(error, PermissionError))
+
+        assert [text for _, text, _ in bot.sent] == ["ок"]
+        assert (send_queue.sent, send_queue.failed) == (1, 2)
+        # Первая попытка и два повтора
+        assert len(bot.errors["сбой"]) == 2
+
+    def test_submit_from_thread_with_backpressure(self):
+        """Сообщения ставятся из другого потока, переполненная очередь их отклоняет"""
+        bot = FakeBot()
+
+        async def main():
+            # Bot API "завис": первое сообщение отправляется, пока его не отпустят
+            released = asyncio.Event()
+
+            async def send(chat_id, text):
+                await released.wait()
+                await bot.send_message(chat_id, text)
+
+            send_queue = TelegramSendQueue(send, max_size=2, chat_rate=1000, chat_burst=10)
+            send_queue.start()
+            results = []
+            worker = threading.Thread(target=lambda: results.extend(
+                future.result(timeout=5) for future in send_queue.broadcast([1, 2, 3], "текст")
+            ))
+            worker.start()
+            await asyncio.get_running_loop().run_in_executor(None, worker.join)
+            released.set()
+            await asyncio.wait_for(send_queue.join(), 5)
+            await send_queue.stop()
+            return send_queue, results
+
+        send_queue, results = asyncio.run(main())
+
+        assert results == [True, True, False]
+        assert send_queue.rejected == 1
+        assert [chat_id for chat_id, _, _ in bot.sent] == [1, 2]
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Тесты для модуля ui/virtual_tree.py
+"""
+
+import pytest
+
+from ui.virtual_tree import VirtualTreeview
+
+
+class FakeScrollbar:
+    """Замена ttk.Scrollbar: запоминает последнее положение"""
+
+    def __init__(self):
+        self.position = (0.0, 1.0)
+        self.command = None
+
+    def configure(self, command=None):
+        self.command = command
+
+    def set(self, first, last):
+        self.position = (float(first), float(last))
+
+
+class FakeTree:
+    """Минимальная замена ttk.Treeview без дисплея
+
+    Видимая область - visible строк начиная с self.top. Как и в Tk,
+    yscrollcommand вызывается отложенно; отложенные вызовы выполняет run_idle.
+    """
+
+    def __init__(self, visible=10):
+        self.visible = visible
+        self.items = {}  # iid -> {'values', 'tags'}
+        self.order = []
+        self.selected = []
+        self.top = 0
+        self.yscrollcommand = None
+        self.idle = []  # (номер, функция, аргументы)
+        self.last_job = 0
+        self.scroll_pending = False
+
+    # Настройка и события
+    def configure(self, yscrollcommand=None):
+        self.yscrollcommand = yscrollcommand
+
+    def bind(self, *args, **kwargs):
+        pass
+
+    def cget(self, option):
+        return {'height': self.visible, 'style': ''}[option]
+
+    def winfo_height(self):
+        return 1
+
+    def after_idle(self, callback, *args):
+        self.last_job += 1
+        self.idle.append((self.last_job, callback, args))
+        return self.last_job
+
+    def after_cancel(self, job):
+        self.idle = [entry for entry in self.idle if entry[0] != job]
+
+    def run_idle(self):
+        for _ in range(1000):
+            if not self.idle:
+                return
+            _, callback, args = self.idle.pop(0)
+            callback(*args)
+        raise AssertionError("Бесконечная цепочка отложенных вызовов")
+
+    # Элементы
+    def get_children(self, parent=''):
+        return tuple(self.order)
+
+    def exists(self, iid):
+        return iid in self.items
+
+    def insert(self, parent, index, iid, values, tags):
+        assert iid not in self.items
+        self.items[iid] = {'values': values, 'tags': tags}
+        self.order.insert(index, iid)
+        self._notify()
+
+    def item(self, iid, option=None, **kwargs):
+        if kwargs:
+            self.items[iid].update(kwargs)
+            return None
+        return self.items[iid][option] if option else self.items[iid]
+
+    def move(self, iid, parent, index):
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def delete(self, *iids):
+        for iid in iids:
+            del self.items[iid]
+            self.order.remove(iid)
+        self.selected = [iid for iid in self.selected if iid in self.items]
+        self.top = min(self.top, max(0, len(self.order) - self.visible))
+        self._notify()
+
+    def selection(self):
+        return tuple(self.selected)
+
+    def selection_set(self, iids):
+        self.selected = list(iids)
+
+    # Прокрутка
+    def yview(self, *args):
+        if not args:
+            count = len(self.order) or 1
+            return self.top / count, min(len(self.order), self.top + self.visible) / count
+        _, amount, what = args
+        step = int(amount) * (self.visible if what == 'pages' else 1)
+        self.yview_scroll(step, 'units')
+
+    def yview_moveto(self, fraction):
+        self.top = int(round(fraction * len(self.order)))
+        self._notify()
+
+    def yview_scroll(self, amount, what):
+        self.top = max(0, min(self.top + int(amount), max(0, len(self.order) - self.visible)))
+        self._notify()
+
+    def visible_values(self):
+        return [self.items[iid]['values'] for iid in self.order[self.top:self.top + self.visible]]
+
+    def _notify(self):
+        if self.yscrollcommand and not self.scroll_pending:
+            self.scroll_pending = True
+            self.after_idle(self._send_yscroll)
+
+    def _send_yscroll(self):
+        self.scroll_pending = False
+        self.yscrollcommand(*self.yview())
+
+
+def make_rows(count):
+    return [((i, f"Инструмент {i}"), ('overdue',) if i % 2 else ()) for i in range(count)]
+
+
+@pytest.fixture
+def adapter():
+    tree = FakeTree(visible=10)
+    return VirtualTreeview(tree, FakeScrollbar(), buffer=5)
+
+
+class TestVirtualTreeview:
+    """Тесты оконного отображения строк"""
+
+    def test_only_window_materialised(self, adapter):
+        """В Treeview создаются только видимые строки и запас"""
+        adapter.set_rows(make_rows(50000))
+        adapter.tree.run_idle()
+
+        assert len(adapter.tree.items) == 10 + 2 * 5
+        assert adapter.tree.visible_values()[0] == (0, "Инструмент 0")
+        assert adapter.tree.item('1', 'tags') == ('overdue',)
+        assert adapter.scrollbar.position == (0.0, 10 / 50000)
+
+    def test_scrollbar_moves_window(self, adapter):
+        """Перемещение полосы прокрутки показывает строки из середины списка"""
+        adapter.set_rows(make_rows(1000))
+
+        adapter.scrollbar.command('moveto', '0.5')
+        adapter.tree.run_idle()
+
+        assert adapter.tree.visible_values()[0][0] == 500
+        assert adapter.top_index == 500
+        assert len(adapter.tree.items) == 20
+        assert adapter.scrollbar.position[0] == pytest.approx(0.5)
+
+    def test_scrolling_past_window_edge_reanchors(self, adapter):
+        """Прокрутка к краю окна сдвигает окно дальше по списку"""
+        adapter.set_rows(make_rows(1000))
+
+        for _ in range(30):
+            adapter.scrollbar.command('scroll', 1, 'units')
+            adapter.tree.run_idle()
+
+        assert adapter.top_index == 30
+        assert adapter.tree.visible_values()[0][0] == 30
+
+    def test_selection_survives_scrolling(self, adapter):
+        """Выбранная строка остается выбранной после выхода за пределы окна"""
+        adapter.set_rows(make_rows(1000))
+        adapter.tree.selection_set(['3'])
+
+        adapter.scrollbar.command('moveto', '0.9')
+        adapter.tree.run_idle()
+        assert '3' not in adapter.tree.items
+        assert [values[0] for values in adapter.selection()] == [3]
+
+        adapter.scrollbar.command('moveto', '0')
+        adapter.tree.run_idle()
+        assert adapter.tree.selection() == ('3',)
+
+    def test_sort_and_append(self, adapter):
+        """Сортировка и добавление строк работают со всем списком"""
+        adapter.set_rows(make_rows(100))
+        adapter.sort(lambda values: values[0], reverse=True)
+        assert adapter.tree.visible_values()[0][0] == 99
+
+        # Запомненная сортировка применяется и к добавленным строкам
+        adapter.append_rows([((1000, "Новый"), ())])
+        assert len(adapter) == 101
+        assert adapter.rows[0][0][0] == 1000
+
+    def test_scroll_end_callback(self):
+        """Прокрутка к концу списка вызывает подгрузку"""
+        calls = []
+        adapter = VirtualTreeview(FakeTree(visible=10), FakeScrollbar(), buffer=5,
+                                  on_scroll_end=lambda: calls.append(True))
+        adapter.set_rows(make_rows(100))
+        adapter.tree.run_idle()
+        assert not calls
+
+        adapter.scrollbar.command('moveto', '0.95')
+        adapter.tree.run_idle()
+        assert calls
+
+
+class RecordingTree(FakeTree):
+    """FakeTree, подсчитывающий изменения элементов"""
+
+    def __init__(self, visible=10):
+        super().__init__(visible)
+        self.operations = []
+
+    def insert(self, parent, index, iid, values, tags):
+        self.operations.append(('insert', iid))
+        super().insert(parent, index, iid, values, tags)
+
+    def delete(self, *iids):
+        self.operations.extend(('delete', iid) for iid in iids)
+        super().delete(*iids)
+
+    def item(self, iid, option=None, **kwargs):
+        if kwargs:
+            self.operations.append(('update', iid))
+        return super().item(iid, option, **kwargs)
+
+
+class TestVirtualTreeviewReconcile:
+    """Тесты обновления строк со сверкой по ключам"""
+
+    @pytest.fixture
+    def adapter(self):
+        adapter = VirtualTreeview(RecordingTree(visible=10), FakeScrollbar(), buffer=5)
+        adapter.set_rows(make_rows(20000))
+        adapter.scrollbar.command('moveto', '0.5')
+        adapter.tree.run_idle()
+        adapter.tree.operations.clear()
+        return adapter
+
+    def test_single_change_touches_single_item(self, adapter):
+        """Изменение одной строки обновляет только ее элемент"""
+        rows = make_rows(20000)
+        rows[10002] = ((10002, "Возвращен"), ())
+
+        adapter.update_rows(rows)
+        adapter.tree.run_idle()
+
+        assert adapter.tree.operations == [('update', '10002')]
+        assert adapter.top_index == 10000
+
+    def test_removed_row_keeps_position_and_selection(self, adapter):
+        """Удаление строки не сбрасывает прокрутку и выделение"""
+        adapter.tree.selection_set(['10005'])
+        rows = [row for row in make_rows(20000) if row[0][0] != 10003]
+
+        adapter.update_rows(rows)
+        adapter.tree.run_idle()
+
+        assert ('delete', '10003') in adapter.tree.operations
+        assert not any(op == 'update' for op, _ in adapter.tree.operations)
+        assert adapter.tree.visible_values()[0][0] == 10000
+        assert adapter.tree.selection() == ('10005',)
+
+    def test_update_keeps_sort_order(self, adapter):
+        """Новые строки встают на место согласно текущей сортировке"""
+        adapter.sort(lambda values: values[0], reverse=True)
+        adapter.tree.run_idle()
+        top = adapter.tree.visible_values()[0][0]
+
+        adapter.update_rows(make_rows(20000) + [((top - 1.5, "Новый"), ())])
+        adapter.tree.run_idle()
+
+        values = [v[0] for v in adapter.tree.visible_values()]
+        assert values[0] == top
+        assert values == sorted(values, reverse=True)
+        assert top - 1.5 in values
+
+
+class TestColumnSort:
+    """Тесты сортировки по типизированным столбцам"""
+
+    def test_typed_sort_keys(self, adapter):
+        """Числа сортируются как числа, даты ISO - как даты, текст - без учета регистра"""
+        adapter.set_rows([
+            ((10, "б", "2024-02-01 09:00:00"), ()),
+            ((9, "А", None), ()),
+            ((100, "в", "2023-12-31 23:59:59"), ()),
+        ])
+
+        adapter.sort_by_column(0, 'int')
+        assert [row[0][0] for row in adapter.rows] == [9, 10, 100]
+
+        adapter.sort_by_column(1, 'text')
+        assert [row[0][1] for row in adapter.rows] == ["А", "б", "в"]
+
+        adapter.sort_by_column(2, 'date')
+        assert [row[0][2] for row in adapter.rows] == [None, "2023-12-31 23:59:59", "2024-02-01 09:00:00"]
+
+        adapter.sort_by_column(2, 'date', reverse=True)
+        assert [row[0][2] for row in adapter.rows] == ["2024-02-01 09:00:00", "2023-12-31 23:59:59", None]
+
+    def test_sort_touches_only_window(self, adapter):
+        """Сортировка большого списка меняет только элементы окна"""
+        adapter.set_rows(make_rows(50000))
+        adapter.tree.run_idle()
+
+        adapter.sort_by_column(0, 'int', reverse=True)
+
+        assert len(adapter.tree.items) == 20
+        assert adapter.tree.visible_values()[0][0] == 49999
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Тесты для экспорта данных в XML и JSON
+"""
+
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from xml_json_export import XMLJSONExporter
+
+
+def history_rows(count):
+    """Генератор строк журнала операций (как постраничная выгрузка)"""
+    for i in range(1, count + 1):
+        yield (i, 'Выдача', f'INV-{i}', 'Дрель & <пила>', 'Иванов', 'Склад', '2025-01-01', 'admin', None)
+
+
+class TestXMLJSONExport:
+    """Тесты потоковой записи экспорта"""
+
+    def test_json_from_generator(self, tmp_path):
+        """JSON из генератора: корректный файл и количество записей в конце"""
+        path = str(tmp_path / "history.json")
+        success, message = XMLJSONExporter().export_to_json(history_rows(3), path, 'history')
+
+        assert success, message
+        assert "3 записей" in message
+        with open(path, encoding='utf-8') as f:
+            result = json.load(f)
+        assert [row['operation_id'] for row in result['data']] == [1, 2, 3]
+        assert result['data'][0]['instrument_name'] == 'Дрель & <пила>'
+        assert result['export_info']['total_records'] == 3
+        assert result['export_info']['data_type'] == 'history'
+
+    def test_json_empty(self, tmp_path):
+        """Пустая выгрузка дает пустой массив"""
+        path = str(tmp_path / "empty.json")
+        success, _ = XMLJSONExporter().export_to_json(iter(()), path, 'instruments')
+
+        assert success
+        with open(path, encoding='utf-8') as f:
+            result = json.load(f)
+        assert result['data'] == []
+        assert result['export_info']['total_records'] == 0
+
+    def test_xml_from_generator(self, tmp_path):
+        """XML из генератора: корректный документ с экранированием текста"""
+        path = str(tmp_path / "history.xml")
+        success, message = XMLJSONExporter().export_to_xml(history_rows(3), path, 'history')
+
+        assert success, message
+        root = ET.parse(path).getroot()
+        assert root.tag == 'history_export'
+        operations = root.find('data').findall('operation')
+        assert [op.get('id') for op in operations] == ['1', '2', '3']
+        assert operations[0].findtext('instrument_name') == 'Дрель & <пила>'
+        assert operations[0].findtext('notes') == ''
+        assert root.find('export_info').findtext('total_records') == '3'
+
+    def test_failed_export_keeps_existing_file(self, tmp_path):
+        """Ошибка посреди выгрузки не портит ранее сохраненный файл"""
+        path = str(tmp_path / "history.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('old')
+
+        def broken_rows():
+            yield from history_rows(2)
+            raise RuntimeError("обрыв выгрузки")
+
+        exporter = XMLJSONExporter()
+        for export in (exporter.export_to_json, exporter.export_to_xml):
+            success, message = export(broken_rows(), path, 'history')
+            assert not success
+            assert "обрыв выгрузки" in message
+            with open(path, encoding='utf-8') as f:
+                assert f.read() == 'old'
+            assert os.listdir(tmp_path) == ["history.json"]
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Фоновая загрузка данных для интерфейса
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundLoader:
+    """Выполнение запросов к БД вне потока Tk с передачей результатов обратно в mainloop
+
+    Запросы группируются по ключу (обычно имя таблицы). Новый запрос с тем же
+    ключом делает предыдущий устаревшим: его результат будет отброшен.
+    Результаты передаются в поток интерфейса через очередь, которую
+    опрашивает root.after, пока есть незавершенные запросы.
+    Уже выполняемый устаревший запрос можно прервать функцией interrupt.
+    """
+
+    POLL_INTERVAL_MS = 30
+
+    def __init__(self, root, max_workers=2, interrupt=None):
+        """
+        Args:
+            root: корневое окно Tk
+            max_workers: количество фоновых потоков
+            interrupt: функция interrupt(thread), прерывающая запрос к БД в потоке
+                (например, DatabaseManager.interrupt); вызывается для выполняемых
+                запросов, которые стали устаревшими
+        """
+        self.root = root
+        self.interrupt = interrupt
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="loader")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations = {}  # ключ -> номер последнего запроса
+        self._pending = {}  # ключ -> (future, on_done, on_error) последнего запроса
+        self._running = {}  # ключ -> (номер запроса, поток), выполняемые сейчас
+        self._current = threading.local()  # (ключ, номер) запроса, выполняемого потоком
+        self._poll_job = None
+        self._closed = False
+
+    def submit(self, key, func, on_done, on_error=None):
+        """Запуск func в фоновом потоке
+
+        Args:
+            key: ключ запроса; более новый запрос с тем же ключом отменяет предыдущий
+            func: функция без аргументов, выполняется в фоновом потоке
+            on_done: вызывается в потоке Tk с результатом func
+            on_error: вызывается в потоке Tk с исключением (опционально)
+        """
+        if self._closed:
+            return
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            previous = self._pending.get(key)
+            if previous is not None:
+                # Еще не начатый запрос можно не выполнять вовсе
+                previous[0].cancel()
+            self._interrupt_running(key)
+            future = self._executor.submit(self._run, key, generation, func)
+            self._pending[key] = (future, on_done, on_error)
+        self._schedule_poll()
+
+    def cancel(self, key):
+        """Отмена запроса: его результат не будет передан в интерфейс"""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            pending = self._pending.pop(key, None)
+            self._interrupt_running(key)
+        if pending is not None:
+            pending[0].cancel()
+
+    def is_loading(self, key):
+        """Есть ли незавершенный запрос с указанным ключом"""
+        with self._lock:
+            return key in self._pending
+
+    def is_superseded(self):
+        """Устарел ли запрос, выполняемый в текущем фоновом потоке
+
+        Прерывание останавливает только выполняемый сейчас запрос к БД; функция,
+        выполняющая несколько запросов подряд, проверяет это между ними, чтобы
+        не начинать запрос, результат которого будет отброшен.
+        """
+        job = getattr(self._current, 'job', None)
+        if job is None:
+            return False
+        with self._lock:
+            return self._closed or self._generations.get(job[0]) != job[1]
+
+    def shutdown(self):
+        """Остановка загрузчика: незавершенные результаты отбрасываются"""
+        self._closed = True
+        if self._poll_job is not None:
+            try:
+                self.root.after_cancel(self._poll_job)
+            except Exception:
+                pass
+            self._poll_job = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, key, generation, func):
+        """Выполнение запроса в фоновом потоке"""
+        with self._lock:
+            if self._generations.get(key) != generation:
+                return  # запрос устарел до начала выполнения
+            self._running[key] = (generation, threading.current_thread())
+        self._current.job = (key, generation)
+        try:
+            result, error = func(), None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            self._current.job = None
+            # Снимаем отметку до того, как поток возьмет следующий запрос,
+            # чтобы прерывание не попало в чужой запрос
+            with self._lock:
+                if self._running.get(key, (None,))[0] == generation:
+                    del self._running[key]
+        self._results.put((key, generation, result, error))
+
+    def _interrupt_running(self, key):
+        """Прерывание выполняемого запроса с ключом key (вызывается под блокировкой)"""
+        running = self._running.pop(key, None)
+        if running is not None and self.interrupt is not None:
+            try:
+                self.interrupt(running[1])
+            except Exception as e:
+                print(f"❌ Не удалось прервать запрос ({key}): {e}")
+
+    def _schedule_poll(self):
+        if self._poll_job is None and not self._closed:
+            self._poll_job = self.root.after(self.POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        """Обработка готовых результатов в потоке Tk"""
+        self._poll_job = None
+        while True:
+            try:
+                key, generation, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                if self._generations.get(key) != generation:
+                    continue  # результат устарел
+                pending = self._pending.pop(key, None)
+            if pending is None:
+                continue
+            _, on_done, on_error = pending
+            try:
+                if error is None:
+                    on_done(result)
+                elif on_error:
+                    on_error(error)
+                else:
+                    print(f"❌ Ошибка загрузки данных ({key}): {error}")
+            except Exception as e:
+                print(f"❌ Ошибка обработки загруженных данных ({key}): {e}")
+
+        with self._lock:
+            has_pending = bool(self._pending)
+        if has_pending:
+            self._schedule_poll()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Немодальная панель уведомлений
+"""
+
+import tkinter as tk
+from collections import deque
+
+
+class NotificationToast:
+    """Всплывающая панель в правом нижнем углу главного окна
+
+    В отличие от messagebox не блокирует работу с программой. Уведомления,
+    пришедшие пачкой, показываются одним обновлением панели; новые
+    уведомления добавляются к уже показанным (хранятся последние max_items)
+    и продлевают время показа.
+    """
+
+    def __init__(self, root, colors, max_items=5, hide_ms=20000, max_message_length=300):
+        """
+        Args:
+            root: корневое окно Tk
+            colors: цветовая схема (OFFICE_COLORS)
+            max_items: количество уведомлений, показываемых одновременно
+            hide_ms: время показа панели после последнего уведомления (0 - до закрытия)
+            max_message_length: длина текста уведомления, дальше текст обрезается
+        """
+        self.root = root
+        self.colors = colors
+        self.hide_ms = hide_ms
+        self.max_message_length = max_message_length
+        self._items = deque(maxlen=max_items)
+        self._received = 0  # уведомлений с момента открытия панели
+        self._window = None
+        self._body = None
+        self._header = None
+        self._hide_job = None
+
+    def show(self, notifications):
+        """Показ пачки уведомлений [(заголовок, текст)] одним обновлением панели"""
+        if not notifications:
+            return
+        if self._window is None:
+            self._create_window()
+            self._received = 0
+        self._items.extend(notifications)
+        self._received += len(notifications)
+        self._render()
+        self._place()
+        self._restart_hide_timer()
+
+    def hide(self):
+        """Закрытие панели; показанные уведомления сбрасываются"""
+        if self._hide_job is not None:
+            self.root.after_cancel(self._hide_job)
+            self._hide_job = None
+        if self._window is not None:
+            self._window.destroy()
+            self._window = None
+        self._items.clear()
+
+    def _create_window(self):
+        window = tk.Toplevel(self.root)
+        window.overrideredirect(True)
+        window.transient(self.root)
+        window.configure(bg=self.colors['border'])
+
+        frame = tk.Frame(window, bg=self.colors['bg_white'], padx=10, pady=8)
+        frame.pack(fill=tk.BOTH, expand=True, padx=1, pady=1)
+
+        header_frame = tk.Frame(frame, bg=self.colors['bg_white'])
+        header_frame.pack(fill=tk.X)
+        self._header = tk.Label(header_frame, bg=self.colors['bg_white'], fg=self.colors['fg_main'],
+                                font=("Arial", 10, "bold"), anchor=tk.W)
+        self._header.pack(side=tk.LEFT)
+        tk.Button(header_frame, text="✕", command=self.hide, relief=tk.FLAT,
+                  bg=self.colors['bg_white'], fg=self.colors['fg_secondary'],
+                  cursor='hand2').pack(side=tk.RIGHT)
+
+        self._body = tk.Frame(frame, bg=self.colors['bg_white'])
+        self._body.pack(fill=tk.BOTH, expand=True, pady=(6, 0))
+        self._window = window
+
+    def _render(self):
+        """Перестроение содержимого панели по текущему списку уведомлений"""
+        self._header.configure(text=f"🔔 Уведомления ({self._received})")
+        for child in self._body.winfo_children():
+            child.destroy()
+        # Новые уведомления сверху
+        for title, message in reversed(self._items):
+            if len(message) > self.max_message_length:
+                message = message[:self.max_message_length] + "..."
+            tk.Label(self._body, text=title, bg=self.colors['bg_white'], fg=self.colors['fg_main'],
+                     font=("Arial", 9, "bold"), anchor=tk.W, justify=tk.LEFT).pack(fill=tk.X)
+            tk.Label(self._body, text=message, bg=self.colors['bg_white'], fg=self.colors['fg_secondary'],
+                     font=("Arial", 9), anchor=tk.W, justify=tk.LEFT,
+                     wraplength=360).pack(fill=tk.X, pady=(0, 6))
+
+    def _place(self):
+        """Размещение панели в правом нижнем углу главного окна"""
+        self._window.update_idletasks()
+        width = self._window.winfo_reqwidth()
+        height = self._window.winfo_reqheight()
+        x = self.root.winfo_rootx() + self.root.winfo_width() - width - 20
+        y = self.root.winfo_rooty() + self.root.winfo_height() - height - 40
+        self._window.geometry(f"+{max(x, 0)}+{max(y, 0)}")
+        self._window.lift()
+
+    def _restart_hide_timer(self):
+        if self._hide_job is not None:
+            self.root.after_cancel(self._hide_job)
+            self._hide_job = None
+        if self.hide_ms:
+            self._hide_job = self.root.after(self.hide_ms, self.hide)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Отложенный поиск по полям ввода таблиц
+"""
+
+
+class SearchController:
+    """Общий контроллер поиска для вкладок с таблицами
+
+    Запрос запускается, когда пользователь перестал печатать на debounce_ms
+    миллисекунд, а не на каждое нажатие клавиши. Текст короче min_length
+    символов не ищется (пустая строка - сброс фильтра - ищется всегда).
+    Enter запускает поиск сразу и без ограничения длины. Нажатия, не
+    изменившие текст (стрелки, Shift), новых запросов не создают.
+    Отбрасывание устаревших результатов и прерывание выполняемого запроса
+    выполняет BackgroundLoader, через который загружаются таблицы.
+    """
+
+    def __init__(self, root, debounce_ms=300, min_length=2):
+        """
+        Args:
+            root: корневое окно Tk (для отложенных вызовов)
+            debounce_ms: пауза ввода перед запуском поиска
+            min_length: минимальная длина непустого текста поиска
+        """
+        self.root = root
+        self.debounce_ms = debounce_ms
+        self.min_length = min_length
+        self._entries = {}  # поле ввода -> {'callback', 'job', 'text'}
+
+    def attach(self, entry, callback):
+        """Подключение поля ввода: callback вызывается для запуска поиска"""
+        self._entries[entry] = {'callback': callback, 'job': None, 'text': entry.get().strip()}
+        entry.bind('<KeyRelease>', lambda e: self.schedule(entry), add='+')
+        entry.bind('<Return>', lambda e: self.flush(entry), add='+')
+
+    def schedule(self, entry):
+        """Отложенный запуск поиска после паузы ввода"""
+        state = self._entries[entry]
+        self._cancel_job(state)
+        state['job'] = self.root.after(self.debounce_ms, lambda: self._fire(entry))
+
+    def flush(self, entry):
+        """Немедленный запуск поиска с текущим текстом"""
+        self._fire(entry, force=True)
+
+    def cancel_all(self):
+        """Отмена всех отложенных запусков (например, при закрытии окна)"""
+        for state in self._entries.values():
+            self._cancel_job(state)
+
+    def _cancel_job(self, state):
+        if state['job'] is not None:
+            self.root.after_cancel(state['job'])
+            state['job'] = None
+
+    def _fire(self, entry, force=False):
+        """Запуск поиска, если текст изменился и достаточно длинный"""
+        state = self._entries[entry]
+        self._cancel_job(state)
+        text = entry.get().strip()
+        if not force:
+            if text == state['text']:
+                return
+            if 0 < len(text) < self.min_length:
+                return
+        state['text'] = text
+        state['callback']()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Виртуализированное отображение строк в ttk.Treeview
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+
+def _number_key(value):
+    if value is None or value == '':
+        return float('-inf')
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('-inf')
+
+
+# Ключи сортировки по типу столбца. Значения приходят из БД уже типизированными:
+# числа - int, даты - строки ISO (YYYY-MM-DD[ HH:MM:SS]), упорядоченные как текст.
+# Пустые значения получают наименьший ключ и идут первыми при сортировке по возрастанию.
+COLUMN_SORT_KEYS = {
+    'int': _number_key,
+    'date': lambda value: str(value) if value else '',
+    'text': lambda value: '' if value is None else str(value).casefold(),
+}
+
+
+class VirtualTreeview:
+    """Оконный адаптер над ttk.Treeview для больших таблиц
+
+    Все строки хранятся в памяти списком (values, tags), а в Treeview
+    создаются элементы только для видимой части и запаса сверху и снизу.
+    При прокрутке окно сдвигается, а полоса прокрутки показывает
+    положение во всем списке. Идентификатор элемента Treeview - ключ
+    строки (по умолчанию первый столбец, ID записи), поэтому обработчики
+    наведения и выбора, читающие tree.item(item, 'values'), работают как раньше.
+    """
+
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, tree, scrollbar, buffer=50, key_func=None, on_scroll_end=None):
+        """
+        Args:
+            tree: виджет ttk.Treeview
+            scrollbar: вертикальная полоса прокрутки таблицы
+            buffer: количество строк запаса над и под видимой частью
+            key_func: ключ строки по ее значениям (по умолчанию первый столбец)
+            on_scroll_end: вызывается при прокрутке к концу списка (подгрузка данных)
+        """
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.buffer = buffer
+        self.key_func = key_func or (lambda values: values[0])
+        self.on_scroll_end = on_scroll_end
+
+        self.rows = []  # все строки: (values, tags)
+        self.offset = 0  # индекс первой строки, созданной в Treeview
+        self._window_iids = []  # идентификаторы элементов текущего окна
+        self._rendered = {}  # iid -> (values, tags), записанные в элемент Treeview
+        # Текущая сортировка: (функция ключа или (индекс, тип) столбца, обратный порядок)
+        self._sort = None
+        # Ключи сортировки столбцов, выровненные по self.rows: (индекс, тип) -> список
+        self._column_keys = {}
+        self._selected = set()  # выбранные строки, включая вышедшие за пределы окна
+        self._anchor_job = None
+
+        tree.configure(yscrollcommand=self._on_tree_yscroll)
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.bind('<Configure>', lambda e: self._render(self.top_index), add='+')
+
+    # ========== ДАННЫЕ ==========
+
+    def set_rows(self, rows):
+        """Замена всех строк (новый запрос); прокрутка возвращается к началу"""
+        self.rows = list(rows)
+        self._column_keys.clear()
+        self._apply_sort()
+        self._selected.clear()
+        self._render(0, reset=True)
+
+    def update_rows(self, rows):
+        """Обновление строк того же запроса со сверкой по ключам
+
+        Элементы Treeview не пересоздаются: в окне удаляются исчезнувшие строки,
+        добавляются новые и обновляются значения измененных. Выделение,
+        первая видимая строка и сортировка сохраняются.
+        """
+        top = self.top_index
+        top_iid = self._iid(self.rows[top][0]) if top < len(self.rows) else None
+        self._selected = self._current_selection()
+
+        self.rows = list(rows)
+        self._column_keys.clear()
+        self._apply_sort()
+        if top_iid is not None:
+            # Та же строка остается первой; если ее удалили - остаемся на том же месте
+            top = next((index for index, (values, _) in enumerate(self.rows)
+                        if self._iid(values) == top_iid), top)
+        self._render(top)
+
+        keys = {self._iid(values) for values, _ in self.rows}
+        self._selected &= keys
+
+    def append_rows(self, rows):
+        """Добавление строк в конец списка без изменения положения прокрутки"""
+        self.rows.extend(rows)
+        self._column_keys.clear()
+        self._apply_sort()
+        self._render(self.top_index)
+
+    def sort(self, key, reverse=False):
+        """Сортировка строк по функции от значений строки
+
+        Сортировка запоминается и применяется к строкам, загруженным позже.
+        """
+        self._sort = (key, reverse)
+        self._apply_sort()
+        self._render(self.top_index)
+
+    def sort_by_column(self, index, column_type='text', reverse=False):
+        """Сортировка по столбцу с ключом, определяемым типом столбца
+
+        Ключи столбца вычисляются один раз после загрузки строк и переставляются
+        вместе со строками, поэтому повторная сортировка не разбирает значения заново.
+
+        Args:
+            index: индекс столбца в значениях строки
+            column_type: тип столбца из COLUMN_SORT_KEYS ('int', 'date', 'text')
+        """
+        column = (index, column_type)
+        if self._sort is not None and self._sort[0] == column and self._sort[1] != reverse:
+            # Смена направления по тому же столбцу - достаточно развернуть порядок
+            self.rows.reverse()
+            for keys in self._column_keys.values():
+                keys.reverse()
+            self._sort = (column, reverse)
+        else:
+            self._sort = (column, reverse)
+            self._apply_sort()
+        self._render(self.top_index)
+
+    def clear_sort(self):
+        """Отмена сортировки: строки остаются в порядке загрузки (например, уже упорядочены в БД)"""
+        self._sort = None
+
+    def clear(self):
+        """Удаление всех строк"""
+        self.set_rows([])
+
+    def selection(self):
+        """Значения выбранных строк (в том числе прокрученных за пределы окна)"""
+        selected = self._current_selection()
+        return [values for values, _ in self.rows if self._iid(values) in selected]
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def top_index(self):
+        """Индекс строки списка, отображаемой первой"""
+        if not self._window_iids:
+            return self.offset
+        first = float(self.tree.yview()[0])
+        return self.offset + int(round(first * len(self._window_iids)))
+
+    # ========== ОТРИСОВКА ==========
+
+    def _iid(self, values):
+        return str(self.key_func(values))
+
+    def _apply_sort(self):
+        if self._sort is None:
+            return
+        key, reverse = self._sort
+        if callable(key):
+            self.rows.sort(key=lambda row: key(row[0]), reverse=reverse)
+            self._column_keys.clear()
+            return
+
+        keys = self._column_keys.get(key)
+        if keys is None:
+            index, column_type = key
+            convert = COLUMN_SORT_KEYS.get(column_type, COLUMN_SORT_KEYS['text'])
+            keys = [convert(values[index]) if index < len(values) else convert(None)
+                    for values, _ in self.rows]
+            self._column_keys[key] = keys
+        order = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+        rows = self.rows
+        self.rows = [rows[i] for i in order]
+        for column, column_keys in self._column_keys.items():
+            self._column_keys[column] = [column_keys[i] for i in order]
+
+    def _visible_rows(self):
+        """Количество строк, помещающихся в видимой области таблицы"""
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Таблица еще не отображена - ориентируемся на заданную высоту в строках
+            return int(self.tree.cget('height'))
+        style = self.tree.cget('style') or 'Treeview'
+        try:
+            row_height = int(ttk.Style().lookup(style, 'rowheight') or self.DEFAULT_ROW_HEIGHT)
+        except (tk.TclError, ValueError):
+            row_height = self.DEFAULT_ROW_HEIGHT
+        return max(1, height // row_height)
+
+    def _current_selection(self):
+        """Выбранные ключи: выделение в Treeview плюс запомненные строки вне окна"""
+        window = set(self._window_iids)
+        return {iid for iid in self._selected if iid not in window} | set(self.tree.selection())
+
+    def _render(self, top, reset=False):
+        """Создание элементов Treeview для окна строк вокруг строки top"""
+        if self._anchor_job is not None:
+            self.tree.after_cancel(self._anchor_job)
+            self._anchor_job = None
+
+        if not reset:
+            self._selected = self._current_selection()
+
+        total = len(self.rows)
+        window_size = self._visible_rows() + 2 * self.buffer
+        top = max(0, min(top, total - 1)) if total else 0
+        offset = max(0, min(top - self.buffer, total - window_size))
+        window = self.rows[offset:offset + window_size]
+
+        iids = []
+        used = set()
+        for values, _ in window:
+            iid = self._iid(values)
+            # Повторяющиеся ключи получают уникальный суффикс
+            if iid in used:
+                suffix = 1
+                while f"{iid}#{suffix}" in used:
+                    suffix += 1
+                iid = f"{iid}#{suffix}"
+            used.add(iid)
+            iids.append(iid)
+
+        # Изменения применяются только к отличающимся элементам
+        current = list(self.tree.get_children(''))
+        stale = [iid for iid in current if iid not in used]
+        if stale:
+            self.tree.delete(*stale)
+            stale = set(stale)
+            current = [iid for iid in current if iid not in stale]
+            for iid in stale:
+                self._rendered.pop(iid, None)
+        existing = set(current)
+        for index, (iid, row) in enumerate(zip(iids, window)):
+            values, tags = row
+            if iid in existing:
+                if self._rendered.get(iid) != row:
+                    self.tree.item(iid, values=values, tags=tags)
+                if index >= len(current) or current[index] != iid:
+                    self.tree.move(iid, '', index)
+                    current.remove(iid)
+                    current.insert(index, iid)
+            else:
+                self.tree.insert('', index, iid=iid, values=values, tags=tags)
+                current.insert(index, iid)
+                existing.add(iid)
+            self._rendered[iid] = row
+
+        self.offset = offset
+        self._window_iids = iids
+
+        selected = [iid for iid in iids if iid in self._selected]
+        if tuple(selected) != tuple(self.tree.selection()):
+            self.tree.selection_set(selected)
+
+        # Показываем строку top первой в видимой области
+        self.tree.yview_moveto(0)
+        if top > offset:
+            self.tree.yview_scroll(top - offset, 'units')
+
+    # ========== ПРОКРУТКА ==========
+
+    def _on_tree_yscroll(self, first, last):
+        """Прокрутка внутри окна: обновление полосы прокрутки и сдвиг окна у его краев"""
+        total = len(self.rows)
+        count = len(self._window_iids)
+        if not total or not count:
+            self.scrollbar.set(0, 1)
+            return
+
+        first_row = self.offset + float(first) * count
+        last_row = self.offset + float(last) * count
+        self.scrollbar.set(first_row / total, last_row / total)
+
+        if self.on_scroll_end and last_row / total >= 0.9:
+            self.on_scroll_end()
+
+        # Близко к краю окна, а за ним есть строки - переносим окно
+        near_top = float(first) * count < self.buffer / 2 and self.offset > 0
+        near_bottom = (float(last) * count > count - self.buffer / 2
+                       and self.offset + count < total)
+        if (near_top or near_bottom) and self._anchor_job is None:
+            top = int(round(first_row))
+            self._anchor_job = self.tree.after_idle(self._anchor, top)
+
+    def _anchor(self, top):
+        self._anchor_job = None
+        self._render(top)
+
+    def _on_scrollbar(self, *args):
+        """Команда полосы прокрутки: перемещение по всему списку"""
+        if args and args[0] == 'moveto':
+            self._render(int(float(args[1]) * len(self.rows)))
+        else:
+            # Прокрутка на строки и страницы выполняется в окне, у края окно сдвигается
+            self.tree.yview(*args)
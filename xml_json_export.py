@@ -3,205 +3,227 @@
 """
 
 import json
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import textwrap
+from xml.sax.saxutils import XMLGenerator
 from datetime import datetime
 import os
 
 
 class XMLJSONExporter:
-    """Класс для экспорта данных в XML и JSON форматы"""
+    """Класс для экспорта данных в XML и JSON форматы
+
+    Записи пишутся в файл по мере обхода данных, поэтому data может быть
+    итератором (постраничная выгрузка журнала) и целиком в памяти не собирается.
+    Сведения об экспорте с количеством записей записываются после данных.
+    Файл сначала пишется во временный и заменяет output_path только после
+    успешного завершения.
+    """
+
+    DATA_TYPES = ('instruments', 'employees', 'issues', 'history')
 
     def __init__(self):
         pass
 
+    # ========== ПРЕОБРАЗОВАНИЕ ЗАПИСЕЙ ==========
+
+    @staticmethod
+    def _json_record(data_type, item):
+        """Запись для JSON: словарь полей"""
+        if data_type == 'instruments':
+            return {
+                'id': item[0],
+                'name': item[1],
+                'inventory_number': item[2],
+                'serial_number': item[3] if len(item) > 3 else '',
+                'category': item[4] if len(item) > 4 else '',
+                'current_address': item[5] if len(item) > 5 else '',
+                'status': item[6] if len(item) > 6 else '',
+                'photo_path': item[7] if len(item) > 7 else ''
+            }
+        if data_type == 'employees':
+            return {
+                'id': item[0],
+                'full_name': item[1],
+                'position': item[2] if len(item) > 2 else '',
+                'department': item[3] if len(item) > 3 else '',
+                'phone': item[4] if len(item) > 4 else '',
+                'email': item[5] if len(item) > 5 else '',
+                'status': item[6] if len(item) > 6 else '',
+                'photo_path': item[7] if len(item) > 7 else ''
+            }
+        if data_type == 'issues':
+            return {
+                'id': item[0],
+                'batch_id': item[1] if len(item) > 1 else None,
+                'instrument_id': item[2] if len(item) > 2 else '',
+                'employee_id': item[3] if len(item) > 3 else '',
+                'address_id': item[4] if len(item) > 4 else None,
+                'issue_date': item[5] if len(item) > 5 else '',
+                'expected_return_date': item[6] if len(item) > 6 else '',
+                'actual_return_date': item[7] if len(item) > 7 else None,
+                'status': item[8] if len(item) > 8 else '',
+                'notes': item[9] if len(item) > 9 else '',
+                'issued_by': item[10] if len(item) > 10 else '',
+                'address_name': item[11] if len(item) > 11 else '',
+                'address_full': item[12] if len(item) > 12 else '',
+                'instrument_name': item[13] if len(item) > 13 else '',
+                'inventory_number': item[14] if len(item) > 14 else '',
+                'employee_name': item[15] if len(item) > 15 else ''
+            }
+        # history
+        return {
+            'operation_id': item[0] if len(item) > 0 else '',
+            'operation_type': item[1] if len(item) > 1 else '',
+            'inventory_number': item[2] if len(item) > 2 else '',
+            'instrument_name': item[3] if len(item) > 3 else '',
+            'employee_name': item[4] if len(item) > 4 else '',
+            'address': item[5] if len(item) > 5 else '',
+            'operation_date': item[6] if len(item) > 6 else '',
+            'performed_by': item[7] if len(item) > 7 else '',
+            'notes': item[8] if len(item) > 8 else ''
+        }
+
+    @staticmethod
+    def _xml_record(data_type, item):
+        """Запись для XML: (тег, id, [(тег поля, текст)]); необязательные пустые поля пропускаются"""
+        def text(index):
+            return item[index] if len(item) > index and item[index] else ""
+
+        if data_type == 'instruments':
+            fields = [('name', item[1] or ""), ('inventory_number', item[2] or "")]
+            fields += [(name, text(index)) for index, name in enumerate(
+                ('serial_number', 'category', 'current_address', 'status', 'photo_path'), 3)]
+            return "instrument", str(item[0]), fields
+
+        if data_type == 'employees':
+            fields = [('full_name', item[1] or "")]
+            fields += [(name, text(index)) for index, name in enumerate(
+                ('position', 'department', 'phone', 'email', 'status', 'photo_path'), 2)]
+            return "employee", str(item[0]), fields
+
+        if data_type == 'issues':
+            fields = []
+            if len(item) > 1 and item[1]:
+                fields.append(('batch_id', item[1]))
+            fields.append(('instrument_id', item[2] if len(item) > 2 else ""))
+            fields.append(('employee_id', item[3] if len(item) > 3 else ""))
+            if len(item) > 4 and item[4]:
+                fields.append(('address_id', item[4]))
+            fields.append(('issue_date', text(5)))
+            fields.append(('expected_return_date', text(6)))
+            if len(item) > 7 and item[7]:
+                fields.append(('actual_return_date', item[7]))
+            fields += [(name, text(index)) for index, name in enumerate(
+                ('status', 'notes', 'issued_by', 'address_name', 'address_full',
+                 'instrument_name', 'inventory_number', 'employee_name'), 8)]
+            return "issue", str(item[0]), fields
+
+        # history
+        fields = [(name, text(index)) for index, name in enumerate(
+            ('operation_type', 'inventory_number', 'instrument_name', 'employee_name',
+             'address', 'operation_date', 'performed_by', 'notes'), 1)]
+        return "operation", str(item[0]) if len(item) > 0 and item[0] else "", fields
+
+    # ========== ЭКСПОРТ ==========
+
     def export_to_json(self, data, output_path, data_type='instruments'):
         """Экспорт данных в JSON формат"""
+        temp_path = output_path + '.tmp'
         try:
-            # Структура данных
-            export_data = {
-                'export_info': {
+            if data_type not in self.DATA_TYPES:
+                data = ()
+
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                # Массив данных пишется по одной записи
+                f.write('{\n  "data": [')
+                total_records = 0
+                for item in data:
+                    record = json.dumps(self._json_record(data_type, item), ensure_ascii=False, indent=2)
+                    f.write((',\n' if total_records else '\n') + textwrap.indent(record, '    '))
+                    total_records += 1
+                f.write('\n  ],\n' if total_records else '],\n')
+
+                # Сведения об экспорте: количество записей известно после обхода данных
+                export_info = json.dumps({
                     'timestamp': datetime.now().isoformat(),
                     'data_type': data_type,
-                    'total_records': len(data)
-                },
-                'data': []
-            }
+                    'total_records': total_records
+                }, ensure_ascii=False, indent=2)
+                f.write('  "export_info": ' + textwrap.indent(export_info, '  ').lstrip() + '\n}\n')
 
-            # Преобразуем данные в зависимости от типа
-            if data_type == 'instruments':
-                for item in data:
-                    instrument = {
-                        'id': item[0],
-                        'name': item[1],
-                        'inventory_number': item[2],
-                        'serial_number': item[3] if len(item) > 3 else '',
-                        'category': item[4] if len(item) > 4 else '',
-                        'current_address': item[5] if len(item) > 5 else '',
-                        'status': item[6] if len(item) > 6 else '',
-                        'photo_path': item[7] if len(item) > 7 else ''
-                    }
-                    export_data['data'].append(instrument)
-
-            elif data_type == 'employees':
-                for item in data:
-                    employee = {
-                        'id': item[0],
-                        'full_name': item[1],
-                        'position': item[2] if len(item) > 2 else '',
-                        'department': item[3] if len(item) > 3 else '',
-                        'phone': item[4] if len(item) > 4 else '',
-                        'email': item[5] if len(item) > 5 else '',
-                        'status': item[6] if len(item) > 6 else '',
-                        'photo_path': item[7] if len(item) > 7 else ''
-                    }
-                    export_data['data'].append(employee)
-
-            elif data_type == 'issues':
-                for item in data:
-                    issue = {
-                        'id': item[0],
-                        'batch_id': item[1] if len(item) > 1 else None,
-                        'instrument_id': item[2] if len(item) > 2 else '',
-                        'employee_id': item[3] if len(item) > 3 else '',
-                        'address_id': item[4] if len(item) > 4 else None,
-                        'issue_date': item[5] if len(item) > 5 else '',
-                        'expected_return_date': item[6] if len(item) > 6 else '',
-                        'actual_return_date': item[7] if len(item) > 7 else None,
-                        'status': item[8] if len(item) > 8 else '',
-                        'notes': item[9] if len(item) > 9 else '',
-                        'issued_by': item[10] if len(item) > 10 else '',
-                        'address_name': item[11] if len(item) > 11 else '',
-                        'address_full': item[12] if len(item) > 12 else '',
-                        'instrument_name': item[13] if len(item) > 13 else '',
-                        'inventory_number': item[14] if len(item) > 14 else '',
-                        'employee_name': item[15] if len(item) > 15 else ''
-                    }
-                    export_data['data'].append(issue)
-
-            elif data_type == 'history':
-                for item in data:
-                    record = {
-                        'operation_id': item[0] if len(item) > 0 else '',
-                        'operation_type': item[1] if len(item) > 1 else '',
-                        'inventory_number': item[2] if len(item) > 2 else '',
-                        'instrument_name': item[3] if len(item) > 3 else '',
-                        'employee_name': item[4] if len(item) > 4 else '',
-                        'address': item[5] if len(item) > 5 else '',
-                        'operation_date': item[6] if len(item) > 6 else '',
-                        'performed_by': item[7] if len(item) > 7 else '',
-                        'notes': item[8] if len(item) > 8 else ''
-                    }
-                    export_data['data'].append(record)
-
-            # Записываем в файл
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, ensure_ascii=False, indent=2)
-
-            return True, f"Данные успешно экспортированы в JSON ({len(data)} записей)"
+            os.replace(temp_path, output_path)
+            return True, f"Данные успешно экспортированы в JSON ({total_records} записей)"
 
         except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             return False, f"Ошибка экспорта в JSON: {e}"
 
     def export_to_xml(self, data, output_path, data_type='instruments'):
         """Экспорт данных в XML формат"""
+        temp_path = output_path + '.tmp'
         try:
-            # Создаем корневой элемент
-            root_name = f"{data_type}_export"
-            root = ET.Element(root_name)
-
-            # Добавляем информацию об экспорте
-            export_info = ET.SubElement(root, "export_info")
-            ET.SubElement(export_info, "timestamp").text = datetime.now().isoformat()
-            ET.SubElement(export_info, "data_type").text = data_type
-            ET.SubElement(export_info, "total_records").text = str(len(data))
-
-            # Создаем контейнер для данных
-            data_container = ET.SubElement(root, "data")
-
-            # Преобразуем данные в зависимости от типа
-            if data_type == 'instruments':
-                for item in data:
-                    instrument = ET.SubElement(data_container, "instrument")
-                    instrument.set("id", str(item[0]))
-
-                    ET.SubElement(instrument, "name").text = item[1] or ""
-                    ET.SubElement(instrument, "inventory_number").text = item[2] or ""
-                    ET.SubElement(instrument, "serial_number").text = item[3] if len(item) > 3 and item[3] else ""
-                    ET.SubElement(instrument, "category").text = item[4] if len(item) > 4 and item[4] else ""
-                    ET.SubElement(instrument, "current_address").text = item[5] if len(item) > 5 and item[5] else ""
-                    ET.SubElement(instrument, "status").text = item[6] if len(item) > 6 and item[6] else ""
-                    ET.SubElement(instrument, "photo_path").text = item[7] if len(item) > 7 and item[7] else ""
-
-            elif data_type == 'employees':
+            if data_type not in self.DATA_TYPES:
+                data = ()
+
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                xml = XMLGenerator(f, encoding='utf-8', short_empty_elements=True)
+                xml.startDocument()
+                root_name = f"{data_type}_export"
+                xml.startElement(root_name, {})
+
+                # Контейнер данных: элементы пишутся по одной записи
+                self._write_xml_start(xml, "data", 1)
+                total_records = 0
                 for item in data:
-                    employee = ET.SubElement(data_container, "employee")
-                    employee.set("id", str(item[0]))
-
-                    ET.SubElement(employee, "full_name").text = item[1] or ""
-                    ET.SubElement(employee, "position").text = item[2] if len(item) > 2 and item[2] else ""
-                    ET.SubElement(employee, "department").text = item[3] if len(item) > 3 and item[3] else ""
-                    ET.SubElement(employee, "phone").text = item[4] if len(item) > 4 and item[4] else ""
-                    ET.SubElement(employee, "email").text = item[5] if len(item) > 5 and item[5] else ""
-                    ET.SubElement(employee, "status").text = item[6] if len(item) > 6 and item[6] else ""
-                    ET.SubElement(employee, "photo_path").text = item[7] if len(item) > 7 and item[7] else ""
-
-            elif data_type == 'issues':
-                for item in data:
-                    issue = ET.SubElement(data_container, "issue")
-                    issue.set("id", str(item[0]))
-
-                    if len(item) > 1 and item[1]:
-                        ET.SubElement(issue, "batch_id").text = str(item[1])
-                    ET.SubElement(issue, "instrument_id").text = str(item[2]) if len(item) > 2 else ""
-                    ET.SubElement(issue, "employee_id").text = str(item[3]) if len(item) > 3 else ""
-                    if len(item) > 4 and item[4]:
-                        ET.SubElement(issue, "address_id").text = str(item[4])
-                    ET.SubElement(issue, "issue_date").text = item[5] if len(item) > 5 and item[5] else ""
-                    ET.SubElement(issue, "expected_return_date").text = item[6] if len(item) > 6 and item[6] else ""
-                    if len(item) > 7 and item[7]:
-                        ET.SubElement(issue, "actual_return_date").text = item[7]
-                    ET.SubElement(issue, "status").text = item[8] if len(item) > 8 and item[8] else ""
-                    ET.SubElement(issue, "notes").text = item[9] if len(item) > 9 and item[9] else ""
-                    ET.SubElement(issue, "issued_by").text = item[10] if len(item) > 10 and item[10] else ""
-                    ET.SubElement(issue, "address_name").text = item[11] if len(item) > 11 and item[11] else ""
-                    ET.SubElement(issue, "address_full").text = item[12] if len(item) > 12 and item[12] else ""
-                    ET.SubElement(issue, "instrument_name").text = item[13] if len(item) > 13 and item[13] else ""
-                    ET.SubElement(issue, "inventory_number").text = item[14] if len(item) > 14 and item[14] else ""
-                    ET.SubElement(issue, "employee_name").text = item[15] if len(item) > 15 and item[15] else ""
-
-            elif data_type == 'history':
-                for item in data:
-                    record = ET.SubElement(data_container, "operation")
-                    record.set("id", str(item[0]) if len(item) > 0 and item[0] else "")
-
-                    ET.SubElement(record, "operation_type").text = item[1] if len(item) > 1 and item[1] else ""
-                    ET.SubElement(record, "inventory_number").text = item[2] if len(item) > 2 and item[2] else ""
-                    ET.SubElement(record, "instrument_name").text = item[3] if len(item) > 3 and item[3] else ""
-                    ET.SubElement(record, "employee_name").text = item[4] if len(item) > 4 and item[4] else ""
-                    ET.SubElement(record, "address").text = item[5] if len(item) > 5 and item[5] else ""
-                    ET.SubElement(record, "operation_date").text = item[6] if len(item) > 6 and item[6] else ""
-                    ET.SubElement(record, "performed_by").text = item[7] if len(item) > 7 and item[7] else ""
-                    ET.SubElement(record, "notes").text = item[8] if len(item) > 8 and item[8] else ""
-
-            # Преобразуем в строку с красивым форматированием
-            rough_string = ET.tostring(root, encoding='unicode')
-            reparsed = minidom.parseString(rough_string)
-            pretty_xml = reparsed.toprettyxml(indent="  ", encoding=None)
-
-            # Записываем в файл
-            with open(output_path, 'w', encoding='utf-8') as f:
-                # Убираем лишние пустые строки
-                lines = pretty_xml.split('\n')
-                filtered_lines = [line for line in lines if line.strip()]
-                f.write('\n'.join(filtered_lines))
-
-            return True, f"Данные успешно экспортированы в XML ({len(data)} записей)"
+                    tag, record_id, fields = self._xml_record(data_type, item)
+                    self._write_xml_start(xml, tag, 2, {"id": record_id})
+                    for name, value in fields:
+                        self._write_xml_field(xml, name, value, 3)
+                    self._write_xml_end(xml, tag, 2)
+                    total_records += 1
+                if total_records:
+                    self._write_xml_end(xml, "data", 1)
+                else:
+                    xml.endElement("data")
+
+                # Сведения об экспорте: количество записей известно после обхода данных
+                self._write_xml_start(xml, "export_info", 1)
+                self._write_xml_field(xml, "timestamp", datetime.now().isoformat(), 2)
+                self._write_xml_field(xml, "data_type", data_type, 2)
+                self._write_xml_field(xml, "total_records", total_records, 2)
+                self._write_xml_end(xml, "export_info", 1)
+
+                self._write_xml_end(xml, root_name, 0)
+                xml.endDocument()
+                f.write('\n')
+
+            os.replace(temp_path, output_path)
+            return True, f"Данные успешно экспортированы в XML ({total_records} записей)"
 
         except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
             return False, f"Ошибка экспорта в XML: {e}"
 
-
-
-
-
+    @staticmethod
+    def _write_xml_start(xml, tag, level, attrs=None):
+        """Открывающий тег с отступом уровня level"""
+        xml.ignorableWhitespace('\n' + '  ' * level)
+        xml.startElement(tag, attrs or {})
+
+    @staticmethod
+    def _write_xml_end(xml, tag, level):
+        """Закрывающий тег элемента с вложенными элементами"""
+        xml.ignorableWhitespace('\n' + '  ' * level)
+        xml.endElement(tag)
+
+    @staticmethod
+    def _write_xml_field(xml, tag, value, level):
+        """Элемент с текстом (пустой текст - пустой элемент)"""
+        xml.ignorableWhitespace('\n' + '  ' * level)
+        xml.startElement(tag, {})
+        text = "" if value is None else str(value)
+        if text:
+            xml.characters(text)
+        xml.endElement(tag)